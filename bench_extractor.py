@@ -0,0 +1,145 @@
+# bench_extractor.py
+# -*- coding: utf-8 -*-
+"""
+parse_address için patolojik girdi stres testi.
+Çok uzun notlar, çok sayıda slash ve çok sayıda çapa kelimesi içeren adresler
+üretir; satır başı süre tavanı (--max-ms) aşılırsa ya da girdi 4 katına
+çıktığında süre --max-growth katından fazla artarsa (doğrusal olmayan davranış)
+sıfırdan farklı kodla çıkar.
+
+--input CSV verilirse gerçek adreslerde tek geçişlik scan_units ile ayrı
+RE_NO/RE_KAT/RE_KAT_K/RE_DAIRE/RE_BLOK aramalarını karşılaştırır (sonuç eşitliği
+ve adres başı regex süresi). --records N ile de aynı CSV'den N satırlık bir
+partiyi dict (parse_address), __slots__'lu kayıt (parse_record) ve sütunlu
+parti (parse_batch) olarak tutmanın bellek ve süre maliyetini ölçer.
+"""
+import argparse, gc, itertools, sys, time, tracemalloc
+
+from extractor import (RE_BLOK, RE_DAIRE, RE_KAT, RE_KAT_K, RE_NO, parse_address, parse_batch,
+                       parse_record, scan_units)
+from normalizer import normalize
+
+def pathological_inputs(n: int):
+    word = "adnan menderes "
+    yield "long-words",       word * n
+    yield "long-no-anchor",   ("ab.cd-ef " * n) + "izmir"
+    yield "many-slashes",     "a / b " * n + "fethiye / muğla"
+    yield "slash-no-space",   "a/" * n + "muğla"
+    yield "spaces-slash",     "x" + " " * (n * 20) + "/ y"
+    yield "many-mahallesi",   "akarca mahallesi " * n
+    yield "many-sitesi",      "gül sitesi " * n + "gül"
+    yield "many-apartman",    "deniz apartmanı " * n
+    yield "many-belediyesi",  "bornova belediyesi " * n
+    yield "many-il",          "izmir " * n
+    yield "il-noise",         "k d no " * n + "izmir"
+    yield "mixed-anchors",    ("mah. cad. sok. no:1 d.2 k.3 blok apt. / " * (n // 4)) + "dikili/izmir"
+    yield "digits",           ("864.sok 12/3 " * n)
+
+def units_reference(norm: str) -> dict:
+    """scan_units'in karşılığı: alan başına ayrı .search()."""
+    out = {}
+    m = RE_NO.search(norm)
+    if m: out["no"] = m.group(1)
+    m = RE_KAT.search(norm) or RE_KAT_K.search(norm)
+    if m: out["kat"] = m.group(1)
+    m = RE_DAIRE.search(norm)
+    if m: out["daire"] = m.group(1)
+    m = RE_BLOK.search(norm)
+    if m: out["blok"] = m.group(1)
+    return out
+
+def bench_units(path: str, repeat: int) -> None:
+    from table_io import ADDRESS_COLUMNS, iter_rows
+    norms = [normalize(r.get("address") or r.get("Address") or r.get("adres") or "")
+             for r in iter_rows(path, ADDRESS_COLUMNS)]
+    fields = ("no", "kat", "daire", "blok")
+    bad = 0
+    for n in norms:
+        got, ref = scan_units(n), units_reference(n)
+        if any(got.get(k) != ref.get(k) for k in fields):
+            bad += 1
+    def timed(fn) -> float:
+        best = float("inf")
+        for _ in range(repeat):
+            t0 = time.perf_counter()
+            for n in norms:
+                fn(n)
+            best = min(best, time.perf_counter() - t0)
+        return best * 1e6 / max(1, len(norms))
+    ref, one = timed(units_reference), timed(scan_units)
+    print(f"[units] {len(norms):,} adres, farklı sonuç: {bad}")
+    print(f"[units] ayrı aramalar {ref:.2f} µs/adres -> tek geçiş {one:.2f} µs/adres (x{ref/one:.2f})")
+    if bad:
+        raise SystemExit(1)
+
+def bench_records(path: str, rows: int) -> None:
+    from table_io import ADDRESS_COLUMNS, iter_rows
+    addrs = [r.get("address") or r.get("Address") or r.get("adres") or ""
+             for r in iter_rows(path, ADDRESS_COLUMNS)]
+    addrs = list(itertools.islice(itertools.cycle(addrs), rows))
+    modes = (
+        ("dict", lambda: [parse_address(a) for a in addrs]),
+        ("record", lambda: [parse_record(a) for a in addrs]),
+        ("batch", lambda: parse_batch(addrs)),
+    )
+    print(f"[records] {len(addrs):,} satır ({path})")
+    for name, build in modes:
+        gc.collect()
+        t0 = time.perf_counter()
+        out = build()
+        secs = time.perf_counter() - t0
+        del out
+        gc.collect()
+        tracemalloc.start()
+        out = build()
+        kept, peak = tracemalloc.get_traced_memory()
+        tracemalloc.stop()
+        del out
+        print(f"[records] {name:<6} {secs / len(addrs) * 1e6:6.2f} µs/satır  "
+              f"tutulan {kept / 1e6:8.1f} MB ({kept / len(addrs):6.0f} B/satır)  tepe {peak / 1e6:8.1f} MB")
+
+def main():
+    ap = argparse.ArgumentParser(description="parse_address stres benchmark")
+    ap.add_argument("--size", type=int, default=500, help="Tekrar sayısı (girdi uzunluğu; ölçüm 4 katıyla)")
+    ap.add_argument("--repeat", type=int, default=3, help="Her girdi için tekrar")
+    ap.add_argument("--max-ms", type=float, default=500.0, help="Satır başı süre tavanı (ms)")
+    ap.add_argument("--max-growth", type=float, default=8.0,
+                    help="Girdi 4 katına çıkınca izin verilen süre artışı (doğrusal ~4, karesel ~16)")
+    ap.add_argument("--input", default=None,
+                    help="Adres CSV'si: scan_units ile ayrı RE_* aramalarını karşılaştır")
+    ap.add_argument("--records", type=int, default=0,
+                    help="--input ile: N satırda dict / kayıt / sütunlu parti bellek ve süre ölçümü")
+    args = ap.parse_args()
+    if args.input and args.records:
+        bench_records(args.input, args.records)
+        return
+    if args.input:
+        bench_units(args.input, max(args.repeat, 5))
+        return
+
+    def timed(text: str) -> float:
+        best = float("inf")
+        for _ in range(args.repeat):
+            t0 = time.perf_counter()
+            parse_address(text)
+            best = min(best, time.perf_counter() - t0)
+        return best * 1000.0
+
+    failed = []
+    small = dict(pathological_inputs(args.size))
+    for name, text in pathological_inputs(args.size * 4):
+        ms = timed(text)
+        growth = ms / max(timed(small[name]), 1e-3)
+        ok = ms <= args.max_ms and growth <= args.max_growth
+        flag = "OK " if ok else "SLOW"
+        print(f"[{flag}] {name:<16} len={len(text):>7,}  {ms:8.2f} ms  x{growth:5.1f}")
+        if not ok:
+            failed.append(name)
+
+    if failed:
+        print(f"[fail] süre tavanı/büyüme sınırı aşıldı: {', '.join(failed)}", file=sys.stderr)
+        raise SystemExit(1)
+    print(f"[ok] tüm girdiler {args.max_ms} ms altında")
+
+if __name__ == "__main__":
+    main()
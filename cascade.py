@@ -0,0 +1,388 @@
+# cascade.py
+# -*- coding: utf-8 -*-
+"""
+il/ilçe çözümleme zinciri (cascade).
+
+Her aşama (Stage) ayrıştırılmış kayda bakıp (il, ilçe, skor) önerir; skor
+aşamanın eşiğini geçerse yalnızca boş alanlar doldurulur. il ve ilçe dolunca
+sonraki aşamalar hiç çalışmaz. Aşama başına sayaçlar tutulur:
+  attempts  aşamanın çalıştığı satır
+  fills     en az bir alanı doldurduğu satır
+  resolved  aşamadan sonra il+ilçe'si tamamlanan satır
+  seconds   harcanan süre
+  skipped   süre bütçesi yüzünden atlandığı satır
+Böylece aşamalar "çözülen satır başına maliyet" ile sıralanıp ayarlanabilir.
+
+Süre bütçesi (budget_ms satır başına, resolve_batch'te ayrıca toplu): pahalı
+aşamalar (EXPENSIVE_STAGES: fuzzy, ml) kalan süre o aşamanın tahmini
+maliyetine (EWMA) yetmiyorsa atlanır. Atlanan aşamanın tahmini her atlamada
+SKIP_DECAY ile küçülür; bütçeye sığdığı ilk satırda yeniden denenir ve ölçüm
+eskimiş tahminin yerine geçer (bütçe bilerek hiç aşılmaz). Yeniden deneme
+yine süreyi aşarsa küçülme yavaşlar (backoff), gerçekten yavaş aşama giderek
+seyrek denenir. Ucuz aşamalar (sözlük/index aramaları) her zaman çalışır.
+parse_address de süre dolunca isteğe bağlı alanları atlar.
+Bir şey atlanan satıra 'degraded': '1' yazılır ve sayılır; gecikme
+histogramı p50/p99 raporlar.
+
+Aşamalar (STAGE_NAMES): extractor, dict, resolver, gazetteer, fuzzy, ml.
+extractor her zaman ilk ve eşiksizdir (parse_record; sonuç dict gibi de
+kullanılabilen utils.Parsed kaydıdır).
+"""
+import json, math, sys, time
+from typing import Callable, Dict, List, Optional, Sequence, Tuple
+
+from extractor import parse_record
+
+STAGE_NAMES = ("extractor", "dict", "resolver", "gazetteer", "fuzzy", "ml")
+DEFAULT_ORDER = ("dict", "resolver", "ml")
+EXPENSIVE_STAGES = ("fuzzy", "ml")
+
+Proposal = Tuple[Optional[str], Optional[str], float]
+
+
+def _missing(parsed: Dict[str, str]) -> Tuple[bool, bool]:
+    return not (parsed.get("il") or "").strip(), not (parsed.get("ilce") or "").strip()
+
+
+class StageStats:
+    __slots__ = ("attempts", "fills", "resolved", "seconds", "skipped", "ewma", "since_run", "backoff")
+    EWMA_ALPHA = 0.3   # son denemelerin ağırlığı; ilk (soğuk) çağrı kalıcı olmasın
+    SKIP_DECAY = 0.95  # atlanan aşamanın tahmini her atlamada bu oranla küçülür
+
+    def __init__(self, attempts: int = 0, fills: int = 0, resolved: int = 0, seconds: float = 0.0,
+                 skipped: int = 0, ewma: float = 0.0, since_run: int = 0, backoff: int = 0):
+        self.attempts = attempts
+        self.fills = fills
+        self.resolved = resolved
+        self.seconds = seconds
+        self.skipped = skipped
+        self.ewma = ewma            # deneme süresinin üstel hareketli ortalaması
+        self.since_run = since_run  # son denemeden beri art arda atlama
+        self.backoff = backoff      # süreyi aşan art arda deneme; küçülmeyi yavaşlatır
+
+    def observe(self, seconds: float) -> None:
+        """Atlamalardan sonraki ilk denemede (tahmin küçültülmüştü) ölçüm tahminin yerine geçer."""
+        self.seconds += seconds
+        self.attempts += 1
+        if self.attempts == 1 or self.since_run:
+            self.ewma = seconds
+        else:
+            self.ewma += self.EWMA_ALPHA * (seconds - self.ewma)
+        self.since_run = 0
+
+    def skip(self) -> None:
+        self.skipped += 1
+        self.since_run += 1
+        self.ewma = self.expected_seconds() * self.SKIP_DECAY ** (0.5 ** self.backoff)
+
+    def expected_seconds(self) -> float:
+        # eski metriklerde ewma yok: kümülatif ortalamaya düş
+        if self.ewma or not self.attempts:
+            return self.ewma
+        return self.seconds / self.attempts
+
+    def to_dict(self) -> Dict[str, float]:
+        return {"attempts": self.attempts, "fills": self.fills, "resolved": self.resolved,
+                "seconds": round(self.seconds, 6), "skipped": self.skipped, "ewma": round(self.ewma, 6)}
+
+
+class LatencyHistogram:
+    """Satır gecikmeleri için log ölçekli histogram (kova genişliği ~%19); O(1) bellek."""
+    STEPS = 4      # ikinin kuvveti başına kova
+    BUCKETS = 128  # 1 µs .. ~4 saat
+
+    def __init__(self, sparse: Optional[Dict[str, int]] = None, max_seconds: float = 0.0):
+        self.counts = [0] * self.BUCKETS
+        for i, c in (sparse or {}).items():
+            self.counts[int(i)] = c
+        self.max = max_seconds
+
+    def sparse(self) -> Dict[str, int]:
+        """JSON için yalnızca dolu kovalar."""
+        return {str(i): c for i, c in enumerate(self.counts) if c}
+
+    def add(self, seconds: float) -> None:
+        us = seconds * 1e6
+        i = int(math.log2(us) * self.STEPS) + 1 if us >= 1.0 else 0
+        self.counts[min(i, self.BUCKETS - 1)] += 1
+        if seconds > self.max:
+            self.max = seconds
+
+    def quantile(self, q: float) -> float:
+        """Kova üst sınırı (ms)."""
+        n = sum(self.counts)
+        if not n:
+            return 0.0
+        rank, acc = q * n, 0
+        for i, c in enumerate(self.counts):
+            acc += c
+            if acc >= rank:
+                return round(2.0 ** (i / self.STEPS) / 1e3, 3)
+        return round(2.0 ** ((self.BUCKETS - 1) / self.STEPS) / 1e3, 3)
+
+
+class Stage:
+    """fn(parsed, il_hint, ilce_hint) -> (il, ilçe, skor); skor >= threshold ise doldurur."""
+
+    def __init__(self, name: str, fn: Callable[[Dict[str, str], Optional[str], Optional[str]], Proposal],
+                 threshold: float = 0.0, expensive: Optional[bool] = None):
+        self.name = name
+        self.fn = fn
+        self.threshold = threshold
+        self.expensive = name in EXPENSIVE_STAGES if expensive is None else expensive
+        self.stats = StageStats()
+
+
+# --------- Hazır aşamalar ----------
+def dict_stage(matcher, threshold: float = 0.8) -> Stage:
+    def fn(parsed, il_hint, ilce_hint):
+        return matcher.infer(parsed.get("normalized") or parsed.get("address") or "",
+                             il_hint=il_hint, ilce_hint=ilce_hint)
+    return Stage("dict", fn, threshold)
+
+
+def resolver_stage(resolver, threshold: float = 1.0) -> Stage:
+    def fn(parsed, il_hint, ilce_hint):
+        return resolver.infer(
+            mahalle=parsed.get("mahalle"),
+            sokak=parsed.get("sokak"),
+            cadde=parsed.get("cadde"),
+            site=parsed.get("site"),
+            apartman=parsed.get("apartman"),
+            il_hint=il_hint,
+            ilce_hint=ilce_hint,
+        )
+    return Stage("resolver", fn, threshold)
+
+
+def gazetteer_stage(fuzzy: bool = False, threshold: float = 0.5) -> Stage:
+    """
+    gazetteer.load_gazetteer ile yüklenmiş mahalle sözlüğü; fuzzy=True: Levenshtein ≤ 1 katmanı da.
+    Skor: eşleşme katmanının güveni (exact > folded > fuzzy) x adayların seçilen (il, ilçe)'de uyuşma payı.
+    """
+    import gazetteer
+
+    def fn(parsed, il_hint, ilce_hint):
+        if not parsed.get("mahalle"):
+            return None, None, 0.0
+        ilce, il, conf = gazetteer.infer_with_confidence(
+            parsed.get("mahalle"), parsed.get("sokak"), parsed.get("cadde"),
+            ilce_hint or "", il_hint or "", fuzzy=fuzzy, row=parsed)
+        return il, ilce, conf
+    return Stage("fuzzy" if fuzzy else "gazetteer", fn, threshold)
+
+
+def ml_stage(ml_resolver, threshold: float = 0.55) -> Stage:
+    def fn(parsed, il_hint, ilce_hint):
+        try:
+            return ml_resolver.infer(parsed)
+        except Exception as e:
+            print(f"[ml] WARN: tahmin sırasında hata: {e}", file=sys.stderr)
+            return None, None, 0.0
+    return Stage("ml", fn, threshold)
+
+
+# --------- Zincir ----------
+class Cascade:
+    def __init__(self, stages: Sequence[Stage], budget_ms: float = 0.0):
+        self.stages: List[Stage] = list(stages)
+        self.budget_ms = budget_ms  # satır başına süre bütçesi (0: sınırsız)
+        self.extractor = StageStats()
+        self.rows = 0
+        self.unresolved = 0
+        self.degraded = 0
+        self.latency = LatencyHistogram()
+
+    def run(self, parsed: Dict[str, str], deadline: Optional[float] = None) -> Dict[str, str]:
+        """
+        Eksik il/ilçe'yi aşamalarla doldurur (parsed yerinde güncellenir).
+        deadline (time.perf_counter() cinsinden): yetişmeyecek pahalı aşamalar
+        atlanır ve parsed["degraded"] = "1" olur; atlanan aşamanın tahmini
+        küçülür ve kalan süreye sığınca yeniden denenir.
+        """
+        need_il, need_ilce = _missing(parsed)
+        if not (need_il or need_ilce):
+            return parsed
+        for st in self.stages:
+            t0 = time.perf_counter()
+            s = st.stats
+            if deadline is not None and st.expensive and t0 + s.expected_seconds() >= deadline:
+                s.skip()
+                parsed["degraded"] = "1"
+                continue
+            il, ilce, score = st.fn(parsed, parsed.get("il") or None, parsed.get("ilce") or None)
+            filled = False
+            if score >= st.threshold:
+                if need_il and il:
+                    parsed["il"] = il
+                    filled = True
+                if need_ilce and ilce:
+                    parsed["ilce"] = ilce
+                    filled = True
+            t1 = time.perf_counter()
+            s.observe(t1 - t0)
+            if deadline is not None and st.expensive:
+                s.backoff = s.backoff + 1 if t1 > deadline else 0
+            if filled:
+                s.fills += 1
+                need_il, need_ilce = _missing(parsed)
+                if not (need_il or need_ilce):
+                    s.resolved += 1
+                    return parsed
+        return parsed
+
+    def resolve(self, addr: str, deadline: Optional[float] = None) -> Dict[str, str]:
+        """
+        parse_address (extractor aşaması) + run; satır sayaçlarını da günceller.
+        deadline verilmezse budget_ms'ten hesaplanır.
+        """
+        t0 = time.perf_counter()
+        if deadline is None and self.budget_ms > 0:
+            deadline = t0 + self.budget_ms / 1e3
+        return self._resolve(addr, t0, deadline, deadline)
+
+    def _resolve(self, addr: str, t0: float, parse_deadline: Optional[float],
+                 stage_deadline: Optional[float]) -> Dict[str, str]:
+        parsed = parse_record(addr, deadline=parse_deadline)
+        e = self.extractor
+        e.observe(time.perf_counter() - t0)
+        need_il, need_ilce = _missing(parsed)
+        if not (need_il and need_ilce):
+            e.fills += 1
+        if not (need_il or need_ilce):
+            e.resolved += 1
+        self.rows += 1
+        self.run(parsed, stage_deadline)
+        if any(_missing(parsed)):
+            self.unresolved += 1
+        if parsed.get("degraded"):
+            self.degraded += 1
+        self.latency.add(time.perf_counter() - t0)
+        return parsed
+
+    def resolve_batch(self, addrs: Sequence[str], budget_ms: Optional[float] = None,
+                      batch_budget_ms: float = 0.0) -> List[Dict[str, str]]:
+        """
+        Toplu çözümleme: her satırın bütçesi budget_ms (vars: self.budget_ms),
+        hepsinin toplamı batch_budget_ms. Toplu bütçe bitince kalan satırlarda
+        pahalı aşamalar atlanır (degraded); ayrıştırma yalnızca satır bütçesine
+        bağlıdır, ucuz aşamalar her satırda çalışır.
+        """
+        row_ms = self.budget_ms if budget_ms is None else budget_ms
+        batch_deadline = time.perf_counter() + batch_budget_ms / 1e3 if batch_budget_ms > 0 else None
+        out = []
+        for addr in addrs:
+            t0 = time.perf_counter()
+            deadline = t0 + row_ms / 1e3 if row_ms > 0 else None
+            stage_deadline = deadline
+            if batch_deadline is not None:
+                stage_deadline = batch_deadline if deadline is None else min(deadline, batch_deadline)
+            out.append(self._resolve(addr, t0, deadline, stage_deadline))
+        return out
+
+    # --------- Metrikler ----------
+    def _uses_gazetteer(self) -> bool:
+        return any(st.name in ("gazetteer", "fuzzy") for st in self.stages)
+
+    def metrics(self) -> dict:
+        m = {
+            "rows": self.rows,
+            "unresolved": self.unresolved,
+            "degraded": self.degraded,
+            "budget_ms": self.budget_ms,
+            "latency_ms": {"p50": self.latency.quantile(0.5), "p99": self.latency.quantile(0.99),
+                           "max": round(self.latency.max * 1e3, 3)},
+            "latency_hist": self.latency.sparse(),
+            "stages": [{"name": "extractor", **self.extractor.to_dict()}]
+                      + [{"name": st.name, "threshold": st.threshold, **st.stats.to_dict()}
+                         for st in self.stages],
+        }
+        if self._uses_gazetteer():
+            import gazetteer
+            # mahalle araması başına değil satır başına: hangi katmanda çözüldü
+            m["gazetteer_lookups"] = dict(gazetteer.lookup_stats)
+        return m
+
+    def load_metrics(self, m: dict) -> None:
+        """Kontrol noktasından devam: sayaçları geri yükle."""
+        self.rows = m.get("rows", 0)
+        self.unresolved = m.get("unresolved", 0)
+        self.degraded = m.get("degraded", 0)
+        self.latency = LatencyHistogram(m.get("latency_hist"),
+                                        m.get("latency_ms", {}).get("max", 0.0) / 1e3)
+        by_name = {st.name: st for st in self.stages}
+        for d in m.get("stages", []):
+            vals = {k: d.get(k, 0) for k in StageStats.__slots__}
+            if d.get("name") == "extractor":
+                self.extractor = StageStats(**vals)
+            elif d.get("name") in by_name:
+                by_name[d["name"]].stats = StageStats(**vals)
+        if self._uses_gazetteer() and "gazetteer_lookups" in m:
+            import gazetteer
+            gazetteer.lookup_stats.update(m["gazetteer_lookups"])
+
+    def report(self) -> str:
+        lines = [f"[cascade] rows={self.rows:,} unresolved={self.unresolved:,}"]
+        lat = self.metrics()["latency_ms"]
+        budget = f"budget={self.budget_ms:g}ms " if self.budget_ms > 0 else ""
+        if self.budget_ms > 0 or self.degraded:
+            budget += f"degraded={self.degraded:,} ({self.degraded / self.rows if self.rows else 0:.1%}) "
+        lines.append(f"[cascade] {budget}latency p50≤{lat['p50']:.3f}ms p99≤{lat['p99']:.3f}ms "
+                     f"max={lat['max']:.3f}ms")
+        for d in self.metrics()["stages"]:
+            a, fl = d["attempts"], d["fills"]
+            per_fill = (d["seconds"] / fl * 1e3) if fl else float("nan")
+            per_try = (d["seconds"] / a * 1e3) if a else 0.0
+            thr = f" thr={d['threshold']:g}" if "threshold" in d else ""
+            lines.append(f"[cascade] {d['name']:9s}{thr:10s} attempts={a:,} fills={fl:,} "
+                         f"({fl / a if a else 0:.1%}) resolved={d['resolved']:,} "
+                         f"time={d['seconds']:.2f}s ms/attempt={per_try:.3f} ms/fill={per_fill:.3f}"
+                         + (f" skipped={d['skipped']:,}" if d.get("skipped") else ""))
+        gl = self.metrics().get("gazetteer_lookups")
+        if gl:
+            n = sum(gl.values())
+            lines.append("[cascade] gazetteer lookups " + " ".join(
+                f"{k}={v:,} ({v / n if n else 0:.1%})" for k, v in gl.items()))
+        return "\n".join(lines)
+
+    def write_metrics(self, path: str) -> None:
+        with open(path, "w", encoding="utf-8") as f:
+            json.dump(self.metrics(), f, ensure_ascii=False, indent=2)
+
+
+def parse_order(spec: str) -> List[str]:
+    """'dict,resolver,ml' => aşama adları (doğrulanmış, tekrarsız)."""
+    order = [s.strip() for s in (spec or "").split(",") if s.strip()]
+    bad = [s for s in order if s not in STAGE_NAMES or s == "extractor"]
+    if bad:
+        raise ValueError(f"bilinmeyen aşama: {', '.join(bad)} (seçenekler: {', '.join(STAGE_NAMES[1:])})")
+    return list(dict.fromkeys(order))
+
+
+def parse_thresholds(items: Sequence[str]) -> Dict[str, float]:
+    """['ml=0.7', 'resolver=1.5'] => {'ml': 0.7, 'resolver': 1.5}"""
+    out: Dict[str, float] = {}
+    for it in items or ():
+        name, _, val = it.partition("=")
+        name = name.strip()
+        if name not in STAGE_NAMES or not val:
+            raise ValueError(f"geçersiz eşik: {it!r} (biçim: aşama=değer)")
+        out[name] = float(val)
+    return out
+
+
+def build_cascade(order: Sequence[str], resolver=None, dict_matcher=None, ml_resolver=None,
+                  thresholds: Optional[Dict[str, float]] = None, budget_ms: float = 0.0) -> Cascade:
+    """Sıraya göre aşamaları kurar; bileşeni verilmemiş aşamalar (None) atlanır."""
+    thr = thresholds or {}
+    stages: List[Stage] = []
+    for name in order:
+        if name == "dict" and dict_matcher is not None:
+            stages.append(dict_stage(dict_matcher, thr.get("dict", 0.8)))
+        elif name == "resolver" and resolver is not None:
+            stages.append(resolver_stage(resolver, thr.get("resolver", 1.0)))
+        elif name in ("gazetteer", "fuzzy"):
+            stages.append(gazetteer_stage(fuzzy=(name == "fuzzy"), threshold=thr.get(name, 0.5)))
+        elif name == "ml" and ml_resolver is not None:
+            stages.append(ml_stage(ml_resolver, thr.get("ml", 0.55)))
+    return Cascade(stages, budget_ms)
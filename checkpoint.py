@@ -0,0 +1,93 @@
+# checkpoint.py
+# -*- coding: utf-8 -*-
+"""
+Uzun çalışmalar için kontrol noktası (checkpoint) ve devam (resume).
+
+Kontrol noktası küçük bir JSON dosyasıdır:
+  {"job": {...}, "rows_in": okunan girdi satırı, ...çalışmaya özel alanlar}
+"job" çalışmayı tanımlar (girdi dosyası damgası, çıktı yolu, kod/artefakt
+parmak izi). Farklı bir çalışmaya ait kontrol noktasıyla devam edilmez;
+böylece devam eden çalışmanın son çıktısı kesintisiz çalışmayla bayt bayt aynıdır.
+Dosya her seferinde geçici dosyaya yazılıp os.replace ile değiştirilir.
+"""
+import csv, json, os
+from typing import Dict, List, Optional
+
+
+def input_stamp(path: str) -> str:
+    st = os.stat(path)
+    return f"{os.path.abspath(path)}:{st.st_size}:{st.st_mtime_ns}"
+
+
+def _fsync_replace(tmp: str, path: str) -> None:
+    os.replace(tmp, path)
+    # dizin girdisi de kalıcı olsun (kesintiye karşı)
+    try:
+        fd = os.open(os.path.dirname(os.path.abspath(path)), os.O_RDONLY)
+        try:
+            os.fsync(fd)
+        finally:
+            os.close(fd)
+    except OSError:
+        pass
+
+
+class Checkpoint:
+    def __init__(self, path: str, job: Dict[str, str]):
+        self.path = path
+        self.job = job
+
+    def load(self) -> Optional[dict]:
+        """Bu çalışmaya ait son durum; yoksa None. Başka çalışmaya aitse ValueError."""
+        if not os.path.exists(self.path):
+            return None
+        with open(self.path, "r", encoding="utf-8") as f:
+            state = json.load(f)
+        if state.get("job") != self.job:
+            raise ValueError(f"{self.path}: kontrol noktası başka bir girdi/ayar/kod sürümüne ait; "
+                             f"silin ya da --resume olmadan çalıştırın")
+        return state
+
+    def save(self, **state) -> None:
+        tmp = self.path + ".tmp"
+        with open(tmp, "w", encoding="utf-8") as f:
+            json.dump({"job": self.job, **state}, f, ensure_ascii=False)
+            f.flush()
+            os.fsync(f.fileno())
+        _fsync_replace(tmp, self.path)
+
+    def clear(self) -> None:
+        if os.path.exists(self.path):
+            os.remove(self.path)
+
+
+class ResumableCSVWriter:
+    """
+    Satırları doğrudan çıktı CSV'sine yazar. flush() diske kalıcı yazılmış bayt
+    sayısını döner; devamda dosya bu bayta kırpılıp sonuna eklenir.
+    """
+    def __init__(self, path: str, fieldnames: List[str], offset: Optional[int] = None):
+        if os.path.dirname(path):
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+        self.fieldnames = fieldnames
+        if offset is None:
+            self.f = open(path, "w", encoding="utf-8", newline="")
+            self.w = csv.DictWriter(self.f, fieldnames=fieldnames)
+            self.w.writeheader()
+        else:
+            # son kontrol noktasından sonra yazılmış yarım kalan kısım atılır
+            with open(path, "r+b") as fb:
+                fb.truncate(offset)
+            self.f = open(path, "a", encoding="utf-8", newline="")
+            self.w = csv.DictWriter(self.f, fieldnames=fieldnames)
+
+    def writerow(self, r: Dict[str, str]) -> None:
+        self.w.writerow({k: r.get(k, "") for k in self.fieldnames})
+
+    def flush(self) -> int:
+        self.f.flush()
+        os.fsync(self.f.fileno())
+        return self.f.buffer.tell()
+
+    def close(self) -> None:
+        self.f.close()
@@ -0,0 +1,148 @@
+# compressed_io.py
+# -*- coding: utf-8 -*-
+"""
+.gz / .bz2 / .xz dosyaları diske açmadan okuma-yazma (stdlib gzip/bz2/lzma).
+
+Açma (decompress) ayrı bir iş parçacığında yapılır ve sınırlı bir kuyruğa
+(en fazla `buffer_chunks` x `chunk_size` bayt) yazılır; ayrıştırma aynı anda
+kuyruktan okur. Yazarken de sıkıştırma arka plandaki iş parçacığındadır.
+zlib/bz2/lzma büyük bloklarda GIL'i bıraktığı için iki iş gerçekten örtüşür.
+Uzantısı olmayan yollar düz open() ile açılır.
+"""
+import bz2, gzip, io, lzma, os, queue, threading
+from typing import Optional
+
+CODECS = {".gz": gzip, ".bz2": bz2, ".xz": lzma}
+
+_CHUNK = 1 << 20
+_BUFFER_CHUNKS = 8
+
+
+def codec_of(path: str):
+    return CODECS.get(os.path.splitext(path)[1].lower())
+
+
+def strip_codec(path: str) -> str:
+    """'x.csv.gz' -> 'x.csv' (biçim tespiti için)."""
+    root, ext = os.path.splitext(path)
+    return root if ext.lower() in CODECS else path
+
+
+class _PrefetchReader(io.RawIOBase):
+    """Kaynağı arka planda `chunk_size` bloklar halinde okuyup sınırlı kuyruğa koyar."""
+
+    def __init__(self, src, chunk_size: int = _CHUNK, buffer_chunks: int = _BUFFER_CHUNKS):
+        self._src = src
+        self._q: "queue.Queue" = queue.Queue(maxsize=max(1, buffer_chunks))
+        self._buf = memoryview(b"")
+        self._eof = False
+        self._stop = threading.Event()
+        self._t = threading.Thread(target=self._run, args=(chunk_size,), daemon=True)
+        self._t.start()
+
+    def _run(self, chunk_size: int) -> None:
+        try:
+            while not self._stop.is_set():
+                data = self._src.read(chunk_size)
+                self._q.put(data)
+                if not data:
+                    return
+        except BaseException as e:  # tüketici tarafında yeniden fırlatılır
+            self._q.put(e)
+
+    def readable(self) -> bool:
+        return True
+
+    def readinto(self, b) -> int:
+        while not self._buf:
+            if self._eof:
+                return 0
+            item = self._q.get()
+            if isinstance(item, BaseException):
+                self._eof = True
+                raise item
+            if not item:
+                self._eof = True
+                return 0
+            self._buf = memoryview(item)
+        n = min(len(b), len(self._buf))
+        b[:n] = self._buf[:n]
+        self._buf = self._buf[n:]
+        return n
+
+    def close(self) -> None:
+        if self.closed:
+            return
+        self._stop.set()
+        # üretici dolu kuyrukta bekliyor olabilir: boşalt
+        while self._t.is_alive():
+            try:
+                self._q.get(timeout=0.05)
+            except queue.Empty:
+                pass
+        self._src.close()
+        super().close()
+
+
+class _BackgroundWriter(io.RawIOBase):
+    """Yazılan blokları sınırlı kuyruğa koyar; sıkıştırma arka plandaki iş parçacığında."""
+
+    def __init__(self, dst, buffer_chunks: int = _BUFFER_CHUNKS):
+        self._dst = dst
+        self._q: "queue.Queue" = queue.Queue(maxsize=max(1, buffer_chunks))
+        self._err: Optional[BaseException] = None
+        self._t = threading.Thread(target=self._run, daemon=True)
+        self._t.start()
+
+    def _run(self) -> None:
+        while True:
+            data = self._q.get()
+            if data is None:
+                return
+            if self._err is None:
+                try:
+                    self._dst.write(data)
+                except BaseException as e:
+                    self._err = e
+
+    def writable(self) -> bool:
+        return True
+
+    def write(self, b) -> int:
+        if self._err is not None:
+            raise self._err
+        data = bytes(b)
+        self._q.put(data)
+        return len(data)
+
+    def close(self) -> None:
+        if self.closed:
+            return
+        self._q.put(None)
+        self._t.join()
+        self._dst.close()
+        super().close()
+        if self._err is not None:
+            raise self._err
+
+
+def open_binary(path: str, mode: str = "rb",
+                chunk_size: int = _CHUNK, buffer_chunks: int = _BUFFER_CHUNKS):
+    """İkili akış; sıkıştırılmış yollarda açma/sıkıştırma arka planda."""
+    codec = codec_of(path)
+    if codec is None:
+        return open(path, mode)
+    if "r" in mode:
+        return io.BufferedReader(_PrefetchReader(codec.open(path, "rb"), chunk_size, buffer_chunks),
+                                 buffer_size=chunk_size)
+    return io.BufferedWriter(_BackgroundWriter(codec.open(path, "wb"), buffer_chunks),
+                             buffer_size=chunk_size)
+
+
+def open_text(path: str, mode: str = "r", encoding: str = "utf-8",
+              newline: Optional[str] = "", **kw):
+    """open(path, mode, encoding=..., newline=...) yerine; .gz/.bz2/.xz şeffaf."""
+    if codec_of(path) is None:
+        return open(path, mode, encoding=encoding, newline=newline)
+    raw = open_binary(path, "rb" if "r" in mode else "wb", **kw)
+    return io.TextIOWrapper(raw, encoding=encoding, newline=newline)
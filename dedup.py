@@ -0,0 +1,82 @@
+# dedup.py
+# -*- coding: utf-8 -*-
+"""
+Çalışma içi tekilleştirme tablosu.
+normalize(adres) => çözümlenmiş kayıt (parse + resolver + ML sonucu).
+Bellekte en fazla `max_items` anahtar tutulur (LRU); taşanlar geçici bir
+SQLite dosyasına yazılır ve gerektiğinde oradan okunur. Diskten geri okunan
+kayıt zaten diskte olduğu için yeniden taşarken tekrar yazılmaz.
+"""
+import json, os, sqlite3, tempfile
+from collections import OrderedDict
+from typing import Dict, Optional, Tuple
+
+# bellekteki girdi: (kayıt, diskte_var_mı)
+_Entry = Tuple[Dict[str, str], bool]
+
+
+class DedupTable:
+    def __init__(self, max_items: int = 200000, spill_dir: Optional[str] = None):
+        self.max_items = max(1, int(max_items))
+        self.spill_dir = spill_dir
+        self.mem: "OrderedDict[str, _Entry]" = OrderedDict()
+        self._db: Optional[sqlite3.Connection] = None
+        self._db_path: Optional[str] = None
+        # istatistik
+        self.hits = 0
+        self.misses = 0
+        self.spilled = 0
+
+    # --------- Disk katmanı ----------
+    def _disk(self) -> sqlite3.Connection:
+        if self._db is None:
+            if self.spill_dir:
+                os.makedirs(self.spill_dir, exist_ok=True)
+            fd, self._db_path = tempfile.mkstemp(prefix="dedup_", suffix=".sqlite", dir=self.spill_dir)
+            os.close(fd)
+            self._db = sqlite3.connect(self._db_path)
+            self._db.execute("PRAGMA journal_mode=OFF")
+            self._db.execute("PRAGMA synchronous=OFF")
+            self._db.execute("CREATE TABLE kv (k TEXT PRIMARY KEY, v TEXT)")
+        return self._db
+
+    def _spill(self, key: str, value: Dict[str, str]) -> None:
+        self._disk().execute("INSERT OR REPLACE INTO kv VALUES (?, ?)",
+                             (key, json.dumps(value, ensure_ascii=False)))
+        self.spilled += 1
+
+    # --------- Arayüz ----------
+    def get(self, key: str) -> Optional[Dict[str, str]]:
+        ent = self.mem.get(key)
+        if ent is not None:
+            self.mem.move_to_end(key)
+            self.hits += 1
+            return ent[0]
+        if self._db is not None:
+            row = self._db.execute("SELECT v FROM kv WHERE k = ?", (key,)).fetchone()
+            if row is not None:
+                val = json.loads(row[0])
+                self._insert(key, val, on_disk=True)
+                self.hits += 1
+                return val
+        self.misses += 1
+        return None
+
+    def put(self, key: str, value: Dict[str, str]) -> None:
+        self._insert(key, value, on_disk=False)
+
+    def _insert(self, key: str, value: Dict[str, str], on_disk: bool) -> None:
+        self.mem[key] = (value, on_disk)
+        self.mem.move_to_end(key)
+        while len(self.mem) > self.max_items:
+            old_key, (old_val, old_on_disk) = self.mem.popitem(last=False)
+            if not old_on_disk:
+                self._spill(old_key, old_val)
+
+    def close(self) -> None:
+        if self._db is not None:
+            self._db.close()
+            self._db = None
+        if self._db_path and os.path.exists(self._db_path):
+            os.remove(self._db_path)
+        self._db_path = None
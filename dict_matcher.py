@@ -0,0 +1,160 @@
+# dict_matcher.py
+# -*- coding: utf-8 -*-
+"""
+Index sözlüğünden (gözlenmiş ilçe ve mahalle adları) derlenen Aho-Corasick
+otomatı. Normalize metinde bilinen tüm ilçe/mahalle geçişlerini tek geçişte
+bulur; eşleşme süresi sözlük boyutuna değil metin uzunluğuna bağlıdır.
+
+Otomat token düzeyinde çalışır (fold_tr ile aksansız), bu yüzden çok kelimeli
+adlar ("yeni sanayi") yalnızca kelime sınırlarında eşleşir ve "Çamlık" ile
+"camlik" aynı anahtara düşer.
+"""
+import re
+from collections import Counter, defaultdict, deque
+from typing import Dict, List, Optional, Set, Tuple
+
+from utils import tr_lower, TR_FOLD_MAP, fold_tr
+
+_TOKEN_RE = re.compile(r"[\wçğıöşü]+")
+
+
+def fold_tokens(text: str) -> List[str]:
+    """Metni aksansız token listesine çevirir ("Fethiye/Muğla" -> ["fethiye","mugla"])."""
+    return [t.translate(TR_FOLD_MAP) for t in _TOKEN_RE.findall(tr_lower(text or ""))]
+
+
+class DictMatcher:
+    """
+    goto[node][token] => node, fail[node] => node
+    out[node]         => o düğümde biten (tür, anahtar) listesi
+    """
+    def __init__(self):
+        self.goto: List[Dict[str, int]] = [{}]
+        self.fail: List[int] = [0]
+        self.out: List[List[Tuple[str, Tuple[str, ...]]]] = [[]]
+        # fail zincirinde çıktısı olan ilk düğüm (çıktı bağlantısı)
+        self.out_link: List[int] = [0]
+        # sözlük: aksansız anahtar => (il, ilçe) istatistikleri
+        self.ilce_pairs: Dict[Tuple[str, ...], Set[Tuple[str, str]]] = defaultdict(set)
+        self.mahalle_pairs: Dict[Tuple[str, ...], Counter] = defaultdict(Counter)
+
+    # --------- Otomatın kurulumu ----------
+    def _add(self, key: Tuple[str, ...], kind: str) -> None:
+        node = 0
+        for tok in key:
+            nxt = self.goto[node].get(tok)
+            if nxt is None:
+                nxt = len(self.goto)
+                self.goto[node][tok] = nxt
+                self.goto.append({})
+                self.fail.append(0)
+                self.out.append([])
+                self.out_link.append(0)
+            node = nxt
+        if (kind, key) not in self.out[node]:
+            self.out[node].append((kind, key))
+
+    def _build_links(self) -> None:
+        q = deque()
+        for nxt in self.goto[0].values():
+            self.fail[nxt] = 0
+            q.append(nxt)
+        while q:
+            node = q.popleft()
+            for tok, nxt in self.goto[node].items():
+                f = self.fail[node]
+                while f and tok not in self.goto[f]:
+                    f = self.fail[f]
+                fn = self.goto[f].get(tok, 0)
+                self.fail[nxt] = fn
+                self.out_link[nxt] = fn if self.out[fn] else self.out_link[fn]
+                q.append(nxt)
+
+    @classmethod
+    def from_resolver(cls, resolver) -> "DictMatcher":
+        """LocationResolver index'inin mahalle alanındaki anahtar ve (il, ilçe) çiftlerinden kurar."""
+        inst = cls()
+        # Başka yer adlarının (mahalle tokenı, site/apartman adı) parçası olan
+        # "ilçe"ler çoğunlukla find_ilce'nin sola yürüme fallback'inin
+        # gürültüsüdür; kesinlik için ilçe sözlüğüne alınmaz.
+        place_keys: Set[Tuple[str, ...]] = set()
+        for kk in resolver.idx["mahalle"]:
+            place_keys.update((t,) for t in fold_tokens(kk))
+        for field in ("site", "apartman"):
+            place_keys.update(tuple(fold_tokens(kk)) for kk in resolver.idx[field])
+
+        for kk, counter in resolver.idx["mahalle"].items():
+            mkey = tuple(fold_tokens(kk))
+            if not mkey:
+                continue
+            inst.mahalle_pairs[mkey].update(counter)
+            for (il, ilce) in counter:
+                key = tuple(fold_tokens(ilce))
+                if key and key not in place_keys:
+                    inst.ilce_pairs[key].add((il, ilce))
+        for key in inst.ilce_pairs:
+            inst._add(key, "ilce")
+        for key in inst.mahalle_pairs:
+            inst._add(key, "mahalle")
+        inst._build_links()
+        return inst
+
+    # --------- Eşleşme ----------
+    def find_all(self, text: str) -> List[Tuple[str, Tuple[str, ...], int, int]]:
+        """Tüm geçişler: (tür, anahtar, başlangıç_token, bitiş_token)."""
+        found = []
+        node = 0
+        for i, tok in enumerate(fold_tokens(text)):
+            while node and tok not in self.goto[node]:
+                node = self.fail[node]
+            node = self.goto[node].get(tok, 0)
+            hit = node if self.out[node] else self.out_link[node]
+            while hit:
+                for kind, key in self.out[hit]:
+                    found.append((kind, key, i - len(key) + 1, i + 1))
+                hit = self.out_link[hit]
+        return found
+
+    def infer(self, text: str,
+              il_hint: Optional[str] = None,
+              ilce_hint: Optional[str] = None) -> Tuple[str, str, float]:
+        """
+        Dönüş: (il, ilçe, skor). Skor, en iyi adayın destek payıdır (0..1).
+        İlçe geçişleri aday kümesini belirler; mahalle geçişleri adayları
+        daraltır/ağırlıklandırır. İlçe geçişi yoksa mahalle yalnızca il
+        ipucuyla birlikte kullanılır (yüksek kesinlik).
+        """
+        il_f = fold_tr(il_hint) if il_hint else ""
+        ilce_f = fold_tr(ilce_hint) if ilce_hint else ""
+
+        def _ok(pair: Tuple[str, str]) -> bool:
+            il, ilce = pair
+            if il_f and fold_tr(il) != il_f:
+                return False
+            if ilce_f and ilce and fold_tr(ilce) != ilce_f:
+                return False
+            return True
+
+        ilce_c, mah_c = Counter(), Counter()
+        for kind, key, _, _ in self.find_all(text):
+            if kind == "ilce":
+                for pair in self.ilce_pairs[key]:
+                    if _ok(pair):
+                        ilce_c[pair] += 1
+            else:
+                bucket = self.mahalle_pairs[key]
+                total = sum(bucket.values()) or 1
+                for pair, cnt in bucket.items():
+                    if pair[1] and _ok(pair):
+                        mah_c[pair] += cnt / total
+
+        if ilce_c:
+            cands = Counter({p: c + mah_c.get(p, 0) for p, c in ilce_c.items()})
+        elif il_f and mah_c:
+            cands = mah_c
+        else:
+            return "", "", 0.0
+
+        total = sum(cands.values()) or 1
+        (il, ilce), score = cands.most_common(1)[0]
+        return il, ilce, float(score) / total
@@ -1,14 +1,18 @@
 # eval_ml_resolver.py
 # -*- coding: utf-8 -*-
-import argparse, csv, os, sys
+import argparse, os, sys
 from typing import Dict, List
 import numpy as np
-import joblib
 from sklearn.metrics import accuracy_score, f1_score
 
 from normalizer import normalize
-from extractor import parse_address
+from extractor import parse_batch
 from resolver import LocationResolver
+from ml_resolver import is_hierarchical, load_model
+from table_io import ADDRESS_COLUMNS, iter_rows, write_rows
+
+# Değerlendirmede okunan sütunlar (sütunlu biçimlerde geri kalanı atlanır)
+EVAL_COLUMNS = ("id", "il", "ilce", "target", "label_true") + ADDRESS_COLUMNS
 
 def pick_address_field(row: Dict[str,str]) -> str:
     for k in ("address","Address","adres"):
@@ -25,28 +29,20 @@ def truth_label_from_row(row: Dict[str,str]) -> str:
     return t
 
 def read_csv(path: str) -> List[Dict[str,str]]:
-    with open(path, "r", encoding="utf-8", newline="") as f:
-        rdr = csv.DictReader(f)
-        return list(rdr)
-
-def topk_acc(y_true: List[str], topk_preds: List[List[str]]) -> float:
-    ok = 0; n = 0
-    for yt, cand in zip(y_true, topk_preds):
-        if not yt:
-            continue
-        n += 1
-        if yt in cand:
-            ok += 1
-    return (ok / n) if n else float("nan")
+    return list(iter_rows(path, EVAL_COLUMNS))
 
 def main():
     ap = argparse.ArgumentParser("ML il|ilçe değerlendirme")
-    ap.add_argument("--input", required=True, help="test.csv")
+    ap.add_argument("--input", required=True, help="test.csv (.parquet/.arrow da olur)")
     ap.add_argument("--model", default="cache/ml_resolver.joblib", help="joblib pipeline")
     ap.add_argument("--kb", help="resolver index json (hibrit için gerekli)", default=None)
     ap.add_argument("--hybrid", action="store_true", help="ML + resolver fallback değerlendir")
     ap.add_argument("--threshold", type=float, default=0.6, help="Hibritte ML güven eşiği")
+    ap.add_argument("--fusion-weight", type=float, default=0.5,
+                    help="Hibritte eşik altı satırlarda resolver skorlarının ağırlığı: "
+                         "(1-w)·P + w·R (1.0: resolver cevabı ML'i ezer)")
     ap.add_argument("--output", help="tahmin çıktı CSV yolu (opsiyonel)")
+    ap.add_argument("--mmap", action="store_true", help="Model dizilerini salt okunur eşle (joblib mmap_mode='r')")
     ap.add_argument("--batch", type=int, default=1000, help="tahmin batch boyutu (küçük tut)")
     args = ap.parse_args()
 
@@ -56,7 +52,11 @@ def main():
 
     print(f"[info] test rows: {len(rows):,}")
 
-    pipe = joblib.load(args.model)
+    pipe = load_model(args.model, mmap=args.mmap)
+    if is_hierarchical(pipe):
+        print("[error] hiyerarşik model (il -> ilçe) tam sınıf olasılığı vermez; "
+              "karşılaştırma için train_ml_resolver.py --holdout kullanın.", file=sys.stderr)
+        return
     classes = np.array(pipe.classes_)
 
     resolver = None
@@ -68,7 +68,6 @@ def main():
             resolver = LocationResolver.load(args.kb)
 
     texts_norm: List[str] = []
-    parsed_list: List[Dict[str,str]] = []
     y_true: List[str] = []
     orig_addr: List[str] = []
     ids: List[str] = []
@@ -79,56 +78,78 @@ def main():
         ids.append(r.get("id",""))
         y_true.append(truth_label_from_row(r))
         texts_norm.append(normalize(addr))
-        parsed_list.append(parse_address(addr))
-
-    # STREAMING tahmin: büyük matrisleri hiçbir yerde tutmuyoruz
-    pmax_list: List[float] = []
-    top1_labels_ml: List[str] = []
-    top3_labels_ml: List[List[str]] = []
 
-    for i in range(0, len(texts_norm), args.batch):
+    n = len(texts_norm)
+    k = min(3, len(classes))
+    # STREAMING tahmin: (b, C) olasılık matrisi batch başına; geriye sadece
+    # p_max, top-3 sınıf indeksleri ve hibrit etiket dizileri kalır
+    pmax = np.empty(n, dtype=np.float64)
+    top_idx = np.empty((n, k), dtype=np.int64)
+    hybrid_labels = np.empty(n, dtype=object) if args.hybrid else None
+    class_pos = {c: j for j, c in enumerate(classes)}
+    w = args.fusion_weight
+
+    for i in range(0, n, args.batch):
         batch = texts_norm[i:i+args.batch]
         P = pipe.predict_proba(batch)  # (b, C) dense; ama b küçük
-        # p_max
-        pmax_list.extend(P.max(axis=1).tolist())
-        # top-3 (bellek güvenli; satır satır işleyelim)
-        top_idx = np.argsort(-P, axis=1)[:, :3]  # ilk 3
-        top1 = classes[top_idx[:, 0]]
-        top1_labels_ml.extend(list(top1))
-        for rix in range(P.shape[0]):
-            top3_labels_ml.append(list(classes[top_idx[rix, :]]))
+        pmax[i:i+len(batch)] = P.max(axis=1)
+        # top-k: tam sıralama yerine argpartition + k elemanlık sıralama
+        part = np.argpartition(-P, k - 1, axis=1)[:, :k]
+        order = np.argsort(-np.take_along_axis(P, part, axis=1), axis=1, kind="stable")
+        tb = np.take_along_axis(part, order, axis=1)
+        top_idx[i:i+len(batch)] = tb
+
+        if args.hybrid:
+            # Eşik kapısı maske olarak: yalnız düşük güvenli satırlar resolver'a gider
+            hb = classes[tb[:, 0]].astype(object)
+            low = np.flatnonzero(P.max(axis=1) < args.threshold)
+            if low.size:
+                # yalnız kapıdan geçen satırlar parse edilir (sütunlu parti)
+                parsed = parse_batch([orig_addr[i + j] for j in low])
+                cands = resolver.candidates_batch(list(parsed))
+                # resolver skorları satır başına paylara çevrilip (R) P ile harmanlanır:
+                # F = (1-w)·P + w·R; sınıflarda olmayan resolver etiketleri ek sütundur
+                ri, ci, vals = [], [], []
+                extra: Dict[str, int] = {}
+                for r, c in enumerate(cands):
+                    tot = sum(c.values())
+                    for (a, b), v in c.items():
+                        if not (a or b):
+                            continue
+                        lab = f"{a or ''}|{b or ''}"
+                        j = class_pos.get(lab)
+                        if j is None:
+                            j = extra.setdefault(lab, len(classes) + len(extra))
+                        ri.append(r)
+                        ci.append(j)
+                        vals.append(v / tot)
+                if ri:
+                    F = np.zeros((low.size, len(classes) + len(extra)))
+                    F[:, :len(classes)] = (1.0 - w) * P[low]
+                    np.add.at(F, (np.asarray(ri), np.asarray(ci)), w * np.asarray(vals))
+                    labels = np.concatenate([classes.astype(object), np.array(list(extra), dtype=object)])
+                    has = np.zeros(low.size, dtype=bool)
+                    has[ri] = True  # resolver adayı olmayan satırlar ML top-1'de kalır
+                    hb[low[has]] = labels[F[has].argmax(axis=1)]
+            hybrid_labels[i:i+len(batch)] = hb
         # batch P'yi bırak
         del P
 
-    # Hibrit top-1
-    top1_labels_hybrid: List[str] = []
-    if args.hybrid:
-        for plabel, pscore, parsed in zip(top1_labels_ml, pmax_list, parsed_list):
-            if pscore >= args.threshold:
-                top1_labels_hybrid.append(plabel)
-            else:
-                il, ilce, score = resolver.infer(
-                    mahalle=parsed.get("mahalle"),
-                    sokak=parsed.get("sokak"),
-                    cadde=parsed.get("cadde"),
-                    site=parsed.get("site"),
-                    apartman=parsed.get("apartman"),
-                )
-                if il or ilce:
-                    top1_labels_hybrid.append(f"{il}|{ilce}")
-                else:
-                    top1_labels_hybrid.append(plabel)
-
-    # Değerlendirme
-    y_true_eval = [yt for yt in y_true if yt]
-    idx_eval = [i for i, yt in enumerate(y_true) if yt]
-
-    y_pred_ml_eval = [top1_labels_ml[i] for i in idx_eval]
-    y_pred_top3_ml_eval = [top3_labels_ml[i] for i in idx_eval]
-
-    acc_ml = accuracy_score(y_true_eval, y_pred_ml_eval) if y_true_eval else float("nan")
-    f1_ml = f1_score(y_true_eval, y_pred_ml_eval, average="macro", zero_division=0) if y_true_eval else float("nan")
-    acc3_ml = topk_acc(y_true_eval, y_pred_top3_ml_eval)
+    top3_labels_ml = classes[top_idx]            # (n, k)
+    top1_labels_ml = top3_labels_ml[:, 0]
+
+    # Değerlendirme (maskeli dizi işlemleri)
+    y_arr = np.array(y_true, dtype=object)
+    eval_mask = y_arr != ""
+    y_true_eval = y_arr[eval_mask].tolist()
+
+    if y_true_eval:
+        y_pred_ml_eval = top1_labels_ml[eval_mask].astype(object)
+        acc_ml = accuracy_score(y_true_eval, y_pred_ml_eval.tolist())
+        f1_ml = f1_score(y_true_eval, y_pred_ml_eval.tolist(), average="macro", zero_division=0)
+        acc3_ml = float((top3_labels_ml[eval_mask] == y_arr[eval_mask][:, None]).any(axis=1).mean())
+    else:
+        acc_ml = f1_ml = acc3_ml = float("nan")
 
     print("[scores] Pure-ML")
     print(f"  top1-accuracy = {acc_ml:.4f}")
@@ -136,10 +157,10 @@ def main():
     print(f"  macro-F1      = {f1_ml:.4f}")
 
     if args.hybrid:
-        y_pred_hybrid_eval = [top1_labels_hybrid[i] for i in idx_eval]
+        y_pred_hybrid_eval = hybrid_labels[eval_mask].tolist()
         acc_h = accuracy_score(y_true_eval, y_pred_hybrid_eval) if y_true_eval else float("nan")
         f1_h = f1_score(y_true_eval, y_pred_hybrid_eval, average="macro", zero_division=0) if y_true_eval else float("nan")
-        print("[scores] Hybrid (ML + resolver)")
+        print(f"[scores] Hybrid (ML + resolver, w={w:g})")
         print(f"  top1-accuracy = {acc_h:.4f}")
         print(f"  macro-F1      = {f1_h:.4f}")
 
@@ -147,21 +168,22 @@ def main():
         fieldnames = ["id","address","y_true","y_pred_ml","p_max","top3_ml"]
         if args.hybrid:
             fieldnames += ["y_pred_hybrid"]
-        with open(args.output, "w", encoding="utf-8", newline="") as f:
-            w = csv.DictWriter(f, fieldnames=fieldnames)
-            w.writeheader()
+
+        def out_rows():
             for i in range(len(rows)):
                 rowo = {
                     "id": ids[i],
                     "address": orig_addr[i],
                     "y_true": y_true[i],
                     "y_pred_ml": top1_labels_ml[i],
-                    "p_max": f"{pmax_list[i]:.4f}",
+                    "p_max": f"{pmax[i]:.4f}",
                     "top3_ml": " | ".join(top3_labels_ml[i]),
                 }
                 if args.hybrid:
-                    rowo["y_pred_hybrid"] = top1_labels_hybrid[i]
-                w.writerow(rowo)
+                    rowo["y_pred_hybrid"] = hybrid_labels[i]
+                yield rowo
+
+        write_rows(args.output, out_rows(), fieldnames)
         print(f"[output] wrote predictions -> {args.output}")
 
 if __name__ == "__main__":
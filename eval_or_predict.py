@@ -3,14 +3,20 @@ import argparse, os, joblib
 import pandas as pd
 import numpy as np
 from sklearn.metrics import accuracy_score, f1_score
-from sklearn.feature_extraction.text import HashingVectorizer
 
-from extractor import parse_address
+from extractor import parse_record
 from resolver import LocationResolver
-from normalizer import normalize_text
+from normalizer import normalize_text, normalize_series, normalize_text_series
+from utils import fold_tr
+from featurizer import MemoHashingVectorizer
+from table_io import ADDRESS_COLUMNS, iter_frames, write_frame
 
 def enrich_text(addr: str, resolver=None) -> str:
-    p = parse_address(addr)
+    return enrich_parsed(addr, resolver)[0]
+
+def enrich_parsed(addr: str, resolver=None,
+                  norm_text: str = None, norm: str = None):
+    p = parse_record(addr, norm)
     if resolver:
         need_il  = not p.get("il")
         need_ilc = not p.get("ilce")
@@ -25,7 +31,7 @@ def enrich_text(addr: str, resolver=None) -> str:
             if need_il and il_res:  p["il"]   = il_res
             if need_ilc and ilce_res: p["ilce"] = ilce_res
     parts = [
-        normalize_text(addr),
+        normalize_text(addr) if norm_text is None else norm_text,
         f"__il__ {p.get('il','')}",
         f"__ilce__ {p.get('ilce','')}",
         f"__mah__ {p.get('mahalle','')}",
@@ -39,7 +45,35 @@ def enrich_text(addr: str, resolver=None) -> str:
         f"__site__ {p.get('site','')}",
         f"__apt__ {p.get('apartman','')}",
     ]
-    return " ".join([x for x in parts if x and x.strip()])
+    return " ".join([x for x in parts if x and x.strip()]), p
+
+def enrich_frame(addrs, resolver=None):
+    """enrich_parsed'in parça sürümü: normalizasyon sütun üzerinde bir kez yapılır."""
+    norm_text = normalize_text_series(addrs).tolist()
+    norm = normalize_series(addrs.str.strip()).tolist()
+    return [enrich_parsed(a, resolver, nt, n)
+            for a, nt, n in zip(addrs.tolist(), norm_text, norm)]
+
+def candidate_labels(p: dict, label_components: dict):
+    """
+    Parse bileşenleriyle eğitimde birlikte görülmüş etiketlerin kesişimi.
+    Hiç bilinen bileşen yoksa ya da kesişim boşsa None (=> tam skorlama).
+    """
+    cand = None
+    for f in ("mahalle", "ilce", "il"):
+        v = fold_tr(p.get(f) or "")
+        ids = label_components.get(f, {}).get(v) if v else None
+        if ids is None:
+            continue
+        cand = ids if cand is None else np.intersect1d(cand, ids, assume_unique=True)
+        if not cand.size:
+            return None
+    return cand
+
+def score_candidates(X, i: int, cand, coef, intercept):
+    """X'in i. satırı için yalnızca aday satırlarına karşı seyrek nokta çarpımı."""
+    a, b = X.indptr[i], X.indptr[i+1]
+    return coef[np.ix_(cand, X.indices[a:b])] @ X.data[a:b] + intercept[cand]
 
 def main():
     ap = argparse.ArgumentParser(description="Evaluate or predict labels")
@@ -49,15 +83,24 @@ def main():
     ap.add_argument("--output", default="preds.csv")
     ap.add_argument("--chunksize", type=int, default=50000)
     ap.add_argument("--topk", type=int, default=3)
+    ap.add_argument("--mmap", action="store_true",
+                    help="Katsayı matrisini kopyalamadan salt okunur eşle (işçiler tek kopyayı paylaşır)")
+    ap.add_argument("--full-scoring", action="store_true",
+                    help="Aday kümesini kullanma; her satırı tüm etiketlere karşı skorla")
     args = ap.parse_args()
 
-    data = joblib.load(args.model)
+    data = joblib.load(args.model, mmap_mode="r" if args.mmap else None)
     clf = data["clf"]
     le  = data["label_encoder"]
+    # Eski artefaktlarda aday tablosu yok => tam skorlama
+    label_components = None if args.full_scoring else data.get("label_components")
+    if label_components is not None and clf.coef_.shape[0] != len(le.classes_):
+        label_components = None  # ikili sınıflayıcı: aday skorlamaya uygun değil
+    n_cand_rows, n_cand_total = 0, 0
 
     resolver = LocationResolver.load(args.kb) if os.path.exists(args.kb) else None
 
-    vect = HashingVectorizer(
+    vect = MemoHashingVectorizer(
         n_features=2**20,
         alternate_sign=False,
         analyzer="char",
@@ -69,7 +112,7 @@ def main():
     total, gold, pred, rows_out = 0, [], [], []
     has_label = False
 
-    for chunk in pd.read_csv(args.input, chunksize=args.chunksize):
+    for chunk in iter_frames(args.input, args.chunksize, ("id", "label") + ADDRESS_COLUMNS):
         if "address" not in chunk.columns:
             if "Address" in chunk.columns: chunk["address"] = chunk["Address"]
             elif "adres" in chunk.columns: chunk["address"] = chunk["adres"]
@@ -78,18 +121,35 @@ def main():
         if "label" in chunk.columns:
             has_label = True
 
-        texts = [enrich_text(a, resolver) for a in chunk["address"].astype(str).tolist()]
-        X = vect.transform(texts)
-
-        # skorlar (decision_function) => top-k
-        scores = clf.decision_function(X)    # (n, C) veya (n,) binary ise
-        if scores.ndim == 1:
-            # çok sınıflı olmalı; güvenlik için
-            scores = scores[:, None]
-
-        # top-k indeksleri
-        topk = np.argsort(-scores, axis=1)[:, :args.topk]
-        top1 = topk[:, 0]
+        enriched = enrich_frame(chunk["address"].astype(str), resolver)
+        X = vect.transform([t for t, _ in enriched])
+
+        top1 = np.empty(X.shape[0], dtype=np.int64)
+        full_rows = np.arange(X.shape[0])
+        if label_components is not None:
+            # Aday kümesi olan satırlar: O(aday) skorlama
+            full = []
+            for i, (_, p) in enumerate(enriched):
+                cand = candidate_labels(p, label_components)
+                if cand is None:
+                    full.append(i)
+                    continue
+                s = score_candidates(X, i, cand, clf.coef_, clf.intercept_)
+                top1[i] = cand[np.argmax(s)]
+                n_cand_rows += 1
+                n_cand_total += cand.size
+            full_rows = np.array(full, dtype=np.int64)
+
+        if full_rows.size:
+            # skorlar (decision_function) => top-k
+            scores = clf.decision_function(X[full_rows])    # (n, C) veya (n,) binary ise
+            if scores.ndim == 1:
+                # çok sınıflı olmalı; güvenlik için
+                scores = scores[:, None]
+
+            # top-k indeksleri
+            topk = np.argsort(-scores, axis=1)[:, :args.topk]
+            top1[full_rows] = topk[:, 0]
         labels_top1 = le.inverse_transform(top1)
 
         # çıktı satırları
@@ -107,6 +167,11 @@ def main():
 
         total += len(chunk)
 
+    if label_components is not None and total:
+        avg = (n_cand_total / n_cand_rows) if n_cand_rows else 0.0
+        print(f"[candidates] scored={n_cand_rows:,}/{total:,} rows  avg_candidates={avg:.1f} "
+              f"of {len(le.classes_):,}  full_fallback={total - n_cand_rows:,}")
+
     # Skorlar
     if has_label and len(pred) == len(gold) and total > 0:
         acc = accuracy_score(gold, pred)
@@ -116,7 +181,7 @@ def main():
     else:
         print("[info] label kolonu yok; sadece tahmin dosyası yazılacak.")
 
-    pd.DataFrame(rows_out).to_csv(args.output, index=False)
+    write_frame(args.output, pd.DataFrame(rows_out))
     print(f"[output] wrote -> {args.output}")
 
 if __name__ == "__main__":
@@ -1,6 +1,8 @@
 # -*- coding: utf-8 -*-
-import re
-from utils import ILLER, ANCHOR_WORDS, STOPWORDS_BACK, clean_token, is_stop, unique_collapse, is_il_token
+import re, time
+from typing import Iterable, Optional, Sequence
+from utils import ILLER, ANCHOR_WORDS, STOPWORDS_BACK, PARSED_FIELDS, Parsed, ParsedBatch, \
+    clean_token, unique_collapse, is_il_token
 from normalizer import normalize_text, normalize
 
 # Regexler
@@ -8,15 +10,168 @@ RE_NO    = re.compile(r"\bno\s*([0-9]+(?:/[0-9a-z]+)?|[0-9]+[a-z]?)\b", re.I)
 RE_KAT   = re.compile(r"\bkat\s*([0-9]+)\b", re.I)
 RE_KAT_K = re.compile(r"\bk\s*[:\.]?\s*([0-9]+)\b", re.I)
 RE_DAIRE = re.compile(r"\bd\s*([0-9]+[a-z]?)\b", re.I)
-RE_BELEDIYE = re.compile(r"\b([a-zçğıöşü0-9\.\- ]+?)\s+belediyesi\b", re.I)
 RE_BLOK  = re.compile(r"\b([a-zçğıöşü]{1,2})\s*blok\b", re.I)
-RE_SITE  = re.compile(r"\b([a-zçğıöşü0-9\s\-]+?)\s+sitesi\b", re.I)
-RE_APT = re.compile(r"\b([a-zçğıöşü0-9\s\-]+?)\s+apartman(?:ı|i)?\b", re.I)
-RE_MAH = re.compile(
-    r"\b([a-zçğıöşü0-9\.\-]+(?:\s+[a-zçğıöşü0-9\.\-]+)*)\s+mahallesi\b",
-    re.I
+
+# Yukarıdaki beş desenin tek geçişlik birleşimi. Yalnızca anahtar kelime
+# (no / kat / k / d, blok için 1-2 harf) tüketilir; değer ileri bakış (?=...)
+# içinde yakalanır. Böylece bir değerin içinden başlayan başka bir alanın
+# eşleşmesi ("no 12/d5" => daire 5) kaçmaz ve her alan kendi ilk eşleşmesini
+# alır (ayrı .search() çağrılarıyla aynı sonuç). Aynı konumda iki alternatif
+# eşleşemez (no/kat/k/d sonrası rakam, blok öncesi harf ister).
+_UNIT_ALTS = (
+    r"no(?=\s*(?P<no>[0-9]+(?:/[0-9a-z]+)?|[0-9]+[a-z]?)\b)",
+    r"kat(?=\s*(?P<kat>[0-9]+)\b)",
+    r"k(?=\s*[:\.]?\s*(?P<kat_k>[0-9]+)\b)",
+    r"d(?=\s*(?P<daire>[0-9]+[a-z]?)\b)",
+)
+_BLOK_ALT = r"(?P<blok>[a-zçğıöşü]{1,2})(?=\s*blok\b)"
+# blok'suz sürüm [nkd] ön koşuluyla başlar (her kelime başında deneme yapmaz);
+# blok alternatifi her kelime başında denendiği için yalnızca metinde "blok" varsa
+_UNIT_SCAN = re.compile(r"(?=[nkd])\b(?:" + "|".join(_UNIT_ALTS) + ")", re.I)
+_UNIT_SCAN_BLOK = re.compile(r"\b(?:" + "|".join(_UNIT_ALTS + (_BLOK_ALT,)) + ")", re.I)
+
+def scan_units(norm: str) -> dict:
+    """
+    no / kat / daire / blok: RE_NO, RE_KAT (yoksa RE_KAT_K), RE_DAIRE, RE_BLOK
+    ilk eşleşmeleri, tek geçişte. norm normalize() çıktısı (küçük harf) olmalı.
+    """
+    if "blok" in norm:
+        scan, left = _UNIT_SCAN_BLOK, 4
+    else:
+        scan, left = _UNIT_SCAN, 3
+    found = {}
+    for m in scan.finditer(norm):
+        k = m.lastgroup
+        if k not in found:
+            found[k] = m.group(k)
+            if k != "kat_k":
+                left -= 1
+                if not left:  # no, kat, daire (ve blok) bulundu
+                    break
+    if "kat" not in found and "kat_k" in found:
+        found["kat"] = found["kat_k"]
+    return found
+
+# --- Çapa öncesi ifade tarayıcıları ---
+# Eski `\b([...]+?)\s+sitesi\b` / `\b([...]+(?:\s+[...]+)*)\s+mahallesi\b`
+# desenleri her başlangıç konumundan metnin sonuna kadar geri izliyordu; uzun
+# serbest metinlerde bu O(n²) demek. Aynı ilk eşleşmeyi, karakter koşularını ve
+# çapaları birer kez tarayarak doğrusal zamanda buluyoruz.
+# Her tarayıcı: (koşu deseni, \b'li başlangıç deseni, çapa deseni)
+_MAH_CH = r"[a-zçğıöşü0-9\.\-]"
+_MAH_SCAN = (
+    re.compile(_MAH_CH + r"+(?:\s+" + _MAH_CH + r"+)*", re.I),
+    re.compile(r"\b" + _MAH_CH, re.I),
+    re.compile(r"(?<!\s)(\s+)mahallesi\b", re.I),
+)
+_SITE_CH = r"[a-zçğıöşü0-9\s\-]"
+_SITE_SCAN = (
+    re.compile(_SITE_CH + "+", re.I),
+    re.compile(r"\b" + _SITE_CH, re.I),
+    re.compile(r"(?<!\s)(\s+)sitesi\b", re.I),
+)
+_APT_SCAN = (
+    _SITE_SCAN[0],
+    _SITE_SCAN[1],
+    re.compile(r"(?<!\s)(\s+)apartman(?:ı|i)?\b", re.I),
 )
 
+def _lazy_phrase_before(text: str, scan) -> str:
+    """`\b([K]+?)\s+ÇAPA\b` ile aynı ilk grubu döndürür (yoksa "")."""
+    run_re, start_re, anchor_re = scan
+    anchors = [m.span(1) for m in anchor_re.finditer(text)]
+    if not anchors:
+        return ""
+    ai = 0
+    for run in run_re.finditer(text):
+        a, b = run.span()
+        m = start_re.search(text, a, b)
+        if not m:
+            continue
+        p = m.start()
+        # Bu koşuda ve sonrasında artık kullanılamayacak çapaları at
+        while ai < len(anchors) and anchors[ai][1] <= p + 1:
+            ai += 1
+        if ai == len(anchors):
+            return ""
+        # İlk kullanılabilir çapa; \s+ içinde grubun bitebileceği en erken yer
+        ws_start, _ = anchors[ai]
+        q = max(ws_start, p + 1)
+        if q <= b:
+            return text[p:q]
+    return ""
+
+def _greedy_phrase_before(text: str, scan) -> str:
+    """`\b([K]+(?:\s+[K]+)*)\s+ÇAPA\b` ile aynı ilk grubu döndürür (yoksa "")."""
+    chain_re, start_re, anchor_re = scan
+    anchors = [m.start(1) for m in anchor_re.finditer(text)]
+    if not anchors:
+        return ""
+    ai = 0
+    for chain in chain_re.finditer(text):
+        a, b = chain.span()
+        while ai < len(anchors) and anchors[ai] < a:
+            ai += 1
+        if ai == len(anchors):
+            return ""
+        m = start_re.search(text, a, b)
+        if not m:
+            continue
+        p = m.start()
+        # Açgözlü grup: zincirdeki SON çapaya kadar uzanır
+        last = -1
+        while ai < len(anchors) and anchors[ai] < b:
+            if anchors[ai] > p:
+                last = anchors[ai]
+            ai += 1
+        if last != -1:
+            return text[p:last]
+    return ""
+
+def find_mahalle_phrase(norm: str) -> str:
+    return _greedy_phrase_before(norm, _MAH_SCAN)
+
+def find_site_phrase(norm: str) -> str:
+    return _lazy_phrase_before(norm, _SITE_SCAN)
+
+def find_apartman_phrase(norm: str) -> str:
+    return _lazy_phrase_before(norm, _APT_SCAN)
+
+# find_ilce "X / Y" taraması için karakter koşusu (re.I yok, boşluk dahil)
+_SLASH_RUN = re.compile(r"[A-Za-zÇĞİÖŞÜçğıöşü0-9\.\- ]+")
+
+def _iter_slash_pairs(base: str):
+    """
+    `([K ]+?)\s*/\s*([K ]+)` üzerindeki finditer ile aynı (sol, sağ) gruplarını
+    üretir; her karakteri en fazla birkaç kez ziyaret eder.
+    """
+    n = len(base)
+    pos = 0
+    for run in _SLASH_RUN.finditer(base):
+        a, b = run.span()
+        if a < pos:
+            continue
+        # koşunun ardından boşluk(lar) ve '/' gelmeli
+        c = b
+        while c < n and base[c].isspace():
+            c += 1
+        if c >= n or base[c] != "/":
+            continue
+        # '/' sonrası: \s* ardından en az bir koşu karakteri (gerekirse geri ver)
+        d = c + 1
+        while d < n and base[d].isspace():
+            d += 1
+        if d < n and _SLASH_RUN.match(base, d):
+            g2 = d
+        else:
+            g2 = base.rfind(" ", c + 1, d)
+            if g2 == -1:
+                continue
+        g2_end = _SLASH_RUN.match(base, g2).end()
+        # tembel sol grup: koşunun sonundaki boşluklardan önce biter
+        t = a + len(base[a:b].rstrip(" "))
+        yield base[a:max(a + 1, t)], base[g2:g2_end]
+        pos = g2_end
 # İlçe adayında kesinlikle istemediğimiz kelimeler
 ILCE_NOISE = {
     "yeni","sanayi","osb","organize","mevkii","mevkisi","bölgesi","bolgesi",
@@ -35,15 +190,19 @@ def find_il(norm: str) -> str:
     tokens = norm.split()
     for tok in reversed(tokens):
         # "fethiye/muğla" gibi birleşik tokenları da tara
-        for part in reversed(re.split(r"/", tok)):
+        for part in reversed(tok.split("/")):
             if is_il_token(part):
                 return clean_token(part).title()
     return ""
 
+_PAREN_RE = re.compile(r"\([^)]*\)")
+_BELEDIYESI_RE = re.compile(r"\b([a-zçğıöşü]+)\s+belediyesi\b")
+
 def find_ilce(norm: str, il: str) -> str:
-    base = re.sub(r"\([^)]*\)", " ", norm)
-    
-    m_bel = re.search(r"\b([a-zçğıöşü]+)\s+belediyesi\b", base)
+    # sabit alt dize ön kontrolleri: eşleşme olamayacak adreslerde regex hiç çalışmaz
+    base = _PAREN_RE.sub(" ", norm) if "(" in norm else norm
+
+    m_bel = _BELEDIYESI_RE.search(base) if "belediyesi" in base else None
     if m_bel:
         cand = clean_token(m_bel.group(1))
         if cand and not is_il_token(cand):
@@ -69,10 +228,9 @@ def find_ilce(norm: str, il: str) -> str:
 
     # 1) Regex ile genel tarama (çeşitli boşluk varyantları)
     cand = ""
-    pattern = r"([A-Za-zÇĞİÖŞÜçğıöşü0-9\.\- ]+?)\s*/\s*([A-Za-zÇĞİÖŞÜçğıöşü0-9\.\- ]+)"
-    for m in re.finditer(pattern, base):
-        left_raw  = m.group(1).strip()
-        right_raw = m.group(2).strip()
+    for left_raw, right_raw in _iter_slash_pairs(base):
+        left_raw  = left_raw.strip()
+        right_raw = right_raw.strip()
         if is_il_token(right_raw):
             ltoks = [clean_token(x) for x in left_raw.split() if clean_token(x)]
             if ltoks:
@@ -109,32 +267,43 @@ def find_ilce(norm: str, il: str) -> str:
                                 return sub.title()
 
                     return ct.title()
-                    j -= 1
+                # Son il tokenından sola yürüyüş sonuç vermediyse, daha soldaki
+                # il tokenlarından başlayan yürüyüşler de (alt küme) vermez.
+                break
     return ""
 
-def extract_anchor_phrase(norm: str, anchor: str) -> str:
-    tokens = norm.split()
-    idx = -1
-    for i, t in enumerate(tokens):
-        if clean_token(t) == anchor:  # noktalı varyantları yakalar
-            idx = i
-            break
-    if idx == -1:
-        return ""
+# Sondaki noktalama kırpması; lookbehind sayesinde yalnızca koşu başında denenir
+_PHRASE_TAIL_RE = re.compile(r"(?<![^\wçğıöşü\s\.\-])[^\wçğıöşü\s\.\-]+$")
+_SPACE_RE = re.compile(r"\s+")
+
+def _anchor_phrase_at(tokens, cleaned, idx: int) -> str:
     seg = []
     j = idx - 1
     while j >= 0:
-        w = tokens[j]
-        if is_stop(w):
+        if cleaned[j] in STOPWORDS_BACK:
             break
-        seg.append(w)
+        seg.append(tokens[j])
         j -= 1
     seg.reverse()
     phrase = " ".join(seg).strip()
-    phrase = re.sub(r"\s+", " ", phrase)
-    phrase = re.sub(r"[^\wçğıöşü\s\.\-]+$", "", phrase).strip()
+    phrase = _SPACE_RE.sub(" ", phrase)
+    phrase = _PHRASE_TAIL_RE.sub("", phrase).strip()
     return phrase.title()
 
+def _first_token_index(cleaned) -> dict:
+    first = {}
+    for i, ct in enumerate(cleaned):
+        first.setdefault(ct, i)
+    return first
+
+def extract_anchor_phrase(norm: str, anchor: str) -> str:
+    tokens = norm.split()
+    cleaned = [clean_token(t) for t in tokens]  # noktalı varyantları yakalar
+    idx = _first_token_index(cleaned).get(anchor, -1)
+    if idx == -1:
+        return ""
+    return _anchor_phrase_at(tokens, cleaned, idx)
+
 NOISE_BEFORE_STREET = {"mevkii", "mevkisi", "bolgesi", "bölgesi"}
 
 def prune_street_phrase(phrase: str) -> str:
@@ -200,7 +369,95 @@ def trim_mahalle_tail(name: str) -> str:
         return " ".join(toks[-2:]).title()
     return " ".join(toks).title()
 
-def parse_address(text: str) -> dict:
+def _site_step(norm: str, out: dict) -> None:
+    g = find_site_phrase(norm)
+    if g:
+        # "xxx sitesi" öncesini alıyoruz
+        out["site"] = clean_place_name(g).title()
+
+
+def _apartman_step(norm: str, out: dict) -> None:
+    g = find_apartman_phrase(norm)
+    if g:
+        out["apartman"] = clean_place_name(g).title()
+
+
+def _mahalle_step(norm: str, out: dict) -> None:
+    g = find_mahalle_phrase(norm)
+    if g:
+        out["mahalle"] = trim_mahalle_tail(g).title()
+
+
+def _anchor_step(norm: str, out: dict) -> None:
+    # --- Cadde / Sokak / Bulvar (anchor bazlı) ---
+    # utils.ANCHOR_WORDS beklenen ör.: {"cadde": ["caddesi","cadde","cad.","cd."], "sokak": [...], "bulvar": [...]}
+    # Tokenları bir kez temizle; her çapa için ilk konumu sözlükten al
+    tokens = norm.split()
+    cleaned = [clean_token(t) for t in tokens]
+    first_idx = _first_token_index(cleaned)
+    for canon, anchors in ANCHOR_WORDS.items():
+        for a in anchors:
+            idx = first_idx.get(a, -1)
+            if idx == -1:
+                continue
+            phrase = _anchor_phrase_at(tokens, cleaned, idx)
+            if not phrase:
+                continue
+            if canon == "sokak":
+                out["sokak"] = prune_street_phrase(phrase)
+            elif canon == "cadde":
+                out["cadde"] = clean_place_name(phrase).title()
+            elif canon == "bulvar":
+                out["bulvar"] = clean_place_name(phrase).title()
+            # aynı tür için ilk sağlam eşleşmede dur
+            if out[canon]:
+                break
+
+
+# Süre bütçesiyle çağrıldığında ayrıştırılacak en uzun girdi (gerçek adresler ~100 karakter;
+# il/ilçe genelde sonda, mahalle başta)
+BUDGET_MAX_CHARS = 512
+
+# Süre bütçesinde atlanabilecek adımlar, çözümleme değerine göre sıralı
+# (mahalle ve sokak/cadde resolver'ın ana anahtarları)
+_OPTIONAL_STEPS = (_mahalle_step, _anchor_step, _site_step, _apartman_step)
+
+
+def _parse_into(out, norm: str, deadline: float = None, degraded: bool = False) -> None:
+    """Alanları out'a (dict ya da Parsed; tüm alanlar "" ile hazır) yazar."""
+    # --- Temel sayısal alanlar (tek geçiş) ---
+    units = scan_units(norm)
+    if units:
+        out["no"] = units.get("no", "").lower()
+        out["kat"] = units.get("kat", "")
+        out["daire"] = units.get("daire", "").lower()
+        out["blok"] = units.get("blok", "").lower()
+
+    # --- İl / İlçe --- (adımlar birbirinden bağımsız; süre bütçesinde önce bunlar)
+    il = out["il"] = find_il(norm)
+    out["ilce"] = find_ilce(norm, il)
+
+    for step in _OPTIONAL_STEPS:
+        if deadline is not None and time.perf_counter() >= deadline:
+            degraded = True
+            break
+        step(norm, out)
+    if degraded:
+        out["degraded"] = "1"
+
+
+def _prepare(text: str, norm: str = None, deadline: float = None):
+    """(ham metin, normalize metin, kısaltıldı mı)"""
+    raw = (text or "").strip()
+    if deadline is not None and norm is None and len(raw) > BUDGET_MAX_CHARS:
+        half = BUDGET_MAX_CHARS // 2
+        return raw, normalize(raw[:half] + " " + raw[-half:]), True
+    if norm is None:  # toplu çağrılarda normalize_series ile önceden hesaplanabilir
+        norm = normalize(raw)
+    return raw, norm, False
+
+
+def parse_address(text: str, norm: str = None, deadline: float = None) -> dict:
     """
     CLI'nin beklediği arayüz:
     Girdi: ham adres (str)
@@ -208,10 +465,14 @@ def parse_address(text: str) -> dict:
       'address','normalized','il','ilce','mahalle','sokak','cadde','bulvar',
       'no','kat','daire','blok','site','apartman'
     }
+    deadline (time.perf_counter() cinsinden) verilirse: sayısal alanlar ve
+    il/ilçe her zaman çıkarılır; mahalle, cadde/sokak/bulvar, site ve apartman
+    adımlarından süre dolduktan sonrakiler atlanır ve çıktıya 'degraded': '1'
+    eklenir. BUDGET_MAX_CHARS'tan uzun girdi de baş ve sonu tutularak kısaltılır
+    (normalizasyon uzunlukla doğrusal, kesilemez).
+    Aynı sonucun __slots__'lu kaydı: parse_record; toplu sütunlu sürümü: parse_batch.
     """
-    raw = (text or "").strip()
-    norm = normalize(raw)
-
+    raw, norm, degraded = _prepare(text, norm, deadline)
     out = {
         "address": raw,
         "normalized": norm,
@@ -228,53 +489,30 @@ def parse_address(text: str) -> dict:
         "site": "",
         "apartman": "",
     }
+    _parse_into(out, norm, deadline, degraded)
+    return out
 
-    # --- Temel sayısal alanlar ---
-    m = RE_NO.search(norm)
-    if m: out["no"] = m.group(1).lower()
-
-    m = RE_KAT.search(norm) or RE_KAT_K.search(norm)
-    if m: out["kat"] = m.group(1)
-
-    m = RE_DAIRE.search(norm)
-    if m: out["daire"] = m.group(1).lower()
-
-    m = RE_BLOK.search(norm)
-    if m: out["blok"] = m.group(1).lower()
-
-    m = RE_SITE.search(norm)
-    if m:
-        # "xxx sitesi" öncesini alıyoruz
-        out["site"] = clean_place_name(m.group(1)).title()
-
-    m = RE_APT.search(norm)
-    if m:
-        out["apartman"] = clean_place_name(m.group(1)).title()
-
-    # --- Mahalle ---
-    m = RE_MAH.search(norm)
-    if m:
-        out["mahalle"] = trim_mahalle_tail(m.group(1)).title()
 
-    # --- Cadde / Sokak / Bulvar (anchor bazlı) ---
-    # utils.ANCHOR_WORDS beklenen ör.: {"cadde": ["caddesi","cadde","cad.","cd."], "sokak": [...], "bulvar": [...]}
-    for canon, anchors in ANCHOR_WORDS.items():
-        for a in anchors:
-            phrase = extract_anchor_phrase(norm, a)
-            if not phrase:
-                continue
-            if canon == "sokak":
-                out["sokak"] = prune_street_phrase(phrase)
-            elif canon == "cadde":
-                out["cadde"] = clean_place_name(phrase).title()
-            elif canon == "bulvar":
-                out["bulvar"] = clean_place_name(phrase).title()
-            # aynı tür için ilk sağlam eşleşmede dur
-            if out[canon]:
-                break
+def parse_record(text: str, norm: str = None, deadline: float = None) -> Parsed:
+    """parse_address ile aynı alanlar, dict yerine utils.Parsed kaydı olarak."""
+    raw, norm, degraded = _prepare(text, norm, deadline)
+    out = Parsed(raw, norm)
+    _parse_into(out, norm, deadline, degraded)
+    return out
 
-    # --- İl / İlçe ---
-    out["il"] = find_il(norm)
-    out["ilce"] = find_ilce(norm, out["il"])
 
-    return out
+def parse_batch(texts: Iterable[str], norms: Optional[Sequence[str]] = None,
+                deadline: float = None) -> ParsedBatch:
+    """
+    Çok adres için parse: sonuçlar satır nesnesi yerine sütunlarda (ParsedBatch).
+    norms: önceden hesaplanmış normalize() çıktıları (örn. normalize_series).
+    deadline tüm parti için; verilirse 'degraded' sütunu da tutulur.
+    """
+    batch = ParsedBatch(PARSED_FIELDS + ("degraded",) if deadline is not None else PARSED_FIELDS)
+    scratch = Parsed()
+    for i, text in enumerate(texts):
+        raw, norm, degraded = _prepare(text, norms[i] if norms is not None else None, deadline)
+        scratch.__init__(raw, norm)
+        _parse_into(scratch, norm, deadline, degraded)
+        batch.append(scratch)
+    return batch
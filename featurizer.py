@@ -0,0 +1,253 @@
+# featurizer.py
+# -*- coding: utf-8 -*-
+"""
+Token önbellekli char / char_wb n-gram HashingVectorizer.
+
+Adreslerde aynı sokak, mahalle ve il tokenları milyonlarca satırda tekrar eder;
+sklearn HashingVectorizer ise her satırda her n-gramı yeniden üretip hash'ler.
+MemoHashingVectorizer her tokenın hash'lenmiş n-gram indexlerini sınırlı bir
+LRU'da tutar ve CSR satırlarını önbellekteki index dizilerini art arda ekleyerek
+kurar. Çıktı matrisi HashingVectorizer ile birebir aynıdır (aynı murmurhash3,
+aynı index eşlemesi, aynı sum_duplicates + normalize adımları).
+
+  - char_wb: n-gramlar " "+token+" " içinde kalır -> anahtar token.
+  - char   : n-gramlar boşluk aşar. Boşluk içermeyen pencereler token
+             önbelleğinden; boşluk içerenler, pencerenin ilk boşluğuna göre
+             (sol kuyruk, sağ baş) sınır anahtarıyla önbellekten gelir.
+
+Desteklenmeyen ayarlarda (word analyzer, özel preprocessor/tokenizer,
+strip_accents, binary) doğrudan HashingVectorizer.transform kullanılır.
+Sklearn Pipeline içinde HashingVectorizer'ın yerine geçer; önbellek
+joblib ile kaydedilmez.
+"""
+import argparse, re, time
+from functools import lru_cache
+from typing import Callable, Iterable, List, Tuple
+
+import numpy as np
+import scipy.sparse as sp
+from sklearn.feature_extraction.text import HashingVectorizer
+from sklearn.preprocessing import normalize
+from sklearn.utils import murmurhash3_32
+
+# sklearn.feature_extraction.text._white_spaces ile aynı
+_WHITE_SPACES = re.compile(r"\s\s+")
+
+_EMPTY_IDX = np.empty(0, dtype=np.int32)
+_EMPTY_VAL = np.empty(0, dtype=np.int8)
+
+
+class MemoHashingVectorizer(HashingVectorizer):
+    def __init__(
+        self,
+        *,
+        input="content",
+        encoding="utf-8",
+        decode_error="strict",
+        strip_accents=None,
+        lowercase=True,
+        preprocessor=None,
+        tokenizer=None,
+        stop_words=None,
+        token_pattern=r"(?u)\b\w\w+\b",
+        ngram_range=(1, 1),
+        analyzer="word",
+        n_features=(2**20),
+        binary=False,
+        norm="l2",
+        alternate_sign=True,
+        dtype=np.float64,
+        cache_size=200000,
+    ):
+        super().__init__(
+            input=input, encoding=encoding, decode_error=decode_error,
+            strip_accents=strip_accents, lowercase=lowercase,
+            preprocessor=preprocessor, tokenizer=tokenizer, stop_words=stop_words,
+            token_pattern=token_pattern, ngram_range=ngram_range, analyzer=analyzer,
+            n_features=n_features, binary=binary, norm=norm,
+            alternate_sign=alternate_sign, dtype=dtype,
+        )
+        self.cache_size = cache_size
+
+    # --------- Önbellek ----------
+    def __getstate__(self):
+        # lru_cache'li kapanışlar pickle edilemez; model dosyasına önbellek yazılmaz
+        state = self.__dict__.copy()
+        state.pop("_memo", None)
+        return state
+
+    def _memo_supported(self) -> bool:
+        return (self.analyzer in ("char", "char_wb") and self.input == "content"
+                and self.preprocessor is None and self.strip_accents is None
+                and not self.binary and self.ngram_range[0] >= 1)
+
+    def _hash_grams(self, grams: Iterable[str]) -> Tuple[np.ndarray, np.ndarray]:
+        # sklearn.feature_extraction._hashing_fast.transform ile aynı eşleme
+        n_features = self.n_features
+        idx, val = [], []
+        for g in grams:
+            h = murmurhash3_32(g, seed=0, positive=False)
+            if h == -2147483648:
+                idx.append((2147483647 - (n_features - 1)) % n_features)
+            else:
+                idx.append(abs(h) % n_features)
+            val.append(1 if (h >= 0 or not self.alternate_sign) else -1)
+        if not idx:
+            return _EMPTY_IDX, _EMPTY_VAL
+        return np.asarray(idx, dtype=np.int32), np.asarray(val, dtype=np.int8)
+
+    def _build_memo(self) -> Tuple[Callable, Callable]:
+        min_n, max_n = self.ngram_range
+        size = self.cache_size  # None: sınırsız
+        wb = self.analyzer == "char_wb"
+
+        @lru_cache(maxsize=size)
+        def token_feats(tok: str):
+            if wb:
+                # sklearn _char_wb_ngrams: kısa kelime bir kez sayılır
+                w = " " + tok + " "
+                w_len = len(w)
+                grams: List[str] = []
+                for n in range(min_n, max_n + 1):
+                    offset = 0
+                    grams.append(w[offset:offset + n])
+                    while offset + n < w_len:
+                        offset += 1
+                        grams.append(w[offset:offset + n])
+                    if offset == 0:
+                        break
+                return self._hash_grams(grams)
+            t_len = len(tok)
+            return self._hash_grams(tok[i:i + n]
+                                    for n in range(min_n, max_n + 1)
+                                    for i in range(t_len - n + 1))
+
+        @lru_cache(maxsize=size)
+        def boundary_feats(left: str, right: str):
+            # ilk boşluğu len(left) konumunda olan tüm pencereler
+            ctx = left + " " + right
+            p, c_len = len(left), len(ctx)
+            return self._hash_grams(ctx[s:s + n]
+                                    for n in range(min_n, max_n + 1)
+                                    for s in range(max(0, p - n + 1), p + 1)
+                                    if s + n <= c_len)
+
+        return token_feats, boundary_feats
+
+    # --------- Dönüşüm ----------
+    def _doc_parts(self, doc: str, token_feats, boundary_feats, out: list) -> None:
+        if self.lowercase:
+            doc = doc.lower()
+        doc = _WHITE_SPACES.sub(" ", doc)
+        if self.analyzer == "char_wb":
+            for tok in doc.split():
+                out.append(token_feats(tok))
+            return
+        # char: n-gramlar metnin tamamı üzerinde; boşluklarda böl
+        ctx = self.ngram_range[1] - 1
+        segs = doc.split(" ")
+        pos = 0
+        last = len(segs) - 1
+        for j, seg in enumerate(segs):
+            if seg:
+                out.append(token_feats(seg))
+            if j < last:
+                p = pos + len(seg)
+                left = seg[-ctx:] if ctx else ""
+                out.append(boundary_feats(left, doc[p + 1:p + 1 + ctx]))
+                pos = p + 1
+
+    def transform(self, X):
+        if isinstance(X, str):
+            raise ValueError(
+                "Iterable over raw text documents expected, string object received.")
+        if not self._memo_supported():
+            return super().transform(X)
+        self._validate_ngram_range()
+        memo = self.__dict__.get("_memo")
+        if memo is None:
+            memo = self._memo = self._build_memo()
+        token_feats, boundary_feats = memo
+
+        parts: list = []
+        indptr = [0]
+        nnz = 0
+        for doc in X:
+            start = len(parts)
+            self._doc_parts(doc, token_feats, boundary_feats, parts)
+            for k in range(start, len(parts)):
+                nnz += len(parts[k][0])
+            indptr.append(nnz)
+
+        if parts:
+            indices = np.concatenate([a for a, _ in parts])
+            values = np.concatenate([v for _, v in parts]).astype(self.dtype)
+        else:
+            indices = np.empty(0, dtype=np.int32)
+            values = np.empty(0, dtype=self.dtype)
+        indptr = np.asarray(indptr, dtype=np.int64 if nnz > np.iinfo(np.int32).max else np.int32)
+
+        Xs = sp.csr_matrix((values, indices, indptr), dtype=self.dtype,
+                           shape=(len(indptr) - 1, self.n_features))
+        Xs.sum_duplicates()
+        if self.norm is not None:
+            Xs = normalize(Xs, norm=self.norm, copy=False)
+        return Xs
+
+    def cache_info(self) -> str:
+        memo = self.__dict__.get("_memo")
+        if memo is None:
+            return "empty"
+        t, b = memo[0].cache_info(), memo[1].cache_info()
+        lookups = t.hits + t.misses + b.hits + b.misses
+        rate = (t.hits + b.hits) / lookups if lookups else 0.0
+        return (f"tokens={t.currsize:,} boundaries={b.currsize:,} "
+                f"lookups={lookups:,} hit_rate={rate:.1%}")
+
+
+# --------- Doğrulama / ölçüm ----------
+def _same(a, b) -> bool:
+    return (a.shape == b.shape and a.dtype == b.dtype
+            and (a != b).nnz == 0)
+
+
+def main():
+    import pandas as pd
+
+    ap = argparse.ArgumentParser(description="MemoHashingVectorizer eşitlik ve hız ölçümü")
+    ap.add_argument("--input", required=True, help="CSV (address sütunu)")
+    ap.add_argument("--column", default="address")
+    ap.add_argument("--batch", type=int, default=5000)
+    ap.add_argument("--repeat", type=int, default=3)
+    args = ap.parse_args()
+
+    texts = pd.read_csv(args.input, dtype=str)[args.column].fillna("").tolist()
+    batches = [texts[i:i + args.batch] for i in range(0, len(texts), args.batch)]
+    configs = {
+        "char_wb/float32": dict(analyzer="char_wb", ngram_range=(3, 5), n_features=2**20,
+                                alternate_sign=False, norm="l2", dtype=np.float32),
+        "char/float64": dict(analyzer="char", ngram_range=(3, 5), n_features=2**20,
+                             alternate_sign=False, norm="l2"),
+    }
+    for name, cfg in configs.items():
+        ref, memo = HashingVectorizer(**cfg), MemoHashingVectorizer(**cfg)
+        for b in batches:
+            if not _same(ref.transform(b), memo.transform(b)):
+                raise SystemExit(f"[featurizer] {name}: matrisler farklı!")
+        t_ref = t_memo = float("inf")
+        for _ in range(args.repeat):
+            t0 = time.perf_counter()
+            for b in batches:
+                ref.transform(b)
+            t_ref = min(t_ref, time.perf_counter() - t0)
+            t0 = time.perf_counter()
+            for b in batches:
+                memo.transform(b)
+            t_memo = min(t_memo, time.perf_counter() - t0)
+        print(f"[featurizer] {name}: identical=yes  hashing={len(texts)/t_ref:,.0f} rows/s  "
+              f"memo={len(texts)/t_memo:,.0f} rows/s  speedup={t_ref/t_memo:.2f}x  "
+              f"cache: {memo.cache_info()}")
+
+
+if __name__ == "__main__":
+    main()
@@ -1,7 +1,8 @@
 # -*- coding: utf-8 -*-
-import os, csv
+import os, csv, pickle
 from typing import Dict, List, Optional, Tuple
-from utils import tr_lower, clean_token, levenshtein
+from utils import tr_lower, clean_token, levenshtein, fold_tr
+from compressed_io import open_text
 
 # Gömülü mini sözlük (istersen burada doldur)
 EMBEDDED_GAZETTEER: Dict[str, List[Dict[str,str]]] = {
@@ -10,66 +11,185 @@ EMBEDDED_GAZETTEER: Dict[str, List[Dict[str,str]]] = {
 }
 
 _gazetteer: Dict[str, List[Dict[str,str]]] = {}
+# fold_tr(anahtar) => bu biçime inen tr_lower anahtarlar ("çamlık" / "camlik")
+_folded: Dict[str, List[str]] = {}
+# hangi katmanda çözüldü (exact / folded / fuzzy / miss); satır başına bir kez
+lookup_stats: Dict[str, int] = {"exact": 0, "folded": 0, "fuzzy": 0, "miss": 0}
+# son sayılan satır ve katmanı (gazetteer + fuzzy aşamaları aynı satırı iki kez saymasın)
+_counted: list = [None, ""]
 
-def load_gazetteer(path: Optional[str]) -> None:
+# Derlenmiş anlık görüntü: <csv>.snap (pickle). CSV damgası veya biçim
+# sürümü değişince yeniden kurulur.
+SNAPSHOT_VERSION = 1
+
+def _csv_stamp(path: str) -> str:
+    st = os.stat(path)
+    return f"{st.st_size}:{st.st_mtime_ns}"
+
+def snapshot_path(path: str) -> str:
+    return path + ".snap"
+
+def _read_csv(path: str) -> Dict[str, List[Dict[str,str]]]:
+    out: Dict[str, List[Dict[str,str]]] = {}
+    seen = set()  # (mahalle, ilçe, il): liste taraması yerine O(1) tekilleştirme
+    with open_text(path, "r") as f:
+        rdr = csv.DictReader(f)
+        for r in rdr:
+            mah = tr_lower((r.get("mahalle") or "").strip())
+            ilce = (r.get("ilce") or "").strip().title()
+            il = (r.get("il") or "").strip().title()
+            if not mah or not ilce or not il:
+                continue
+            k = (mah, ilce, il)
+            if k in seen:
+                continue
+            seen.add(k)
+            out.setdefault(mah, []).append({"ilce": ilce, "il": il})
+    return out
+
+def _load_snapshot(path: str) -> Optional[Dict[str, List[Dict[str,str]]]]:
+    snap = snapshot_path(path)
+    if not os.path.exists(snap):
+        return None
+    try:
+        with open(snap, "rb") as f:
+            data = pickle.load(f)
+    except Exception:
+        return None
+    if data.get("version") != SNAPSHOT_VERSION or data.get("source") != _csv_stamp(path):
+        return None
+    return data["gazetteer"]
+
+def _save_snapshot(path: str, gaz: Dict[str, List[Dict[str,str]]]) -> None:
+    snap = snapshot_path(path)
+    tmp = snap + ".tmp"
+    try:
+        with open(tmp, "wb") as f:
+            pickle.dump({"version": SNAPSHOT_VERSION, "source": _csv_stamp(path),
+                         "gazetteer": gaz}, f, protocol=pickle.HIGHEST_PROTOCOL)
+        os.replace(tmp, snap)
+    except OSError:
+        pass  # salt okunur dizin: anlık görüntüsüz devam
+
+def load_gazetteer(path: Optional[str], use_snapshot: bool = True) -> None:
     global _gazetteer
     _gazetteer.clear()
+    _folded.clear()
     # 1) gömülü
     for mk, lst in EMBEDDED_GAZETTEER.items():
         _gazetteer[mk] = [{"ilce": x["ilce"].title(), "il": x["il"].title()} for x in lst]
-    # 2) csv (varsa)
+    # 2) csv (varsa): önce derlenmiş anlık görüntü
     if path and os.path.exists(path):
-        with open(path, "r", encoding="utf-8") as f:
-            rdr = csv.DictReader(f)
-            for r in rdr:
-                mah = tr_lower((r.get("mahalle") or "").strip())
-                ilce = (r.get("ilce") or "").strip().title()
-                il = (r.get("il") or "").strip().title()
-                if not mah or not ilce or not il: 
-                    continue
-                _gazetteer.setdefault(mah, [])
-                item = {"ilce": ilce, "il": il}
-                if item not in _gazetteer[mah]:
-                    _gazetteer[mah].append(item)
-
-def infer_from_components(mahalle: str, sokak: str, cadde: str, cur_ilce: str, cur_il: str) -> Tuple[str,str]:
-    ilce, il = cur_ilce, cur_il
+        csv_gaz = _load_snapshot(path) if use_snapshot else None
+        if csv_gaz is None:
+            csv_gaz = _read_csv(path)
+            if use_snapshot:
+                _save_snapshot(path, csv_gaz)
+        if not _gazetteer:
+            _gazetteer.update(csv_gaz)
+        else:
+            for mah, items in csv_gaz.items():
+                cur = _gazetteer.setdefault(mah, [])
+                for item in items:
+                    if item not in cur:
+                        cur.append(item)
+    # 3) aksansız tam eşleşme katmanı
+    for mk in _gazetteer:
+        _folded.setdefault(fold_tr(mk), []).append(mk)
+
+def _fuzzy_key(mah_key: str) -> Optional[str]:
+    # ≤1 düzenleme: uzunluk farkı 1'den büyük anahtarlar zaten elenir
+    best_key, best_d = None, 10**9
+    n = len(mah_key)
+    for mk in _gazetteer.keys():
+        if abs(len(mk) - n) > 1:
+            continue
+        d = levenshtein(mah_key, mk)
+        if d < best_d:
+            best_key, best_d = mk, d
+    return best_key if best_d <= 1 else None
+
+# katman güveni: aksansız eşleşme biraz, tek harf farkı daha çok şüphelidir
+TIER_CONFIDENCE: Dict[str, float] = {"exact": 1.0, "folded": 0.9, "fuzzy": 0.6}
+
+def _lookup(mahalle: str, fuzzy: bool) -> Tuple[List[Dict[str,str]], str]:
     mah_key = tr_lower(mahalle or "")
+    if mah_key in _gazetteer:
+        return _gazetteer[mah_key], "exact"
+    keys = _folded.get(fold_tr(mah_key))
+    if keys:
+        if len(keys) == 1:
+            return _gazetteer[keys[0]], "folded"
+        merged: List[Dict[str,str]] = []
+        for mk in keys:
+            for item in _gazetteer[mk]:
+                if item not in merged:
+                    merged.append(item)
+        return merged, "folded"
+    if not fuzzy:
+        return [], "miss"
+    best = _fuzzy_key(mah_key)
+    if best is None:
+        return [], "miss"
+    return _gazetteer[best], "fuzzy"
+
+def _count(tier: str, row=None) -> None:
+    """row (ayrıştırılmış kayıt) son sayılan satırsa yeni sayım yerine katmanı günceller."""
+    if row is not None and _counted[0] is row:
+        if _counted[1] == tier:
+            return
+        lookup_stats[_counted[1]] -= 1
+    lookup_stats[tier] += 1
+    _counted[0], _counted[1] = row, tier
+
+def lookup_candidates(mahalle: str, fuzzy: bool = True) -> List[Dict[str,str]]:
+    """exact (tr_lower) -> aksansız exact (fold_tr) -> fuzzy (Levenshtein ≤ 1; fuzzy=False ise atlanır)."""
+    candidates, tier = _lookup(mahalle, fuzzy)
+    _count(tier)
+    return candidates
+
+def infer_with_confidence(mahalle: str, sokak: str, cadde: str, cur_ilce: str, cur_il: str,
+                          fuzzy: bool = True, row=None) -> Tuple[str,str,float]:
+    """
+    infer_from_components + güven: katman güveni (TIER_CONFIDENCE) x adaylardan
+    dönen (il, ilçe) ile uyuşanların payı. Aday yoksa güven 0.
+    row: lookup_stats'ta aynı satırın aramaları tek sayılır (son katman geçerli).
+    """
+    ilce, il = cur_ilce, cur_il
     sok_key = tr_lower(sokak or "")
     cad_key = tr_lower(cadde or "")
 
     if not _gazetteer:
-        return ilce, il
+        return ilce, il, 0.0
 
-    # exact
-    if mah_key in _gazetteer:
-        candidates = _gazetteer[mah_key]
-    else:
-        # fuzzy (≤1)
-        best_key, best_d = None, 10**9
-        for mk in _gazetteer.keys():
-            d = levenshtein(mah_key, mk)
-            if d < best_d:
-                best_key, best_d = mk, d
-        candidates = _gazetteer.get(best_key, []) if best_d <= 1 else []
+    candidates, tier = _lookup(mahalle, fuzzy)
+    _count(tier, row)
 
     if not candidates:
-        return ilce, il
+        return ilce, il, 0.0
 
     if len(candidates) == 1:
-        return (ilce or candidates[0]["ilce"], il or candidates[0]["il"])
-
-    def score(c):
-        s = 0
-        if cad_key and tr_lower(c["ilce"]) in cad_key: s += 2
-        if sok_key and tr_lower(c["ilce"]) in sok_key: s += 2
-        if cad_key and tr_lower(c["il"])   in cad_key: s += 1
-        if sok_key and tr_lower(c["il"])   in sok_key: s += 1
-        return s
-
-    ranked = sorted(candidates, key=score, reverse=True)
-    top = ranked[0] if ranked else candidates[0]
-    bests = [c for c in ranked if score(c) == score(top)]
-    best = min(bests, key=lambda x: len(x["ilce"])) if len(bests) > 1 else top
-
-    return (ilce or best["ilce"], il or best["il"])
+        best = candidates[0]
+    else:
+        def score(c):
+            s = 0
+            if cad_key and tr_lower(c["ilce"]) in cad_key: s += 2
+            if sok_key and tr_lower(c["ilce"]) in sok_key: s += 2
+            if cad_key and tr_lower(c["il"])   in cad_key: s += 1
+            if sok_key and tr_lower(c["il"])   in sok_key: s += 1
+            return s
+
+        ranked = sorted(candidates, key=score, reverse=True)
+        top = ranked[0] if ranked else candidates[0]
+        bests = [c for c in ranked if score(c) == score(top)]
+        best = min(bests, key=lambda x: len(x["ilce"])) if len(bests) > 1 else top
+
+    ilce, il = ilce or best["ilce"], il or best["il"]
+    il_key, ilce_key = tr_lower(il), tr_lower(ilce)
+    agree = sum(1 for c in candidates if tr_lower(c["il"]) == il_key and tr_lower(c["ilce"]) == ilce_key)
+    return ilce, il, TIER_CONFIDENCE[tier] * agree / len(candidates)
+
+def infer_from_components(mahalle: str, sokak: str, cadde: str, cur_ilce: str, cur_il: str,
+                          fuzzy: bool = True) -> Tuple[str,str]:
+    ilce, il, _ = infer_with_confidence(mahalle, sokak, cadde, cur_ilce, cur_il, fuzzy)
+    return ilce, il
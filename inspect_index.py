@@ -1,35 +1,281 @@
 # inspect_index.py
-import json, argparse, re
+# -*- coding: utf-8 -*-
+"""
+Resolver index sorgulama aracı.
+İlk kullanımda index'ten (JSON ya da mapped/sharded index dizini) bir anahtar
+indexi (<kb>.keyidx.sqlite) kurulur:
+  - alan başına sıralı anahtarlar  -> önek (prefix) sorguları aralık taramasıyla
+  - alan başına trigram listeleri  -> regex sorgusunda aday anahtarları daraltır
+Index dosyası değişince (boyut/mtime) anahtar indexi yeniden kurulur.
+--repl ile index bir kez açılır, ardışık sorgular milisaniyeler içinde döner.
+"""
+import argparse, json, os, re, sqlite3, sys, time
+from array import array
+from collections import defaultdict
+from typing import Iterable, List, Optional, Set, Tuple
+
+try:
+    from re import _parser as sre_parse  # Python 3.11+
+except ImportError:  # pragma: no cover
+    import sre_parse
 
 FIELDS = {"mahalle","cadde","sokak","site","apartman"}
 
-ap = argparse.ArgumentParser()
-ap.add_argument("--kb", required=True, help="cache/gazetteer_index.json")
-ap.add_argument("--field", required=True, choices=FIELDS)
-ap.add_argument("--query", required=True, help="anahtar (normalized) içinde arama; regex veya düz metin")
-ap.add_argument("--top", type=int, default=10)
-args = ap.parse_args()
-
-with open(args.kb, "r", encoding="utf-8") as f:
-    data = json.load(f)
-
-bucket = data.get(args.field, {})
-rx = re.compile(args.query, re.I)
-
-matches = [(k, v) for k, v in bucket.items() if rx.search(k)]
-if not matches:
-    print("Eşleşme yok.")
-    raise SystemExit(0)
-
-for k, v in matches:
-    # v, kaydederken list(cc.items()) şeklindeydi: [ [[il, ilçe], count], ... ]
-    pairs = []
-    for item in v:
-        pair, cnt = item
-        il, ilce = pair if isinstance(pair, list) else (pair[0], pair[1])
-        pairs.append((cnt, il or "", ilce or ""))
-
-    pairs.sort(reverse=True)
-    print(f"\n== {k} ==")
-    for cnt, il, ilce in pairs[:args.top]:
-        print(f"  {il}/{ilce}: {cnt}")
+# re.I altında eşdeğer sayılan harfleri tek biçime indir (trigram süzgeci için)
+_FOLD = str.maketrans({"İ": "i", "I": "i", "ı": "i", "ſ": "s", "K": "k"})
+# Trigram süzgecinin güvenle kullanılabileceği karakterler
+_SAFE_LITERAL = re.compile(r"^[a-z0-9çğöşüâîû \.\-/'()]+$")
+
+
+def fold(s: str) -> str:
+    return s.translate(_FOLD).lower()
+
+
+def trigrams(s: str) -> Set[str]:
+    return {s[i:i+3] for i in range(len(s) - 2)}
+
+
+def _source_stamp(kb: str) -> str:
+    st = os.stat(kb)
+    return f"{st.st_size}:{st.st_mtime_ns}"
+
+
+def keyidx_path(kb: str) -> str:
+    # dizin yolundaki sondaki '/' dosyayı dizinin içine koymasın
+    return os.path.normpath(kb) + ".keyidx.sqlite"
+
+
+def _load_index(kb: str) -> dict:
+    """alan => {anahtar: [[[il, ilçe], sayım], ...]} (JSON index biçimi)."""
+    if not os.path.isdir(kb):
+        with open(kb, "r", encoding="utf-8") as f:
+            return json.load(f)
+    # mapped_index / sharded_index dizini: resolver ile açılır
+    from resolver import LocationResolver
+    idx = LocationResolver.load(kb).idx
+    return {field: {key: [[list(p), c] for p, c in idx[field][key].items()] for key in idx[field]}
+            for field in FIELDS if field in idx}
+
+
+# --------- Anahtar indexinin kurulumu ----------
+def build_keyidx(kb: str, out_path: str) -> None:
+    t0 = time.perf_counter()
+    data = _load_index(kb)
+    tmp = out_path + ".tmp"
+    if os.path.exists(tmp):
+        os.remove(tmp)
+    db = sqlite3.connect(tmp)
+    db.execute("CREATE TABLE meta (k TEXT PRIMARY KEY, v TEXT)")
+    db.execute("CREATE TABLE keys (id INTEGER PRIMARY KEY, field TEXT, key TEXT, pairs TEXT)")
+    db.execute("CREATE TABLE tri (field TEXT, gram TEXT, ids BLOB, PRIMARY KEY (field, gram)) WITHOUT ROWID")
+    kid = 0
+    for field in sorted(FIELDS):
+        postings = defaultdict(lambda: array("I"))
+        rows = []
+        for key in sorted(data.get(field, {})):
+            kid += 1
+            rows.append((kid, field, key, json.dumps(data[field][key], ensure_ascii=False)))
+            for g in trigrams(fold(key)):
+                postings[g].append(kid)
+        db.executemany("INSERT INTO keys VALUES (?, ?, ?, ?)", rows)
+        db.executemany("INSERT INTO tri VALUES (?, ?, ?)",
+                       ((field, g, ids.tobytes()) for g, ids in postings.items()))
+    db.execute("CREATE UNIQUE INDEX keys_field_key ON keys (field, key)")
+    db.execute("INSERT INTO meta VALUES ('source', ?)", (_source_stamp(kb),))
+    db.commit()
+    db.close()
+    os.replace(tmp, out_path)
+    print(f"[keyidx] built {kid:,} keys -> {out_path} ({time.perf_counter()-t0:.1f}s)", file=sys.stderr)
+
+
+def open_keyidx(kb: str, rebuild: bool = False) -> sqlite3.Connection:
+    path = keyidx_path(kb)
+    if not rebuild and os.path.exists(path):
+        db = sqlite3.connect(path)
+        row = db.execute("SELECT v FROM meta WHERE k = 'source'").fetchone()
+        if row and row[0] == _source_stamp(kb):
+            return db
+        db.close()
+    build_keyidx(kb, path)
+    return sqlite3.connect(path)
+
+
+# --------- Regex -> zorunlu literal parçalar ----------
+def required_literals(pattern: str) -> List[str]:
+    """Her eşleşmede mutlaka geçen literal parçaları çıkarır (emin olunamayanlar atlanır)."""
+    try:
+        parsed = sre_parse.parse(pattern, re.I)
+    except Exception:
+        return []
+    c = sre_parse  # sabitler (LITERAL, SUBPATTERN, ...) burada da erişilebilir
+    runs: List[str] = []
+
+    def walk(seq) -> None:
+        cur: List[str] = []
+        for op, av in seq:
+            if op is c.LITERAL:
+                cur.append(chr(av))
+                continue
+            if op is c.AT:  # sıfır genişlikli çapalar parçayı bölmez
+                continue
+            runs.append("".join(cur))
+            cur = []
+            if op is c.SUBPATTERN:
+                walk(av[-1])
+            elif op in (c.MAX_REPEAT, c.MIN_REPEAT) and av[0] >= 1:
+                walk(av[2])
+        runs.append("".join(cur))
+
+    walk(parsed)
+    out = []
+    for r in runs:
+        r = fold(r)
+        if len(r) >= 3 and _SAFE_LITERAL.match(r):
+            out.append(r)
+    return out
+
+
+# --------- Sorgular ----------
+def _candidates(db: sqlite3.Connection, field: str, pattern: str) -> Optional[Set[int]]:
+    grams: Set[str] = set()
+    for lit in required_literals(pattern):
+        grams |= trigrams(lit)
+    if not grams:
+        return None  # süzgeç yok: tam tarama
+    cand: Optional[Set[int]] = None
+    # en seçici trigramdan başla
+    lists = []
+    for g in grams:
+        row = db.execute("SELECT ids FROM tri WHERE field = ? AND gram = ?", (field, g)).fetchone()
+        if row is None:
+            return set()
+        ids = array("I")
+        ids.frombytes(row[0])
+        lists.append(ids)
+    lists.sort(key=len)
+    for ids in lists:
+        cand = set(ids) if cand is None else cand.intersection(ids)
+        if not cand:
+            break
+    return cand
+
+
+def query_regex(db, field: str, pattern: str) -> Iterable[Tuple[str, str]]:
+    rx = re.compile(pattern, re.I)
+    cand = _candidates(db, field, pattern)
+    if cand is None:
+        rows = db.execute("SELECT key, pairs FROM keys WHERE field = ? ORDER BY key", (field,))
+    else:
+        ids = sorted(cand)
+        rows = []
+        for i in range(0, len(ids), 900):  # SQLite parametre sınırı
+            chunk = ids[i:i+900]
+            rows.extend(db.execute(
+                f"SELECT key, pairs FROM keys WHERE id IN ({','.join('?'*len(chunk))})", chunk))
+        rows.sort()
+    for k, v in rows:
+        if rx.search(k):
+            yield k, v
+
+
+def query_prefix(db, field: str, prefix: str) -> Iterable[Tuple[str, str]]:
+    return db.execute("SELECT key, pairs FROM keys WHERE field = ? AND key >= ? AND key < ? ORDER BY key",
+                      (field, prefix, prefix + "\U0010ffff"))
+
+
+def query_exact(db, field: str, key: str) -> Iterable[Tuple[str, str]]:
+    return db.execute("SELECT key, pairs FROM keys WHERE field = ? AND key = ?", (field, key))
+
+
+def print_matches(matches: Iterable[Tuple[str, str]], top: int, limit: int = 0) -> int:
+    n = 0
+    for k, v in matches:
+        n += 1
+        if limit and n > limit:
+            continue
+        # v, kaydederken list(cc.items()) şeklindeydi: [ [[il, ilçe], count], ... ]
+        pairs = []
+        for item in json.loads(v):
+            pair, cnt = item
+            il, ilce = pair if isinstance(pair, list) else (pair[0], pair[1])
+            pairs.append((cnt, il or "", ilce or ""))
+
+        pairs.sort(reverse=True)
+        print(f"\n== {k} ==")
+        for cnt, il, ilce in pairs[:top]:
+            print(f"  {il}/{ilce}: {cnt}")
+    if not n:
+        print("Eşleşme yok.")
+    elif limit and n > limit:
+        print(f"\n... {n - limit:,} eşleşme daha (--limit {limit})")
+    return n
+
+
+REPL_HELP = """Komutlar:
+  <alan> <regex>          regex sorgusu (örn: mahalle ^gül)
+  prefix <alan> <metin>   önek sorgusu
+  key <alan> <metin>      tam anahtar
+  top <N> | limit <N>     çıktı ayarları
+  quit"""
+
+
+def repl(db, top: int, limit: int) -> None:
+    print(REPL_HELP)
+    while True:
+        try:
+            line = input("index> ").strip()
+        except EOFError:
+            break
+        if not line:
+            continue
+        if line in ("quit", "exit", "q"):
+            break
+        parts = line.split(None, 2)
+        try:
+            if parts[0] in ("top", "limit") and len(parts) == 2:
+                if parts[0] == "top":
+                    top = int(parts[1])
+                else:
+                    limit = int(parts[1])
+                continue
+            t0 = time.perf_counter()
+            if parts[0] in ("prefix", "key") and len(parts) == 3 and parts[1] in FIELDS:
+                fn = query_prefix if parts[0] == "prefix" else query_exact
+                n = print_matches(fn(db, parts[1], parts[2]), top, limit)
+            elif parts[0] in FIELDS and len(parts) >= 2:
+                n = print_matches(query_regex(db, parts[0], line.split(None, 1)[1]), top, limit)
+            else:
+                print(REPL_HELP)
+                continue
+            print(f"[{n:,} eşleşme, {(time.perf_counter()-t0)*1000:.1f} ms]")
+        except re.error as e:
+            print(f"regex hatası: {e}")
+
+
+def main():
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--kb", required=True, help="cache/gazetteer_index.json")
+    ap.add_argument("--field", choices=FIELDS)
+    ap.add_argument("--query", help="anahtar (normalized) içinde arama; regex veya düz metin")
+    ap.add_argument("--prefix", help="anahtar öneki (sıralı anahtarlar üzerinde aralık sorgusu)")
+    ap.add_argument("--top", type=int, default=10)
+    ap.add_argument("--limit", type=int, default=0, help="En fazla kaç anahtar yazılsın (0: hepsi)")
+    ap.add_argument("--repl", action="store_true", help="Etkileşimli mod: index bir kez açılır")
+    ap.add_argument("--rebuild", action="store_true", help="Anahtar indexini yeniden kur")
+    args = ap.parse_args()
+
+    if not args.repl and not (args.field and (args.query or args.prefix)):
+        ap.error("--field ile birlikte --query veya --prefix verin (ya da --repl)")
+
+    db = open_keyidx(args.kb, rebuild=args.rebuild)
+    if args.repl:
+        repl(db, args.top, args.limit)
+    elif args.prefix is not None:
+        print_matches(query_prefix(db, args.field, args.prefix), args.top, args.limit)
+    else:
+        print_matches(query_regex(db, args.field, args.query), args.top, args.limit)
+    db.close()
+
+
+if __name__ == "__main__":
+    main()
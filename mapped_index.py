@@ -0,0 +1,245 @@
+# mapped_index.py
+# -*- coding: utf-8 -*-
+"""
+LocationResolver index'inin işçiler arası paylaşılan, salt okunur dizi biçimi.
+
+JSON index her işçide json.load + Counter kurulumu demek (N işçi => N kopya).
+Bu modül index'i ham .npy dizilerine yazar; işçiler dosyaları np.load(mmap_mode="r")
+ile eşler, fiziksel bellek (page cache) tek kopyadır ve açılış milisaniyelerdir.
+
+Dizin düzeni (<out>/):
+  meta.json            sürüm, kaynak damgası, (il, ilçe) çift tablosu, alan boyutları
+  <alan>.keys.npy      uint8  - utf-8 anahtarların art arda blob'u (orijinal sıra)
+  <alan>.koff.npy      int64  - anahtar ofsetleri (n+1)
+  <alan>.boff.npy      int64  - kova ofsetleri (n+1), pair/cnt dizilerine
+  <alan>.pair.npy      int32  - çift id (kova içi orijinal Counter sırası)
+  <alan>.cnt.npy       int64  - sayım
+  <alan>.hash.npy      uint64 - sıralı 64 bit anahtar hash'leri
+  <alan>.hord.npy      int32  - hash sırası => anahtar id
+
+Kova sırası korunduğu için infer() sonuçları (eşitlikte ilk aday dahil) JSON
+index ile birebir aynıdır.
+
+Kullanım:
+  python mapped_index.py export --kb cache/gazetteer_index.json --out cache/gazetteer_index.store
+  python mapped_index.py bench  --kb cache/gazetteer_index.json --store cache/gazetteer_index.store --workers 4
+  python parser_cli.py --kb cache/gazetteer_index.store ...   # LocationResolver.load dizini tanır
+"""
+import argparse, hashlib, json, os, shutil, sys, time
+from collections import Counter
+from collections.abc import Mapping
+from typing import Dict, Iterator, List, Optional, Tuple
+
+import numpy as np
+
+STORE_VERSION = 1
+_META = "meta.json"
+
+
+def _key_hash(b: bytes) -> int:
+    return int.from_bytes(hashlib.blake2b(b, digest_size=8).digest(), "little")
+
+
+def is_mapped_index(path: Optional[str]) -> bool:
+    return bool(path) and os.path.isdir(path) and os.path.exists(os.path.join(path, _META))
+
+
+# --------- Yazma ----------
+def export_index(idx: Dict[str, Dict[str, Counter]], out_dir: str,
+                 source: str = "", key_mode: str = "text") -> None:
+    """idx[alan][anahtar] => Counter({(il, ilçe): sayı}) yapısını dizilere yazar."""
+    tmp = out_dir.rstrip("/\\") + ".tmp"
+    if os.path.exists(tmp):
+        shutil.rmtree(tmp)
+    os.makedirs(tmp)
+
+    pair_ids: Dict[Tuple[str, str], int] = {}
+    fields: Dict[str, int] = {}
+    for field, buckets in idx.items():
+        blob = bytearray()
+        koff, boff, pairs, cnts, hashes = [0], [0], [], [], []
+        for key, counter in buckets.items():
+            kb = key.encode("utf-8")
+            blob += kb
+            koff.append(len(blob))
+            hashes.append(_key_hash(kb))
+            for pair, c in counter.items():
+                pairs.append(pair_ids.setdefault(tuple(pair), len(pair_ids)))
+                cnts.append(c)
+            boff.append(len(pairs))
+        h = np.asarray(hashes, dtype=np.uint64)
+        order = np.argsort(h, kind="stable").astype(np.int32)
+        arrays = {
+            "keys": np.frombuffer(bytes(blob), dtype=np.uint8),
+            "koff": np.asarray(koff, dtype=np.int64),
+            "boff": np.asarray(boff, dtype=np.int64),
+            "pair": np.asarray(pairs, dtype=np.int32),
+            "cnt": np.asarray(cnts, dtype=np.int64),
+            "hash": h[order],
+            "hord": order,
+        }
+        for name, arr in arrays.items():
+            np.save(os.path.join(tmp, f"{field}.{name}.npy"), arr)
+        fields[field] = len(koff) - 1
+
+    pair_table = [None] * len(pair_ids)
+    for pair, i in pair_ids.items():
+        pair_table[i] = list(pair)
+    with open(os.path.join(tmp, _META), "w", encoding="utf-8") as f:
+        json.dump({"version": STORE_VERSION, "source": source, "key_mode": key_mode,
+                   "fields": fields, "pairs": pair_table}, f, ensure_ascii=False)
+    if os.path.exists(out_dir):
+        shutil.rmtree(out_dir)
+    os.replace(tmp, out_dir)
+
+
+# --------- Okuma ----------
+class MappedField(Mapping):
+    """
+    Tek alanın salt okunur görünümü; get() her çağrıda küçük bir Counter döner.
+    Dizi öznitelikleri _ önekli: Mapping API'siyle (keys(), items() ...) çakışmasın.
+    """
+
+    def __init__(self, store_dir: str, field: str, pairs: List[Tuple[str, str]]):
+        def _load(name):
+            return np.load(os.path.join(store_dir, f"{field}.{name}.npy"), mmap_mode="r")
+        self._key_bytes = _load("keys")
+        self._koff = _load("koff")
+        self._boff = _load("boff")
+        self._pair = _load("pair")
+        self._cnt = _load("cnt")
+        self._hash = _load("hash")
+        self._hord = _load("hord")
+        self.pairs = pairs
+        self.n = len(self._koff) - 1
+
+    def _key_at(self, i: int) -> bytes:
+        return self._key_bytes[self._koff[i]:self._koff[i + 1]].tobytes()
+
+    def _bucket(self, i: int) -> Counter:
+        a, b = int(self._boff[i]), int(self._boff[i + 1])
+        pairs = self.pairs
+        return Counter({pairs[p]: int(c) for p, c in zip(self._pair[a:b].tolist(), self._cnt[a:b].tolist())})
+
+    def _find(self, key: str) -> int:
+        kb = key.encode("utf-8")
+        h = np.uint64(_key_hash(kb))
+        j = int(np.searchsorted(self._hash, h))
+        while j < self.n and self._hash[j] == h:  # 64 bit çakışması: baytları karşılaştır
+            i = int(self._hord[j])
+            if self._key_at(i) == kb:
+                return i
+            j += 1
+        return -1
+
+    def get(self, key, default=None):
+        if not isinstance(key, str) or not self.n:
+            return default
+        i = self._find(key)
+        return self._bucket(i) if i >= 0 else default
+
+    def __getitem__(self, key):
+        v = self.get(key)
+        if v is None:
+            raise KeyError(key)
+        return v
+
+    def __contains__(self, key) -> bool:
+        return isinstance(key, str) and self.n > 0 and self._find(key) >= 0
+
+    def __iter__(self) -> Iterator[str]:
+        blob, koff = self._key_bytes, np.asarray(self._koff)
+        for i in range(self.n):
+            yield blob[koff[i]:koff[i + 1]].tobytes().decode("utf-8")
+
+    def __len__(self) -> int:
+        return self.n
+
+
+def store_key_mode(store_dir: str) -> str:
+    with open(os.path.join(store_dir, _META), "r", encoding="utf-8") as f:
+        return json.load(f).get("key_mode", "text")
+
+
+def open_mapped(store_dir: str) -> Dict[str, MappedField]:
+    with open(os.path.join(store_dir, _META), "r", encoding="utf-8") as f:
+        meta = json.load(f)
+    if meta.get("version") != STORE_VERSION:
+        raise ValueError(f"desteklenmeyen index sürümü: {meta.get('version')} ({store_dir})")
+    pairs = [tuple(p) for p in meta["pairs"]]
+    return {field: MappedField(store_dir, field, pairs) for field in meta["fields"]}
+
+
+# --------- Ölçüm ----------
+def _private_kb() -> int:
+    """Sürecin özel (paylaşılmayan) belleği, kB (Linux)."""
+    try:
+        with open("/proc/self/smaps_rollup") as f:
+            return sum(int(line.split()[1]) for line in f
+                       if line.startswith(("Private_Clean:", "Private_Dirty:")))
+    except OSError:
+        return -1
+
+
+def _worker(args) -> Tuple[float, int, int]:
+    path, probes = args
+    from resolver import LocationResolver
+    t0 = time.perf_counter()
+    res = LocationResolver.load(path)
+    load_s = time.perf_counter() - t0
+    hits = sum(1 for field, key in probes if res.idx[field].get(key))
+    return load_s, _private_kb(), hits
+
+
+def bench(kb: str, store: str, workers: int, n_probes: int = 2000) -> None:
+    import multiprocessing as mp
+    from resolver import LocationResolver
+
+    base = LocationResolver.load(kb)
+    mapped = LocationResolver.load(store)
+    probes = []
+    for field, d in base.idx.items():
+        for i, k in enumerate(d):
+            if i >= n_probes:
+                break
+            probes.append((field, k))
+    bad = sum(1 for field, k in probes if mapped.idx[field].get(k) != base.idx[field][k])
+    print(f"[bench] {len(probes):,} anahtar karşılaştırıldı, farklı: {bad}")
+
+    ctx = mp.get_context("spawn")  # her işçi sıfırdan yükler (pre-fork kopyası yok)
+    for name, path in (("json", kb), ("mapped", store)):
+        with ctx.Pool(workers) as pool:
+            out = pool.map(_worker, [(path, probes)] * workers)
+        loads = [o[0] for o in out]
+        priv = [o[1] for o in out]
+        print(f"[bench] {name:6s}: workers={workers} load_avg={sum(loads)/len(loads):.3f}s "
+              f"private_avg={sum(priv)/len(priv)/1024:.1f} MB total_private={sum(priv)/1024:.1f} MB")
+
+
+def main():
+    ap = argparse.ArgumentParser(description="LocationResolver index'i için paylaşılan dizi deposu")
+    sub = ap.add_subparsers(dest="cmd", required=True)
+    ex = sub.add_parser("export", help="JSON index => .npy dizin")
+    ex.add_argument("--kb", required=True)
+    ex.add_argument("--out", required=True)
+    be = sub.add_parser("bench", help="json vs mapped: işçi başına açılış süresi ve özel bellek")
+    be.add_argument("--kb", required=True)
+    be.add_argument("--store", required=True)
+    be.add_argument("--workers", type=int, default=4)
+    args = ap.parse_args()
+
+    if args.cmd == "export":
+        from resolver import LocationResolver
+        t0 = time.perf_counter()
+        res = LocationResolver.load(args.kb)
+        st = os.stat(args.kb)
+        export_index(res.idx, args.out, source=f"{st.st_size}:{st.st_mtime_ns}",
+                     key_mode=res.key_mode)
+        n = sum(len(v) for v in res.idx.values())
+        print(f"[export] {n:,} keys -> {args.out} ({time.perf_counter()-t0:.1f}s)", file=sys.stderr)
+    else:
+        bench(args.kb, args.store, args.workers)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,79 @@
+# migrate_index.py
+# -*- coding: utf-8 -*-
+"""
+Metin anahtarlı (normalize_text) LocationResolver index'ini kanonik anahtarlara
+taşır (LocationResolver.to_canonical): "Gültepe", "gultepe." ve "GÜLTEPE MAH."
+tek kovada birleşir, sayımlar toplanır. Kanonik index sorguda da aynı
+fonksiyonla anahtar üretir; biçim index dosyasında saklanır.
+
+Rapor: anahtar/çift sayısı ve dosya boyutu farkı; --holdout (il, ilce sütunlu
+CSV) verilirse resolver sonrası hâlâ il/ilçe'si eksik kalan (ML fallback'e
+düşecek) satır oranı ve doğruluk farkı.
+
+Örnek:
+  python migrate_index.py --kb cache/gazetteer_index.json --out cache/gazetteer_index.canon.json \\
+      --holdout data/test.csv
+"""
+import argparse, os, sys, time
+from typing import Dict, List
+
+from parser_cli import apply_resolver_if_needed
+from prune_index import _fmt, accuracy, load_holdout, restrict
+from resolver import LocationResolver
+
+
+def fallback_rate(res: LocationResolver, parsed: List[dict], threshold: float) -> Dict[str, float]:
+    """parser_cli akışı (ML'siz): il/ilçe eksik satırlardan kaçı resolver sonrası da eksik kalıyor."""
+    need = still = 0
+    for p in parsed:
+        if (p.get("il") or "").strip() and (p.get("ilce") or "").strip():
+            continue
+        need += 1
+        out = apply_resolver_if_needed(dict(p), res, score_threshold=threshold)
+        if not ((out.get("il") or "").strip() and (out.get("ilce") or "").strip()):
+            still += 1
+    return {"need": need, "fallback": still / (need or 1), "overall": still / (len(parsed) or 1)}
+
+
+def main():
+    ap = argparse.ArgumentParser(description="LocationResolver index'ini kanonik anahtarlara taşı")
+    ap.add_argument("--kb", required=True, help="Kaynak index (JSON ya da mapped_index dizini)")
+    ap.add_argument("--out", help="Kanonik index JSON (verilmezse sadece rapor)")
+    ap.add_argument("--holdout", help="Fallback oranı / doğruluk için il/ilce sütunlu CSV")
+    ap.add_argument("--holdout-limit", type=int, default=0)
+    ap.add_argument("--resolver-threshold", type=float, default=1.0,
+                    help="parser_cli ile aynı resolver skor eşiği (vars: 1.0)")
+    args = ap.parse_args()
+
+    t0 = time.perf_counter()
+    res = LocationResolver.load(args.kb)
+    if res.key_mode == "canonical":
+        print(f"[migrate] {args.kb} zaten kanonik; yapılacak bir şey yok.", file=sys.stderr)
+        return
+    canon = res.to_canonical()
+    print(f"[migrate] before: {_fmt(res)}")
+    print(f"[migrate] after:  {_fmt(canon)} ({time.perf_counter()-t0:.1f}s)")
+
+    if args.out:
+        canon.save(args.out)
+        before = os.path.getsize(args.kb) if os.path.isfile(args.kb) else 0
+        after = os.path.getsize(args.out)
+        print(f"[output] {args.out}: {before/1e6:.2f} MB -> {after/1e6:.2f} MB "
+              f"({(after-before)/max(before, 1):+.1%})")
+
+    if args.holdout:
+        parsed, truth = load_holdout(args.holdout, args.holdout_limit)
+        print(f"[holdout] {len(parsed):,} rows")
+        old, new = restrict(res, parsed), restrict(canon, parsed)
+        f0 = fallback_rate(old, parsed, args.resolver_threshold)
+        f1 = fallback_rate(new, parsed, args.resolver_threshold)
+        a0, a1 = accuracy(old, parsed, truth), accuracy(new, parsed, truth)
+        print(f"[holdout] fallback {f0['fallback']:.1%} -> {f1['fallback']:.1%} "
+              f"({f1['fallback']-f0['fallback']:+.1%} of {f0['need']:,} unresolved rows, "
+              f"{f1['overall']-f0['overall']:+.1%} of all rows)")
+        print(f"[holdout] il_acc {a0['il']:.4f} -> {a1['il']:.4f} ({a1['il']-a0['il']:+.4f})  "
+              f"pair_acc {a0['pair']:.4f} -> {a1['pair']:.4f} ({a1['pair']-a0['pair']:+.4f})")
+
+
+if __name__ == "__main__":
+    main()
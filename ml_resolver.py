@@ -1,8 +1,10 @@
 # ml_resolver.py
 # -*- coding: utf-8 -*-
 import os, joblib
-from typing import Optional, Tuple
+import numpy as np
+from typing import Dict, List, Optional, Sequence, Tuple
 from normalizer import normalize_text
+from utils import fold_tr
 from extractor import parse_address  # sadece type için; dışarıdan parsed veriyoruz
 
 def make_feat_for_parsed(parsed: dict) -> str:
@@ -13,16 +15,89 @@ def make_feat_for_parsed(parsed: dict) -> str:
             parts.append(f"{f}={normalize_text(v)}")
     return " | ".join(parts)
 
+# Hiyerarşik model artefaktı (train_ml_resolver.py --hierarchical):
+# {"kind": HIER_KIND, "il_pipe": Pipeline(il), "ilce_vec": HashingVectorizer,
+#  "ilce_clfs": {il: SGDClassifier | "TekIlçe"}}
+HIER_KIND = "il>ilce"
+
+def is_hierarchical(model) -> bool:
+    return isinstance(model, dict) and model.get("kind") == HIER_KIND
+
+def predict_hierarchical(model: dict, texts: Sequence[str],
+                         il_hints: Optional[Sequence[str]] = None) -> Tuple[List[str], List[float]]:
+    """
+    İki seviyeli tahmin: il sınıflayıcı (81 sınıf) -> o ilin ilçe sınıflayıcısı.
+    il_hints[i] modelin bildiği bir il ise birinci seviye atlanır.
+    Dönüş: ("Il|Ilce" etiketleri, olasılıklar)
+    """
+    il_pipe = model["il_pipe"]
+    by_fold = {fold_tr(c): c for c in il_pipe.classes_}
+    n = len(texts)
+    ils: List[str] = [""] * n
+    p_il = np.ones(n, dtype=np.float64)
+
+    # 1) İl: ipucu yoksa/bilinmiyorsa sınıflayıcı
+    need = []
+    for i in range(n):
+        hint = by_fold.get(fold_tr(il_hints[i])) if il_hints and il_hints[i] else None
+        if hint:
+            ils[i] = hint
+        else:
+            need.append(i)
+    if need:
+        P = il_pipe.predict_proba([texts[i] for i in need])
+        best = P.argmax(axis=1)
+        for j, i in enumerate(need):
+            ils[i] = il_pipe.classes_[best[j]]
+            p_il[i] = P[j, best[j]]
+
+    # 2) İlçe: aynı ile düşen satırları tek seferde skorla
+    labels: List[str] = [""] * n
+    probs = np.zeros(n, dtype=np.float64)
+    groups: Dict[str, List[int]] = {}
+    for i, il in enumerate(ils):
+        groups.setdefault(il, []).append(i)
+    for il, rows in groups.items():
+        clf = model["ilce_clfs"].get(il)
+        if clf is None:
+            continue
+        if isinstance(clf, str):  # tek ilçeli il
+            for i in rows:
+                labels[i] = f"{il}|{clf}"
+                probs[i] = p_il[i]
+            continue
+        P = clf.predict_proba(model["ilce_vec"].transform([texts[i] for i in rows]))
+        best = P.argmax(axis=1)
+        for j, i in enumerate(rows):
+            labels[i] = f"{il}|{clf.classes_[best[j]]}"
+            probs[i] = p_il[i] * P[j, best[j]]
+    return labels, probs.tolist()
+
+def load_model(path: str, mmap: bool = False):
+    """
+    mmap=True: modeldeki numpy dizileri (SGD katsayıları) dosyadan salt okunur
+    eşlenir; aynı dosyayı açan işçiler tek fiziksel kopyayı paylaşır ve açılış
+    katsayı boyutundan bağımsızdır. Sıkıştırılmış (compress=...) dump'larda
+    joblib normal yüklemeye döner.
+    """
+    return joblib.load(path, mmap_mode="r" if mmap else None)
+
 class MLResolver:
-    def __init__(self, model_path: str):
+    def __init__(self, model_path: str, mmap: bool = False):
         if not os.path.exists(model_path):
             raise FileNotFoundError(model_path)
-        self.pipe = joblib.load(model_path)
+        self.pipe = load_model(model_path, mmap=mmap)
 
     def infer(self, parsed: dict) -> Tuple[str, str, float]:
         feat = make_feat_for_parsed(parsed)
         if not feat:
             return "", "", 0.0
+        if is_hierarchical(self.pipe):
+            labels, probs = predict_hierarchical(self.pipe, [feat], [parsed.get("il") or ""])
+            if not labels[0]:
+                return "", "", 0.0
+            il, ilce = labels[0].split("|", 1)
+            return il or "", ilce or "", float(probs[0])
         proba = None
         if hasattr(self.pipe, "predict_proba"):
             probs = self.pipe.predict_proba([feat])[0]
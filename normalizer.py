@@ -1,7 +1,7 @@
 # -*- coding: utf-8 -*-
 import re
 from typing import List, Tuple
-from utils import tr_lower
+from utils import tr_lower, _TR_UPPER_MAP
 
 ABBR_MAP: List[Tuple[str,str]] = [
     (r"\bmah\.?\b", "mahallesi"),
@@ -25,38 +25,44 @@ ABBR_MAP: List[Tuple[str,str]] = [
     (r"\bk\.?\b", "kat"),
 ]
 
+# normalize() ve normalize_series() aynı derlenmiş desenleri aynı sırayla uygular
+_SEP_RE = re.compile(r"[;,|]+")
+_ABBR_RES = [(re.compile(pat), repl) for pat, repl in ABBR_MAP]
+_JOIN_KEYS = ("no", "kat", "d", "k")
+_ROAD_RES = [
+    # 864.sokak, 864sok, 147sok, 417.sk -> "864 sokak"
+    (re.compile(r"\b(\d+(?:/\d+)?)\.(?:sokak|sok|sk)\b"), r"\1 sokak"),
+    (re.compile(r"\b(\d+(?:/\d+)?)\s*(?:sok|sk)\b"),          r"\1 sokak"),
+    # 120.cad, 120cad, 2716/2.cd -> "120 caddesi" / "2716/2 caddesi"
+    (re.compile(r"\b(\d+(?:/\d+)?)\.(?:caddesi|cadde|cad|cd)\b"), r"\1 caddesi"),
+    (re.compile(r"\b(\d+(?:/\d+)?)\s*(?:cadde|cad|cd)\b"),        r"\1 caddesi"),
+    # 75.blv, 75blv, 9.bulv -> "75 bulvarı"
+    (re.compile(r"\b(\d+(?:/\d+)?)\.(?:bulvarı|bulvar|blv|bulv)\b"), r"\1 bulvarı"),
+    (re.compile(r"\b(\d+(?:/\d+)?)\s*(?:bulvarı|bulvar|blv|bulv)\b"), r"\1 bulvarı"),
+    # kat/no/d bitişmeleri ayır
+    (re.compile(r"\b(kat|no|d)\s*([0-9])"), r"\1 \2"),
+]
+_WS_RE = re.compile(r"\s+")
+
 def normalize(text: str) -> str:
     t = tr_lower(text or "")
     # Ayırıcıları sadeleştir
-    t = re.sub(r"[;,|]+", " ", t)
+    t = _SEP_RE.sub(" ", t)
 
     # Kısaltma genişlet
-    for pat, repl in ABBR_MAP:
-        t = re.sub(pat, repl, t)
+    for rx, repl in _ABBR_RES:
+        t = rx.sub(repl, t)
 
     # no/kat/d/k varyantlarını birleştir
-    for key in ["no", "kat", "d", "k"]:
+    for key in _JOIN_KEYS:
         t = t.replace(f"{key}:", f"{key} ").replace(f"{key}.", f"{key} ").replace(f"{key}/", f"{key} ")
 
-     # --- SAYILI/BİTİŞİK YOLLARIN AYRIŞTIRILMASI ---
-
-    # 864.sokak, 864sok, 147sok, 417.sk -> "864 sokak"
-    t = re.sub(r"\b(\d+(?:/\d+)?)\.(?:sokak|sok|sk)\b", r"\1 sokak", t)
-    t = re.sub(r"\b(\d+(?:/\d+)?)\s*(?:sok|sk)\b",          r"\1 sokak", t)
-
-    # 120.cad, 120cad, 2716/2.cd -> "120 caddesi" / "2716/2 caddesi"
-    t = re.sub(r"\b(\d+(?:/\d+)?)\.(?:caddesi|cadde|cad|cd)\b", r"\1 caddesi", t)
-    t = re.sub(r"\b(\d+(?:/\d+)?)\s*(?:cadde|cad|cd)\b",        r"\1 caddesi", t)
-
-    # 75.blv, 75blv, 9.bulv -> "75 bulvarı"
-    t = re.sub(r"\b(\d+(?:/\d+)?)\.(?:bulvarı|bulvar|blv|bulv)\b", r"\1 bulvarı", t)
-    t = re.sub(r"\b(\d+(?:/\d+)?)\s*(?:bulvarı|bulvar|blv|bulv)\b", r"\1 bulvarı", t)
-
-    # kat/no/d bitişmeleri ayır
-    t = re.sub(r"\b(kat|no|d)\s*([0-9])", r"\1 \2", t)
+    # --- SAYILI/BİTİŞİK YOLLARIN AYRIŞTIRILMASI ---
+    for rx, repl in _ROAD_RES:
+        t = rx.sub(repl, t)
 
     # boşluk temizle
-    t = re.sub(r"\s+", " ", t).strip()
+    t = _WS_RE.sub(" ", t).strip()
     return t
 
 # Tek tip boşluk
@@ -77,4 +83,41 @@ def normalize_text(s: str) -> str:
     s = s.replace(",", " ").replace(";", " ")
     # Bazı Unicode boşluk anomalileri vs.
     s = _SPACE_RE.sub(" ", s).strip()
-    return s
\ No newline at end of file
+    return s
+
+# --------- Sütun (pandas Series) sürümleri ----------
+def _by_unique(s, fn):
+    """fn'i yalnızca tekil değerlere uygular (adres sütunlarında tekrar çok)."""
+    import pandas as pd
+    codes, uniques = pd.factorize(s.fillna("").astype(str), sort=False)
+    out = fn(pd.Series(uniques, dtype=object)).to_numpy(dtype=object)
+    return pd.Series(out[codes], index=s.index, dtype=object)
+
+
+def _normalize_text_col(s):
+    s = s.str.translate(_TR_UPPER_MAP).str.lower()
+    s = s.str.replace(",", " ", regex=False).str.replace(";", " ", regex=False)
+    return s.str.replace(_SPACE_RE, " ", regex=True).str.strip()
+
+
+def _normalize_col(s):
+    s = s.str.translate(_TR_UPPER_MAP).str.lower()
+    s = s.str.replace(_SEP_RE, " ", regex=True)
+    for rx, repl in _ABBR_RES:
+        s = s.str.replace(rx, repl, regex=True)
+    for key in _JOIN_KEYS:
+        for sep in (":", ".", "/"):
+            s = s.str.replace(f"{key}{sep}", f"{key} ", regex=False)
+    for rx, repl in _ROAD_RES:
+        s = s.str.replace(rx, repl, regex=True)
+    return s.str.replace(_WS_RE, " ", regex=True).str.strip()
+
+
+def normalize_text_series(s):
+    """normalize_text'in Series sürümü (NaN/None => ""); sonuç skalerle birebir aynı."""
+    return _by_unique(s, _normalize_text_col)
+
+
+def normalize_series(s):
+    """normalize'ın Series sürümü (NaN/None => ""); sonuç skalerle birebir aynı."""
+    return _by_unique(s, _normalize_col)
@@ -1,14 +1,25 @@
 # parser_cli.py
 # -*- coding: utf-8 -*-
 import argparse
-import csv
 import os
 import sys
+import time
 from typing import Dict, List
 
 # Proje modülleri
-from extractor import parse_address
+from extractor import parse_record
+from normalizer import normalize
+from dedup import DedupTable
+from result_cache import ResolutionCache, artifact_fingerprint
 from resolver import LocationResolver
+from dict_matcher import DictMatcher
+from table_io import ADDRESS_COLUMNS, is_columnar, iter_rows, write_rows
+from compressed_io import codec_of
+from checkpoint import Checkpoint, ResumableCSVWriter, input_stamp
+from cascade import DEFAULT_ORDER, build_cascade, parse_order, parse_thresholds
+
+# Girdiden okunan sütunlar (sütunlu biçimlerde geri kalanı hiç okunmaz)
+INPUT_COLUMNS = ("id", "label") + ADDRESS_COLUMNS
 
 # ML fallback opsiyonel
 try:
@@ -17,11 +28,9 @@ except Exception:
     MLResolver = None  # type: ignore
 
 
-def read_csv_rows(path: str):
-    with open(path, "r", encoding="utf-8", newline="") as f:
-        rdr = csv.DictReader(f)
-        for row in rdr:
-            yield row
+def read_csv_rows(path: str, columns=None):
+    # .parquet/.arrow girdilerde yalnızca `columns` okunur (bkz. table_io)
+    yield from iter_rows(path, columns)
 
 
 def pick_address_field(row: Dict[str, str]) -> str:
@@ -35,93 +44,82 @@ def apply_resolver_if_needed(parsed: Dict[str, str],
                              resolver: LocationResolver,
                              score_threshold: float = 1.0,
                              ml_resolver=None,
-                             ml_threshold: float = 0.55) -> Dict[str, str]:
+                             ml_threshold: float = 0.55,
+                             dict_matcher: DictMatcher = None,
+                             dict_threshold: float = 0.8) -> Dict[str, str]:
     """
-    Boş il/ilçe varsa:
+    Boş il/ilçe varsa varsayılan zincirle doldurur (bkz. cascade.py):
+      0) (Opsiyonel) Bilinen ilçe/mahalle adlarının sözlük eşleşmesi ile doldur.
       1) Co-occurrence (gazetteer) ile doldur.
       2) Hâlâ eksikse ve ML modeli yüklüyse, ML fallback ile tamamla.
     """
-    need_il = not (parsed.get("il") or "").strip()
-    need_ilce = not (parsed.get("ilce") or "").strip()
-    if not (need_il or need_ilce):
-        return parsed
-
-    il_hint = (parsed.get("il") or None)
-    ilce_hint = (parsed.get("ilce") or None)
-
-    # --- 1) Gazetteer (co-occurrence) ---
-    il_res, ilce_res, score = resolver.infer(
-        mahalle=parsed.get("mahalle"),
-        sokak=parsed.get("sokak"),
-        cadde=parsed.get("cadde"),
-        site=parsed.get("site"),
-        apartman=parsed.get("apartman"),
-        il_hint=il_hint,
-        ilce_hint=ilce_hint,
-    )
+    return build_cascade(
+        DEFAULT_ORDER, resolver=resolver, dict_matcher=dict_matcher, ml_resolver=ml_resolver,
+        thresholds={"resolver": score_threshold, "ml": ml_threshold, "dict": dict_threshold},
+    ).run(parsed)
 
-    if score >= score_threshold:
-        if need_il and il_res:
-            parsed["il"] = il_res
-        if need_ilce and ilce_res:
-            parsed["ilce"] = ilce_res
-
-    # Durum güncelle
-    need_il = not (parsed.get("il") or "").strip()
-    need_ilce = not (parsed.get("ilce") or "").strip()
-
-    # --- 2) ML fallback (opsiyonel) ---
-    if (need_il or need_ilce) and ml_resolver is not None:
-        try:
-            il_m, ilce_m, p = ml_resolver.infer(parsed)
-            if p >= ml_threshold:
-                if need_il and il_m:
-                    parsed["il"] = il_m
-                if need_ilce and ilce_m:
-                    parsed["ilce"] = ilce_m
-        except Exception as e:
-            print(f"[ml] WARN: tahmin sırasında hata: {e}", file=sys.stderr)
-
-    return parsed
-
-
-def build_index_from_csv(csv_path: str, kb_path: str) -> None:
-    """CSV'yi tarayıp resolver index'ini oluşturur ve kaydeder."""
-    print(f"[resolver] building index from: {csv_path}")
-    resolver = LocationResolver()
 
-    for i, row in enumerate(read_csv_rows(csv_path), start=1):
-        addr = pick_address_field(row)
-        if not addr:
+def build_index_from_csv(csv_path: str, kb_path: str,
+                         checkpoint_every: int = 0, resume: bool = False,
+                         key_mode: str = "text") -> None:
+    """
+    CSV'yi tarayıp resolver index'ini oluşturur ve kaydeder.
+    key_mode="canonical": aksansız/noktalamasız anahtarlar (bkz. resolver.canonical_key).
+    checkpoint_every > 0: her N satırda kısmi index (<kb>.partial.json) ve
+    okunan satır sayısı (<kb>.ckpt.json) kaydedilir; resume=True ile oradan sürer.
+    """
+    print(f"[resolver] building index from: {csv_path}")
+    resolver = LocationResolver(key_mode)
+
+    ckpt, start = None, 0
+    partial = kb_path + ".partial.json"
+    if checkpoint_every > 0 or resume:
+        ckpt = Checkpoint(kb_path + ".ckpt.json",
+                          {"input": input_stamp(csv_path), "kb": os.path.abspath(kb_path),
+                           "code": artifact_fingerprint(), "key_mode": key_mode})
+        state = ckpt.load() if resume else None
+        if state:
+            resolver = LocationResolver.load(partial)
+            start = state["rows_in"]
+            print(f"[resolver] resuming after {start:,} rows ({partial})")
+        elif resume:
+            print("[resolver] WARN: kontrol noktası yok; baştan başlanıyor.", file=sys.stderr)
+
+    for i, row in enumerate(read_csv_rows(csv_path, ADDRESS_COLUMNS), start=1):
+        if i <= start:
             continue
-        parsed = parse_address(addr)
-        # Sadece il/ilçe anlamlı ise observe ekler (resolver.observe içinde filtre var)
-        resolver.observe(parsed)
+        addr = pick_address_field(row)
+        if addr:
+            parsed = parse_record(addr)
+            # Sadece il/ilçe anlamlı ise observe ekler (resolver.observe içinde filtre var)
+            resolver.observe(parsed)
         if i % 200000 == 0:
             print(f"[resolver] observed: {i:,} rows...")
+        if ckpt is not None and checkpoint_every > 0 and i % checkpoint_every == 0:
+            resolver.save(partial + ".tmp")
+            os.replace(partial + ".tmp", partial)
+            ckpt.save(rows_in=i)
 
     os.makedirs(os.path.dirname(kb_path), exist_ok=True)
     resolver.save(kb_path)
+    if ckpt is not None:
+        ckpt.clear()
+        if os.path.exists(partial):
+            os.remove(partial)
     print(f"[resolver] saved index -> {kb_path}")
 
 
-def write_output_csv(out_path: str, rows: List[Dict[str, str]]) -> None:
-    fixed_fields = [
-        "id", "address", "label",
-        "normalized", "il", "ilce",
-        "mahalle", "sokak", "cadde", "bulvar",
-        "no", "kat", "daire", "blok", "site", "apartman"
-    ]
-    fieldnames = fixed_fields
-
-    if os.path.dirname(out_path):
-        os.makedirs(os.path.dirname(out_path), exist_ok=True)
-    with open(out_path, "w", encoding="utf-8", newline="") as f:
-        w = csv.DictWriter(f, fieldnames=fieldnames)
-        w.writeheader()
-        for r in rows:
-            out = {k: r.get(k, "") for k in fieldnames}
-            w.writerow(out)
+OUTPUT_FIELDS = [
+    "id", "address", "label",
+    "normalized", "il", "ilce",
+    "mahalle", "sokak", "cadde", "bulvar",
+    "no", "kat", "daire", "blok", "site", "apartman"
+]
+
+
+def write_output_csv(out_path: str, rows: List[Dict[str, str]],
+                     fields: List[str] = OUTPUT_FIELDS) -> None:
+    write_rows(out_path, rows, fields)
     print(f"[output] wrote {len(rows):,} rows -> {out_path}")
 
 
@@ -129,32 +127,121 @@ def main():
     parser = argparse.ArgumentParser(
         description="Hepsiburada Hackathon - Address Matching/Resolution CLI"
     )
-    parser.add_argument("--input", required=False, help="Girdi CSV yolu (id,address[,label])")
-    parser.add_argument("--output", required=False, help="Çıktı CSV yolu")
+    parser.add_argument("--input", required=False, help="Girdi CSV yolu (id,address[,label]); .parquet/.arrow da olur")
+    parser.add_argument("--output", required=False, help="Çıktı yolu (.csv; .parquet/.arrow ise sütunlu yazılır)")
     parser.add_argument("--dry-run", type=int, default=0,
                         help="İlk N kaydı sadece ekrana yaz (çıktı dosyası oluşturmaz)")
     parser.add_argument("--kb", "--knowledge-cache", dest="kb_path",
                         default="cache/gazetteer_index.json",
-                        help="Resolver index dosyası (varsayılan: cache/gazetteer_index.json)")
+                        help="Resolver index dosyası (varsayılan: cache/gazetteer_index.json) "
+                             "ya da mapped_index.py / sharded_index.py export dizini")
+    parser.add_argument("--kb-ils", default=None,
+                        help="Parçalı index'te yalnızca bu illeri aç (virgüllü, örn. Izmir,Manisa); "
+                             "bölgesel işlerde bellek için")
     parser.add_argument("--build-index-from", dest="build_from", default=None,
                         help="Verilen CSV'den resolver index'i oluştur ve kaydet")
+    parser.add_argument("--canonical-keys", action="store_true",
+                        help="--build-index-from ile: anahtarları aksansız, noktalamasız ve "
+                             "sondaki çapa kelimesi (mah., sk., cd. ...) atılmış kur")
     parser.add_argument("--resolver-threshold", type=float, default=1.0,
                         help="Resolver skor eşiği (vars: 1.0). Daha düşük ise daha agresif doldurur.")
 
+    parser.add_argument("--dict-match", action="store_true",
+                        help="Resolver'dan önce index sözlüğüyle (ilçe/mahalle adları) Aho-Corasick eşleşmesi dene")
+    parser.add_argument("--dict-threshold", type=float, default=0.8,
+                        help="Sözlük eşleşmesi destek payı eşiği (vars: 0.8)")
+
+    # Çözümleme zinciri
+    parser.add_argument("--cascade", default=None,
+                        help="Aşama sırası, virgüllü: dict,resolver,gazetteer,fuzzy,ml "
+                             "(vars: dict,resolver,ml; dict yalnızca --dict-match ile)")
+    parser.add_argument("--stage-threshold", action="append", default=[], metavar="AŞAMA=DEĞER",
+                        help="Aşama eşiği (tekrarlanabilir), örn. --stage-threshold ml=0.7; "
+                             "--resolver/--ml/--dict-threshold'u ezer")
+    parser.add_argument("--gazetteer", default=None,
+                        help="gazetteer/fuzzy aşamaları için mahalle,ilce,il CSV'si")
+    parser.add_argument("--stage-metrics", default=None,
+                        help="Aşama sayaçları JSON yolu (vars: <output>.stages.json)")
+    parser.add_argument("--budget-ms", type=float, default=0.0,
+                        help="Satır başına süre bütçesi (ms). Aşılınca pahalı aşamalar (fuzzy, ml) "
+                             "ve isteğe bağlı alanlar atlanır, satır 'degraded' sütununda işaretlenir")
+
     # ML fallback opsiyonları
     parser.add_argument("--ml-model", dest="ml_model", default=None,
                         help="ML resolver model yolu (joblib). Örn: cache/ml_resolver.joblib")
     parser.add_argument("--ml-threshold", type=float, default=0.55,
                         help="ML tahmin olasılık eşiği (vars: 0.55)")
+    parser.add_argument("--ml-mmap", action="store_true",
+                        help="Model katsayılarını salt okunur eşle (işçiler tek kopyayı paylaşır)")
+
+    # Çalışma içi tekilleştirme
+    parser.add_argument("--dedup", action="store_true",
+                        help="Aynı normalize adresi bir kez çözümle, sonucu tüm satırlara dağıt")
+    parser.add_argument("--dedup-max-keys", type=int, default=200000,
+                        help="Bellekte tutulacak tekil adres sayısı; fazlası diske taşar (vars: 200000)")
+    parser.add_argument("--dedup-spill-dir", default=None,
+                        help="Taşma dosyası klasörü (vars: sistem temp)")
+
+    # Çalışmalar arası kalıcı önbellek
+    parser.add_argument("--cache", dest="cache_path", default=None,
+                        help="Kalıcı çözümleme önbelleği (SQLite). Örn: cache/resolve_cache.sqlite")
+    parser.add_argument("--cache-readonly", action="store_true",
+                        help="Önbellekten sadece oku, yeni sonuç yazma")
+    parser.add_argument("--cache-lru", type=int, default=100000,
+                        help="Bellek içi LRU ön katman boyutu (vars: 100000)")
+
+    # Kontrol noktası / devam
+    parser.add_argument("--checkpoint-every", type=int, default=0,
+                        help="Her N girdi satırında kontrol noktası yaz (0: kapalı). "
+                             "--output düz .csv olmalı; index kurulumunda kısmi index kaydedilir")
+    parser.add_argument("--resume", action="store_true",
+                        help="Son kontrol noktasından devam et (<output>.ckpt.json / <kb>.ckpt.json)")
 
     args = parser.parse_args()
+    try:
+        # sıkıştırılmış sütunlu yollar (x.parquet.gz) iş başlamadan reddedilir
+        for path in (args.input, args.output, args.build_from):
+            if path:
+                is_columnar(path)
+    except ValueError as e:
+        parser.error(str(e))
+    checkpointing = args.checkpoint_every > 0 or args.resume
+    if checkpointing and args.input and not args.output:
+        parser.error("--checkpoint-every/--resume için --output gerekli")
+    if checkpointing and args.output and (is_columnar(args.output) or codec_of(args.output)):
+        parser.error("--checkpoint-every/--resume yalnızca düz .csv çıktıyla çalışır")
 
     # 1) İstenirse index oluştur
     if args.build_from:
-        build_index_from_csv(args.build_from, args.kb_path)
+        build_index_from_csv(args.build_from, args.kb_path,
+                             checkpoint_every=args.checkpoint_every, resume=args.resume,
+                             key_mode="canonical" if args.canonical_keys else "text")
 
     # 2) Resolver'ı yükle (boş da olabilir)
-    resolver = LocationResolver.load(args.kb_path)
+    kb_ils = [s.strip() for s in (args.kb_ils or "").split(",") if s.strip()]
+    resolver = LocationResolver.load(args.kb_path, ils=kb_ils or None)
+    if kb_ils and not resolver.sharded:
+        print("[resolver] WARN: --kb-ils yalnızca sharded_index.py dizininde geçerli; yok sayılıyor.",
+              file=sys.stderr)
+
+    try:
+        order = parse_order(args.cascade) if args.cascade else \
+            [s for s in DEFAULT_ORDER if s != "dict" or args.dict_match]
+        thresholds = {"resolver": args.resolver_threshold, "ml": args.ml_threshold,
+                      "dict": args.dict_threshold}
+        thresholds.update(parse_thresholds(args.stage_threshold))
+    except ValueError as e:
+        parser.error(str(e))
+    if "gazetteer" in order or "fuzzy" in order:
+        from gazetteer import load_gazetteer
+        if not args.gazetteer:
+            print("[cascade] WARN: --gazetteer yok; yalnızca gömülü sözlük kullanılacak.", file=sys.stderr)
+        load_gazetteer(args.gazetteer)
+
+    dict_matcher = None
+    if "dict" in order:
+        dict_matcher = DictMatcher.from_resolver(resolver)
+        print(f"[dict] automaton: {len(dict_matcher.goto):,} nodes")
 
     # 2.5) ML model (opsiyonel)
     ml_resolver = None
@@ -163,11 +250,16 @@ def main():
             print("[ml] WARN: ml_resolver import edilemedi; --ml-model yok sayılacak.", file=sys.stderr)
         else:
             try:
-                ml_resolver = MLResolver(args.ml_model)
+                ml_resolver = MLResolver(args.ml_model, mmap=args.ml_mmap)
                 print(f"[ml] loaded: {args.ml_model}")
             except Exception as e:
                 print(f"[ml] WARN: model yüklenemedi: {e}", file=sys.stderr)
 
+    cascade = build_cascade(order, resolver=resolver, dict_matcher=dict_matcher,
+                            ml_resolver=ml_resolver, thresholds=thresholds, budget_ms=args.budget_ms)
+    print("[cascade] extractor -> " + " -> ".join(
+        f"{st.name}({st.threshold:g})" for st in cascade.stages))
+
     # 3) Girdi yoksa burada bitir
     if not args.input:
         if not args.build_from:
@@ -176,12 +268,85 @@ def main():
 
     # 4) Girdiyi işle
     out_rows: List[Dict[str, str]] = []
-    for i, row in enumerate(read_csv_rows(args.input)):
+    fields = OUTPUT_FIELDS + ["degraded"] if args.budget_ms > 0 else OUTPUT_FIELDS
+    dedup = DedupTable(args.dedup_max_keys, args.dedup_spill_dir) if args.dedup else None
+    cache = None
+    # sonucu etkileyen zincir ayarları (sıra + eşikler + gazetteer dosyası + açılan il parçaları)
+    cascade_extra = tuple(f"{st.name}={st.threshold!r}" for st in cascade.stages) + (
+        input_stamp(args.gazetteer) if args.gazetteer and os.path.exists(args.gazetteer) else "-",)
+    if resolver.sharded and kb_ils:
+        cascade_extra += ("ils=" + ",".join(kb_ils),)
+    if args.cache_path:
+        fp = artifact_fingerprint(
+            args.kb_path,
+            args.ml_model if ml_resolver is not None else None,
+            extra=cascade_extra,
+        )
+        cache = ResolutionCache(args.cache_path, fp, lru_size=args.cache_lru,
+                                readonly=args.cache_readonly)
+        print(f"[cache] {args.cache_path} version={fp}"
+              + (f" (purged {cache.purged:,} stale)" if cache.purged else ""))
+
+    # Kontrol noktası: çıktı satır satır diske yazılır, her N satırda
+    # (okunan satır, çıktı bayt ofseti) kaydedilir
+    ckpt, writer, start, n_out = None, None, 0, 0
+    if checkpointing and args.input:
+        ckpt = Checkpoint(args.output + ".ckpt.json", {
+            "input": input_stamp(args.input),
+            "output": os.path.abspath(args.output),
+            "fingerprint": artifact_fingerprint(
+                args.kb_path, args.ml_model if ml_resolver is not None else None,
+                extra=cascade_extra),
+            "budget_ms": args.budget_ms,
+        })
+        state = ckpt.load() if args.resume else None
+        if state and os.path.exists(args.output):
+            start, n_out = state["rows_in"], state["out_rows"]
+            cascade.load_metrics(state.get("cascade", {}))
+            writer = ResumableCSVWriter(args.output, fields, offset=state["out_bytes"])
+            print(f"[checkpoint] resuming after {start:,} input rows ({n_out:,} output rows)")
+        else:
+            if args.resume:
+                print("[checkpoint] WARN: kontrol noktası yok; baştan başlanıyor.", file=sys.stderr)
+            writer = ResumableCSVWriter(args.output, fields)
+
+    resolve_secs = 0.0
+    for i, row in enumerate(read_csv_rows(args.input, INPUT_COLUMNS)):
+        if i < start:
+            continue
+        if ckpt is not None and args.checkpoint_every > 0 and i > start and i % args.checkpoint_every == 0:
+            ckpt.save(rows_in=i, out_rows=n_out, out_bytes=writer.flush(), cascade=cascade.metrics())
         addr = pick_address_field(row)
         if not addr:
             continue
 
-        parsed = parse_address(addr)
+        # parse + resolver + ML sonucu yalnızca normalize metne bağlı;
+        # aynı normalize adres için önceki sonucu kopyala
+        parsed = None
+        from_cache = False
+        if cache is not None:
+            cached = cache.get(addr)
+            if cached is not None:
+                parsed = dict(cached)
+                from_cache = True
+
+        if parsed is None and dedup is not None:
+            key = normalize(addr)
+            cached = dedup.get(key)
+            if cached is not None:
+                parsed = dict(cached)
+
+        if parsed is None:
+            t0 = time.perf_counter()
+            # parse + il/ilçe zinciri (sözlük, co-occurrence, gazetteer, ML ...)
+            parsed = cascade.resolve(addr)
+            resolve_secs += time.perf_counter() - t0
+            # bütçe yüzünden eksik kalan sonuç saklanmaz; tekrarı tam yoldan denenir
+            if dedup is not None and not parsed.get("degraded"):
+                dedup.put(key, dict(parsed))
+
+        if cache is not None and not from_cache and not parsed.get("degraded"):
+            cache.put(addr, dict(parsed))
 
         # Orijinal id/label’i ekle (varsa)
         if "id" in row:
@@ -191,29 +356,47 @@ def main():
         # Orijinal metni de ekleyelim
         parsed["address"] = addr
 
-        # İl/ilçe’yi co-occurrence + (opsiyonel) ML fallback ile doldur
-        parsed = apply_resolver_if_needed(
-            parsed,
-            resolver,
-            score_threshold=args.resolver_threshold,
-            ml_resolver=ml_resolver,
-            ml_threshold=args.ml_threshold
-        )
-
         # Dry-run çıktı
         if args.dry_run and i < args.dry_run:
             preview = row.get("address", addr)
             print(f"[{i}] {preview}\n -> {parsed}\n")
 
-        out_rows.append(parsed)
+        if writer is not None:
+            writer.writerow(parsed)
+            n_out += 1
+        else:
+            out_rows.append(parsed)
 
         # Sadece dry-run ise ilk N kaydı gösterip yazmadan çık
         if args.dry_run and (i + 1) >= args.dry_run and not args.output:
             break
 
+    if dedup is not None:
+        # önbellekten gelen satırlar tekilleştirmeye hiç uğramaz
+        d_rows = dedup.hits + dedup.misses
+        unique = dedup.misses
+        dup = d_rows - unique
+        saved = (resolve_secs / unique) * dup if unique else 0.0
+        ratio = (dup / d_rows) if d_rows else 0.0
+        print(f"[dedup] rows={d_rows:,} unique={unique:,} duplicate_ratio={ratio:.1%} "
+              f"spilled={dedup.spilled:,} resolve_time={resolve_secs:.1f}s saved≈{saved:.1f}s")
+        dedup.close()
+    if cache is not None:
+        print(f"[cache] {cache.summary()}")
+        cache.close()
+    # önbellek/dedup'tan gelen satırlar zincire uğramaz; sayaçlar yalnızca çözümlenenler
+    print(cascade.report())
+    metrics_path = args.stage_metrics or (args.output + ".stages.json" if args.output else None)
+    if metrics_path:
+        cascade.write_metrics(metrics_path)
+
     # 5) Çıktı dosyası
-    if args.output:
-        write_output_csv(args.output, out_rows)
+    if writer is not None:
+        writer.close()
+        ckpt.clear()
+        print(f"[output] wrote {n_out:,} rows -> {args.output}")
+    elif args.output:
+        write_output_csv(args.output, out_rows, fields)
     else:
         if not args.dry_run:
             print(f"[info] {len(out_rows):,} kayıt işlendi. "
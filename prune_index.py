@@ -0,0 +1,236 @@
+# prune_index.py
+# -*- coding: utf-8 -*-
+"""
+LocationResolver index budama aracı.
+
+Kurallar (LocationResolver.pruned):
+  --min-support N   toplam sayımı N'den az olan anahtarları at
+  --top-n N         anahtar başına en sık N (il, ilçe) çiftini tut
+  --min-share P     en sık çiftin payı P'den düşük anahtarları at
+--target-mb verilirse kurallar bir ızgaradan otomatik seçilir: hedef boyutun
+altında kalan ayarlar arasından (--holdout varsa) en doğru olanı, yoksa en
+az agresif olanı. --holdout (il, ilce sütunlu CSV) ile budama öncesi/sonrası
+doğruluk raporlanır.
+
+Örnek:
+  python prune_index.py --kb cache/gazetteer_index.json --out cache/gazetteer_index.pruned.json \\
+      --target-mb 50 --holdout data/test.csv
+"""
+import argparse, itertools, json, os, sys, time
+from typing import Dict, List, Optional, Tuple
+
+import numpy as np
+
+from extractor import parse_record
+from resolver import LocationResolver, _KEYS
+from table_io import ADDRESS_COLUMNS, iter_rows
+from utils import fold_tr
+
+# Otomatik seçim ızgarası (en az agresiften başlayarak)
+GRID_MIN_SUPPORT = (1, 2, 3, 5, 10)
+GRID_TOP_N = (0, 8, 5, 3, 2, 1)
+GRID_MIN_SHARE = (0.0, 0.3, 0.5, 0.7)
+
+Setting = Tuple[int, int, float]
+
+
+# --------- Boyut tahmini ----------
+def _jlen(x) -> int:
+    return len(json.dumps(x, ensure_ascii=False).encode("utf-8"))
+
+
+class SizeModel:
+    """
+    LocationResolver.save() çıktısının bayt boyutunu ayar başına hızlı tahmin eder.
+    Anahtar başına: toplam, argmax payı, anahtar maliyeti ve ilk-k çift maliyetleri
+    numpy dizilerinde tutulur; her ayar tek bir maskeli toplamdır.
+    """
+    def __init__(self, res: LocationResolver, fields=_KEYS, top_ns=GRID_TOP_N):
+        self.top_ns = sorted({n for n in top_ns if n})
+        pair_cost: Dict[tuple, int] = {}
+        totals, shares, key_cost, full_cost, prunable = [], [], [], [], []
+        top_cost: Dict[int, List[int]] = {n: [] for n in self.top_ns}
+        self.base = 2  # {}
+        for field in _KEYS:
+            buckets = res.idx[field]
+            self.base += _jlen(field) + 4 + 2  # "alan": {} ,
+            for key, counter in buckets.items():
+                prunable.append(field in fields)
+                counts = list(counter.values())
+                tot = sum(counts)
+                totals.append(tot)
+                shares.append(max(counts) / tot if tot else 0.0)
+                key_cost.append(_jlen(key) + 4)  # "k": [ ] , (ilk çiftte ayraç yok: -2)
+                items = []
+                for pair, c in counter.items():
+                    pc = pair_cost.get(pair)
+                    if pc is None:
+                        pc = pair_cost[pair] = _jlen(list(pair))
+                    items.append((c, pc + len(str(c)) + 4 + 2))  # [p, c] ,
+                full_cost.append(sum(x for _, x in items))
+                items.sort(key=lambda t: -t[0])
+                for n in self.top_ns:
+                    top_cost[n].append(sum(x for _, x in items[:n]))
+        self.totals = np.asarray(totals, dtype=np.int64)
+        self.shares = np.asarray(shares, dtype=np.float64)
+        self.key_cost = np.asarray(key_cost, dtype=np.int64)
+        self.full_cost = np.asarray(full_cost, dtype=np.int64)
+        self.top_cost = {n: np.asarray(v, dtype=np.int64) for n, v in top_cost.items()}
+        self.prunable = np.asarray(prunable, dtype=bool)
+
+    def estimate(self, min_support: int, top_n: int, min_share: float) -> Tuple[int, int]:
+        """(tahmini bayt, kalan anahtar sayısı)"""
+        mask = ~self.prunable | ((self.totals >= max(1, min_support)) & (self.shares >= min_share))
+        items = self.full_cost
+        if top_n in self.top_cost:
+            items = np.where(self.prunable, self.top_cost[top_n], self.full_cost)
+        return int(self.base + (self.key_cost[mask] + items[mask]).sum()), int(mask.sum())
+
+
+# --------- Held-out doğruluk ----------
+def load_holdout(path: str, limit: int = 0) -> Tuple[List[dict], List[Tuple[str, str]]]:
+    parsed, truth = [], []
+    for r in iter_rows(path, ("il", "ilce") + ADDRESS_COLUMNS):
+        addr = r.get("address") or r.get("Address") or r.get("adres") or ""
+        il, ilce = (r.get("il") or "").strip(), (r.get("ilce") or "").strip()
+        if not addr or not il:
+            continue
+        parsed.append(parse_record(addr))
+        truth.append((fold_tr(il), fold_tr(ilce)))
+        if limit and len(parsed) >= limit:
+            break
+    return parsed, truth
+
+
+def restrict(res: LocationResolver, parsed: List[dict]) -> LocationResolver:
+    """Yalnızca held-out satırlarının sorgulayacağı anahtarları içeren alt index (budama anahtar başına)."""
+    sub = LocationResolver(res.key_mode)
+    for p in parsed:
+        for field in _KEYS:
+            val = p.get(field)
+            if not val:
+                continue
+            key = res.key_for(field, val)
+            bucket = res.idx[field].get(key)
+            if bucket:
+                sub.idx[field][key] = bucket
+    return sub
+
+
+def accuracy(res: LocationResolver, parsed: List[dict],
+             truth: List[Tuple[str, str]]) -> Dict[str, float]:
+    """
+    parser_cli'deki gibi: parse il/ilçe'si varsa o, yoksa resolver (ipuçlarıyla).
+    Dönüş: il doğruluğu, il|ilçe doğruluğu, resolver'ın cevap verdiği satır oranı.
+    """
+    il_h = [p.get("il") or None for p in parsed]
+    ilce_h = [p.get("ilce") or None for p in parsed]
+    ils, ilces, _ = res.infer_batch(parsed, il_h, ilce_h)
+    n = len(parsed) or 1
+    ok_il = ok_pair = answered = 0
+    for p, il_r, ilce_r, (t_il, t_ilce) in zip(parsed, ils, ilces, truth):
+        il = p.get("il") or il_r
+        ilce = p.get("ilce") or ilce_r
+        answered += bool(il_r)
+        if fold_tr(il) == t_il:
+            ok_il += 1
+            if fold_tr(ilce) == t_ilce:
+                ok_pair += 1
+    return {"il": ok_il / n, "pair": ok_pair / n, "answered": answered / n}
+
+
+# --------- Otomatik seçim ----------
+def choose_setting(sizes: SizeModel, target_bytes: int,
+                   evaluate=None, max_evals: int = 12) -> Optional[Setting]:
+    feasible = []
+    for ms, tn, sh in itertools.product(GRID_MIN_SUPPORT, GRID_TOP_N, GRID_MIN_SHARE):
+        b, _ = sizes.estimate(ms, tn, sh)
+        if b <= target_bytes:
+            feasible.append((b, (ms, tn, sh)))
+    if not feasible:
+        return None
+    feasible.sort(key=lambda t: -t[0])  # en büyük (en az budanmış) önce
+    if evaluate is None:
+        return feasible[0][1]
+    best, best_acc = None, -1.0
+    for b, st in feasible[:max_evals]:
+        acc = evaluate(st)["pair"]
+        print(f"[auto] min_support={st[0]} top_n={st[1]} min_share={st[2]:.2f} "
+              f"~{b/1e6:.2f} MB pair_acc={acc:.4f}", file=sys.stderr)
+        if acc > best_acc:
+            best, best_acc = st, acc
+    return best
+
+
+def _fmt(res: LocationResolver) -> str:
+    keys = sum(len(v) for v in res.idx.values())
+    pairs = sum(len(c) for v in res.idx.values() for c in v.values())
+    return f"keys={keys:,} pairs={pairs:,}"
+
+
+def main():
+    ap = argparse.ArgumentParser(description="LocationResolver index budama")
+    ap.add_argument("--kb", required=True, help="Kaynak index JSON")
+    ap.add_argument("--out", help="Budanmış index JSON (verilmezse sadece rapor)")
+    ap.add_argument("--min-support", type=int, default=1)
+    ap.add_argument("--top-n", type=int, default=0)
+    ap.add_argument("--min-share", type=float, default=0.0)
+    ap.add_argument("--fields", default=",".join(_KEYS),
+                    help="Budanacak alanlar (virgüllü; vars: hepsi)")
+    ap.add_argument("--target-mb", type=float, default=0.0,
+                    help="Hedef index boyutu (MB); verilirse kurallar otomatik seçilir")
+    ap.add_argument("--holdout", help="Doğruluk raporu için il/ilce sütunlu CSV")
+    ap.add_argument("--holdout-limit", type=int, default=0)
+    ap.add_argument("--max-evals", type=int, default=12,
+                    help="Otomatik seçimde held-out ile denenecek en fazla ayar")
+    args = ap.parse_args()
+
+    t0 = time.perf_counter()
+    res = LocationResolver.load(args.kb)
+    fields = tuple(f for f in args.fields.split(",") if f)
+    print(f"[load] {_fmt(res)} ({time.perf_counter()-t0:.1f}s)")
+
+    parsed, truth, sub = [], [], None
+    if args.holdout:
+        parsed, truth = load_holdout(args.holdout, args.holdout_limit)
+        sub = restrict(res, parsed)
+        print(f"[holdout] {len(parsed):,} rows")
+
+    def evaluate(st: Setting) -> Dict[str, float]:
+        return accuracy(sub.pruned(st[0], st[1], st[2], fields), parsed, truth)
+
+    setting: Setting = (args.min_support, args.top_n, args.min_share)
+    if args.target_mb > 0:
+        sizes = SizeModel(res, fields)
+        full, _ = sizes.estimate(1, 0, 0.0)
+        target = int(args.target_mb * 1e6)
+        print(f"[auto] full index ~{full/1e6:.2f} MB, target {args.target_mb:.2f} MB")
+        chosen = choose_setting(sizes, target, evaluate if parsed else None, args.max_evals)
+        if chosen is None:
+            print("[auto] Izgaradaki hiçbir ayar hedefe sığmıyor; en agresif ayar kullanılıyor.",
+                  file=sys.stderr)
+            chosen = (GRID_MIN_SUPPORT[-1], GRID_TOP_N[-1], GRID_MIN_SHARE[-1])
+        setting = chosen
+    print(f"[prune] min_support={setting[0]} top_n={setting[1]} min_share={setting[2]:.2f} "
+          f"fields={','.join(fields)}")
+
+    pruned = res.pruned(setting[0], setting[1], setting[2], fields)
+    print(f"[prune] before: {_fmt(res)}")
+    print(f"[prune] after:  {_fmt(pruned)}")
+
+    if parsed:
+        a0 = accuracy(sub, parsed, truth)
+        a1 = evaluate(setting)
+        print(f"[holdout] il_acc {a0['il']:.4f} -> {a1['il']:.4f} ({a1['il']-a0['il']:+.4f})  "
+              f"pair_acc {a0['pair']:.4f} -> {a1['pair']:.4f} ({a1['pair']-a0['pair']:+.4f})  "
+              f"answered {a0['answered']:.1%} -> {a1['answered']:.1%}")
+
+    if args.out:
+        pruned.save(args.out)
+        before = os.path.getsize(args.kb) if os.path.isfile(args.kb) else 0
+        after = os.path.getsize(args.out)
+        print(f"[output] {args.out}: {before/1e6:.2f} MB -> {after/1e6:.2f} MB")
+
+
+if __name__ == "__main__":
+    main()
@@ -1,9 +1,9 @@
 # resolver.py
-import os, json
+import os, json, re
 from collections import Counter, defaultdict
-from typing import Dict, Tuple, Optional
+from typing import Dict, List, Tuple, Optional
 from normalizer import normalize_text
-from utils import clean_token, is_il_token, STOPWORDS_BACK
+from utils import clean_token, is_il_token, fold_tr, ANCHOR_WORDS, STOPWORDS_BACK
 
 # Şüpheli/ilçe olmaz kelimeler
 ILCE_BLACKLIST = {
@@ -15,17 +15,46 @@ ILCE_BLACKLIST = {
 # Index’lenecek alanlar
 _KEYS = ("mahalle", "cadde", "sokak", "site", "apartman")
 
+# Anahtar biçimleri: "text" = normalize_text (varsayılan, eski indexler),
+# "canonical" = aksansız, noktalamasız, sondaki çapa kelimesi atılmış
+KEY_MODES = ("text", "canonical")
+_PUNCT_RE = re.compile(r"[^\w\s]+")
+_ANCHOR_SUFFIX = {f: {fold_tr(w) for w in ANCHOR_WORDS.get(f, set()) | {f}} for f in _KEYS}
+
+
+def canonical_key(field: str, val: str) -> str:
+    """"Gültepe Mah.", "gultepe" ve "GÜLTEPE mahallesi" => "gultepe"."""
+    # noktalama boşluğa çevrilir ("2716/2" => "2716 2", "27162" ile karışmasın)
+    toks = [t for t in (fold_tr(x) for x in _PUNCT_RE.sub(" ", normalize_text(val)).split()) if t]
+    suffix = _ANCHOR_SUFFIX.get(field, set())
+    while len(toks) > 1 and toks[-1] in suffix:
+        toks.pop()
+    return " ".join(toks)
+
 
 class LocationResolver:
     """
     Eşgörünüm tabanlı (co-occurrence) il/ilçe çıkarıcı.
     idx[field][normalized_key] => Counter({(il, ilçe): count})
+    key_mode "canonical" ise anahtarlar canonical_key ile üretilir; kurulumda
+    ve sorguda aynı fonksiyon kullanılır, biçim index dosyasında saklanır.
+    sharded: il parçalı dizinden yüklendi (bkz. sharded_index.py); il ipuçlu
+    sorgular yalnızca o ilin parçasına bakar.
     """
-    def __init__(self):
+    def __init__(self, key_mode: str = "text"):
+        if key_mode not in KEY_MODES:
+            raise ValueError(f"bilinmeyen key_mode: {key_mode}")
+        self.key_mode = key_mode
+        self.sharded = False
         self.idx: Dict[str, Dict[str, Counter]] = {
             k: defaultdict(Counter) for k in _KEYS
         }
 
+    def key_for(self, field: str, val: str) -> str:
+        if self.key_mode == "canonical":
+            return canonical_key(field, val)
+        return normalize_text(val)
+
     @staticmethod
     def _is_good_ilce(s: str) -> bool:
         ct = clean_token(s)
@@ -59,7 +88,7 @@ class LocationResolver:
             val = (row.get(k) or "").strip()
             if not val:
                 continue
-            key = normalize_text(val)
+            key = self.key_for(k, val)
             if not key:
                 continue
             self.idx[k][key][pair] += 1
@@ -68,32 +97,98 @@ class LocationResolver:
     def save(self, path: str):
         os.makedirs(os.path.dirname(path), exist_ok=True)
         serial = {k: {kk: list(cc.items()) for kk, cc in v.items()} for k, v in self.idx.items()}
+        if self.key_mode != "text":  # metin biçimli indexler eskisiyle bayt bayt aynı kalır
+            serial["__meta__"] = {"key_mode": self.key_mode}
         with open(path, "w", encoding="utf-8") as f:
             json.dump(serial, f, ensure_ascii=False)
 
     @classmethod
-    def load(cls, path: str) -> "LocationResolver":
+    def load(cls, path: str, ils: Optional[List[str]] = None) -> "LocationResolver":
+        """
+        JSON, mapped_index dizini ya da sharded_index dizini.
+        ils: (yalnızca parçalı dizinde) açılacak iller; diğer illerin çiftleri yüklenmez.
+        """
         inst = cls()
         if not os.path.exists(path):
             return inst
+        from sharded_index import is_sharded_index
+        if is_sharded_index(path):
+            from sharded_index import open_sharded
+            inst.key_mode, fields = open_sharded(path, ils)
+            inst.idx.update(fields)
+            inst.sharded = True
+            return inst
+        if os.path.isdir(path):
+            # mapped_index.py export çıktısı: salt okunur, işçiler arası paylaşılan diziler
+            from mapped_index import open_mapped, store_key_mode
+            inst.key_mode = store_key_mode(path)
+            inst.idx.update(open_mapped(path))
+            return inst
         with open(path, "r", encoding="utf-8") as f:
             data = json.load(f)
+        inst.key_mode = data.get("__meta__", {}).get("key_mode", "text")
         for k in _KEYS:
             for kk, items in data.get(k, {}).items():
                 inst.idx[k][kk] = Counter({tuple(p): c for p, c in items})
         return inst
 
+    # --------- Budama ----------
+    def pruned(self,
+               min_support: int = 1,
+               top_n: int = 0,
+               min_share: float = 0.0,
+               fields: Optional[Tuple[str, ...]] = None) -> "LocationResolver":
+        """
+        Budanmış kopya döner (self değişmez). Anahtar başına, sırayla:
+          - toplam sayımı min_support altında kalan anahtar atılır
+          - en sık çiftin payı (argmax/toplam) min_share altındaysa anahtar atılır
+          - top_n > 0 ise en sık top_n çift tutulur (kalanlar orijinal sırasıyla)
+        fields verilirse yalnızca o alanlar budanır; diğerleri aynen alınır.
+        Değişmeyen Counter'lar kopyalanmaz (self ile paylaşılır).
+        """
+        out = LocationResolver(self.key_mode)
+        for field, buckets in self.idx.items():
+            if fields is not None and field not in fields:
+                out.idx[field].update(buckets)
+                continue
+            dst = out.idx[field]
+            for key, counter in buckets.items():
+                total = sum(counter.values())
+                if total < min_support or not total:
+                    continue
+                if max(counter.values()) / total < min_share:
+                    continue
+                if top_n and len(counter) > top_n:
+                    # eşitlikte ilk görülen kalır (infer'deki most_common ile aynı)
+                    keep = {p for p, _ in sorted(counter.items(), key=lambda kv: -kv[1])[:top_n]}
+                    counter = Counter({p: c for p, c in counter.items() if p in keep})
+                dst[key] = counter
+        return out
+
+    def to_canonical(self) -> "LocationResolver":
+        """Metin biçimli index'i kanonik anahtarlara taşır; çakışan kovaların sayımları toplanır."""
+        if self.key_mode == "canonical":
+            return self
+        out = LocationResolver("canonical")
+        for field, buckets in self.idx.items():
+            dst = out.idx[field]
+            for key, counter in buckets.items():
+                ck = canonical_key(field, key)
+                if ck:
+                    dst[ck].update(counter)
+        return out
+
     # --------- Çıkarım ----------
-    def infer(self,
-              mahalle: Optional[str] = None,
-              sokak: Optional[str] = None,
-              cadde: Optional[str] = None,
-              site: Optional[str] = None,
-              apartman: Optional[str] = None,
-              il_hint: Optional[str] = None,
-              ilce_hint: Optional[str] = None) -> Tuple[str, str, float]:
+    def candidates(self,
+                   mahalle: Optional[str] = None,
+                   sokak: Optional[str] = None,
+                   cadde: Optional[str] = None,
+                   site: Optional[str] = None,
+                   apartman: Optional[str] = None,
+                   il_hint: Optional[str] = None,
+                   ilce_hint: Optional[str] = None) -> Counter:
         """
-        Dönüş: (il, ilçe, skor). Boşsa "".
+        Tüm adaylar: Counter{(il, ilçe): skor} (infer bunun en yükseğini döner).
         Ağırlıklar: mahalle 3.0, cadde 2.0, site 2.5, sokak 1.5, apartman 1.0
         """
         weights = {"mahalle": 3.0, "cadde": 2.0, "site": 2.5, "sokak": 1.5, "apartman": 1.0}
@@ -111,11 +206,22 @@ class LocationResolver:
             for field, val in items.items():
                 if not val:
                     continue
-                key = normalize_text(val)
-                bucket = self.idx[field].get(key)
-                if not bucket:
-                    continue
-                total = sum(bucket.values()) or 1
+                key = self.key_for(field, val)
+                if self.sharded:
+                    # ipucu varsa yalnızca o ilin parçası; toplam her zaman tüm kovanınki
+                    # (load(ils=...) kısıtı aday düşürür, skorları şişirmez)
+                    if il_hint:
+                        bucket, total = self.idx[field].get_for_il(key, il_hint)
+                    else:
+                        bucket, total = self.idx[field].get_with_total(key)
+                    if not bucket:
+                        continue
+                    total = total or 1
+                else:
+                    bucket = self.idx[field].get(key)
+                    if not bucket:
+                        continue
+                    total = sum(bucket.values()) or 1
                 w = weights[field]
                 for (il, ilce), cnt in bucket.items():
                     # il ipucunu her zaman uygula
@@ -130,8 +236,71 @@ class LocationResolver:
         cands = _collect(allow_relax=False)
         if not cands:
             cands = _collect(allow_relax=True)
+        return cands
+
+    def infer(self,
+              mahalle: Optional[str] = None,
+              sokak: Optional[str] = None,
+              cadde: Optional[str] = None,
+              site: Optional[str] = None,
+              apartman: Optional[str] = None,
+              il_hint: Optional[str] = None,
+              ilce_hint: Optional[str] = None) -> Tuple[str, str, float]:
+        """Dönüş: (il, ilçe, skor). Boşsa ""."""
+        cands = self.candidates(mahalle, sokak, cadde, site, apartman, il_hint, ilce_hint)
         if not cands:
             return "", "", 0.0
 
         (il, ilce), score = cands.most_common(1)[0]
         return il or "", ilce or "", float(score)
+
+    def infer_batch(self,
+                    rows: List[Dict[str, str]],
+                    il_hints: Optional[List[Optional[str]]] = None,
+                    ilce_hints: Optional[List[Optional[str]]] = None
+                    ) -> Tuple[List[str], List[str], List[float]]:
+        """
+        Satır listesi için infer(). Aynı alan değerleri + ipuçları tekrar
+        ettiğinde sonuç bir kez hesaplanır (adres verisinde çok sık).
+        Dönüş: (il listesi, ilçe listesi, skor listesi)
+        """
+        memo: Dict[tuple, Tuple[str, str, float]] = {}
+        ils, ilces, scores = [], [], []
+        for i, r in enumerate(rows):
+            il_h = il_hints[i] if il_hints else None
+            ilce_h = ilce_hints[i] if ilce_hints else None
+            key = tuple(r.get(k) or None for k in _KEYS) + (il_h, ilce_h)
+            res = memo.get(key)
+            if res is None:
+                res = self.infer(
+                    mahalle=r.get("mahalle"),
+                    sokak=r.get("sokak"),
+                    cadde=r.get("cadde"),
+                    site=r.get("site"),
+                    apartman=r.get("apartman"),
+                    il_hint=il_h,
+                    ilce_hint=ilce_h,
+                )
+                memo[key] = res
+            ils.append(res[0])
+            ilces.append(res[1])
+            scores.append(res[2])
+        return ils, ilces, scores
+
+    def candidates_batch(self, rows: List[Dict[str, str]]) -> List[Counter]:
+        """Satır listesi için candidates(); aynı alan değerleri bir kez hesaplanır (ortak Counter)."""
+        memo: Dict[tuple, Counter] = {}
+        out = []
+        for r in rows:
+            key = tuple(r.get(k) or None for k in _KEYS)
+            c = memo.get(key)
+            if c is None:
+                c = memo[key] = self.candidates(
+                    mahalle=r.get("mahalle"),
+                    sokak=r.get("sokak"),
+                    cadde=r.get("cadde"),
+                    site=r.get("site"),
+                    apartman=r.get("apartman"),
+                )
+            out.append(c)
+        return out
@@ -0,0 +1,130 @@
+# result_cache.py
+# -*- coding: utf-8 -*-
+"""
+Çalışmalar arası kalıcı çözümleme önbelleği (SQLite + bellek içi LRU ön katman).
+Anahtar: sha1(ham adres) + sürüm parmak izi. Parmak izi; çıkarıcı/çözümleyici
+kodunu, index dosyasını, ML modelini ve sonucu etkileyen ayarları kapsar.
+Parmak izi değişince eski kayıtlar açılışta silinir.
+"""
+import hashlib, json, os, sqlite3
+from collections import OrderedDict
+from typing import Dict, Iterable, Optional
+
+# Sonucu belirleyen kaynak dosyalar (parse + resolver + ML fallback zinciri)
+_CODE_FILES = (
+    "utils.py", "normalizer.py", "extractor.py", "resolver.py",
+    "dict_matcher.py", "ml_resolver.py", "parser_cli.py", "cascade.py", "gazetteer.py",
+    "sharded_index.py", "featurizer.py", "mapped_index.py",
+)
+_HERE = os.path.dirname(os.path.abspath(__file__))
+
+
+def _file_stamp(path: Optional[str]) -> str:
+    # Büyük artefaktları her açılışta okumamak için boyut + mtime yeterli
+    if not path or not os.path.exists(path):
+        return "-"
+    st = os.stat(path)
+    return f"{os.path.abspath(path)}:{st.st_size}:{st.st_mtime_ns}"
+
+
+def artifact_fingerprint(kb_path: Optional[str] = None,
+                         model_path: Optional[str] = None,
+                         extra: Iterable[str] = ()) -> str:
+    h = hashlib.sha1()
+    for name in _CODE_FILES:
+        p = os.path.join(_HERE, name)
+        if os.path.exists(p):
+            with open(p, "rb") as f:
+                h.update(name.encode() + b"\0" + f.read())
+    h.update(_file_stamp(kb_path).encode())
+    h.update(_file_stamp(model_path).encode())
+    for x in extra:
+        h.update(b"\0" + str(x).encode("utf-8"))
+    return h.hexdigest()[:16]
+
+
+class ResolutionCache:
+    def __init__(self, path: str, fingerprint: str,
+                 lru_size: int = 100000, readonly: bool = False,
+                 commit_every: int = 10000):
+        if os.path.dirname(path):
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+        self.path = path
+        self.version = fingerprint
+        self.readonly = readonly
+        self.lru_size = max(0, int(lru_size))
+        self.commit_every = commit_every
+        self.lru: "OrderedDict[bytes, Dict[str, str]]" = OrderedDict()
+        self._pending = 0
+        # istatistik
+        self.mem_hits = 0
+        self.disk_hits = 0
+        self.misses = 0
+        self.writes = 0
+        self.purged = 0
+
+        self.db = sqlite3.connect(path)
+        self.db.execute("CREATE TABLE IF NOT EXISTS meta (k TEXT PRIMARY KEY, v TEXT)")
+        self.db.execute("CREATE TABLE IF NOT EXISTS cache ("
+                        "k BLOB NOT NULL, version TEXT NOT NULL, v TEXT NOT NULL, "
+                        "PRIMARY KEY (k, version)) WITHOUT ROWID")
+        row = self.db.execute("SELECT v FROM meta WHERE k = 'version'").fetchone()
+        if not readonly and (row is None or row[0] != fingerprint):
+            # artefakt/kod değişti: eski sürüm kayıtları geçersiz
+            cur = self.db.execute("DELETE FROM cache WHERE version != ?", (fingerprint,))
+            self.purged = cur.rowcount if cur.rowcount and cur.rowcount > 0 else 0
+            self.db.execute("INSERT OR REPLACE INTO meta VALUES ('version', ?)", (fingerprint,))
+            self.db.commit()
+
+    @staticmethod
+    def _key(addr: str) -> bytes:
+        return hashlib.sha1(addr.encode("utf-8")).digest()
+
+    def _remember(self, k: bytes, rec: Dict[str, str]) -> None:
+        if not self.lru_size:
+            return
+        self.lru[k] = rec
+        self.lru.move_to_end(k)
+        while len(self.lru) > self.lru_size:
+            self.lru.popitem(last=False)
+
+    def get(self, addr: str) -> Optional[Dict[str, str]]:
+        k = self._key(addr)
+        rec = self.lru.get(k)
+        if rec is not None:
+            self.lru.move_to_end(k)
+            self.mem_hits += 1
+            return rec
+        row = self.db.execute("SELECT v FROM cache WHERE k = ? AND version = ?",
+                              (k, self.version)).fetchone()
+        if row is None:
+            self.misses += 1
+            return None
+        rec = json.loads(row[0])
+        self._remember(k, rec)
+        self.disk_hits += 1
+        return rec
+
+    def put(self, addr: str, rec: Dict[str, str]) -> None:
+        k = self._key(addr)
+        self._remember(k, rec)
+        if self.readonly:
+            return
+        self.db.execute("INSERT OR REPLACE INTO cache VALUES (?, ?, ?)",
+                        (k, self.version, json.dumps(rec, ensure_ascii=False)))
+        self.writes += 1
+        self._pending += 1
+        if self._pending >= self.commit_every:
+            self.db.commit()
+            self._pending = 0
+
+    def summary(self) -> str:
+        lookups = self.mem_hits + self.disk_hits + self.misses
+        rate = ((self.mem_hits + self.disk_hits) / lookups) if lookups else 0.0
+        return (f"lookups={lookups:,} mem_hits={self.mem_hits:,} disk_hits={self.disk_hits:,} "
+                f"hit_rate={rate:.1%} writes={self.writes:,} purged_stale={self.purged:,}")
+
+    def close(self) -> None:
+        if not self.readonly:
+            self.db.commit()
+        self.db.close()
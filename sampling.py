@@ -0,0 +1,94 @@
+# sampling.py
+# -*- coding: utf-8 -*-
+"""
+Tek geçişte, etikete göre tabakalı rezervuar örnekleme.
+
+Her etiketin kendi rezervuarı vardır (Algorithm R: o etiketin görülen tüm
+satırları arasından eşit olasılıklı örnek). İki sınır uygulanır:
+  per_class_cap  bir etiketten en fazla kaç satır (0: sınırsız)
+  budget         toplam satır (0: sınırsız)
+Toplam bütçeyi aşınca o an en büyük rezervuardan rastgele bir satır atılır ve
+o etiketin kapasitesi bir azalır. Sonuç max-min adil paylaşımdır: küçük
+sınıflar tamamen kalır, büyük sınıflar eşit paya iner. Bellek O(budget);
+dosya sırasından bağımsızdır (ilk N satırı almanın aksine).
+
+Kullanım:
+  rs = StratifiedReservoir(budget=200000, per_class_cap=2000, seed=0)
+  for item, label in stream: rs.add(label, item)
+  sample = rs.items()          # dosya sırasında
+"""
+import heapq, random
+from typing import Any, Dict, Hashable, List, Tuple
+
+
+class StratifiedReservoir:
+    def __init__(self, budget: int = 0, per_class_cap: int = 0, seed: int = 0):
+        self.budget = max(0, int(budget))
+        self.per_class_cap = max(0, int(per_class_cap))
+        self.rng = random.Random(seed)
+        self.res: Dict[Hashable, List[Tuple[int, Any]]] = {}
+        self.cap: Dict[Hashable, int] = {}
+        self.seen: Dict[Hashable, int] = {}
+        self.total = 0   # rezervuarlardaki satır
+        self.n = 0       # görülen satır
+        self._heap: List[Tuple[int, int, Hashable]] = []  # (-boyut, sıra, etiket), tembel
+        self._order: Dict[Hashable, int] = {}
+
+    def _limit(self, label) -> int:
+        c = self.cap.get(label)
+        if c is None:
+            c = self.per_class_cap or -1
+        return c
+
+    def _push(self, label) -> None:
+        heapq.heappush(self._heap, (-len(self.res[label]), self._order[label], label))
+
+    def _evict_largest(self) -> None:
+        while True:
+            neg, _, label = self._heap[0]
+            res = self.res[label]
+            if -neg == len(res):
+                break
+            heapq.heappop(self._heap)  # bayat kayıt
+        i = self.rng.randrange(len(res))
+        res[i] = res[-1]
+        res.pop()
+        self.cap[label] = len(res)
+        self.total -= 1
+        heapq.heappop(self._heap)
+        self._push(label)
+
+    def add(self, label: Hashable, item: Any) -> None:
+        seq = self.n
+        self.n += 1
+        k = self.seen.get(label, 0) + 1
+        self.seen[label] = k
+        res = self.res.get(label)
+        if res is None:
+            res = self.res[label] = []
+            self._order[label] = len(self._order)
+        limit = self._limit(label)
+        if limit < 0 or len(res) < limit:
+            res.append((seq, item))
+            self.total += 1
+            self._push(label)
+            if self.budget and self.total > self.budget:
+                self._evict_largest()
+        elif limit:
+            j = self.rng.randrange(k)
+            if j < limit:
+                res[j] = (seq, item)
+
+    def items(self) -> List[Any]:
+        """Örneklenen satırlar, girdideki sırayla."""
+        out = [x for res in self.res.values() for x in res]
+        out.sort(key=lambda t: t[0])
+        return [item for _, item in out]
+
+    def __len__(self) -> int:
+        return self.total
+
+    def summary(self) -> str:
+        sizes = sorted((len(r) for r in self.res.values()), reverse=True)
+        return (f"seen={self.n:,} sampled={self.total:,} classes={len(self.res):,} "
+                f"per_class max={sizes[0] if sizes else 0:,} min={sizes[-1] if sizes else 0:,}")
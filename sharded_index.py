@@ -0,0 +1,308 @@
+# sharded_index.py
+# -*- coding: utf-8 -*-
+"""
+LocationResolver index'inin il bazında parçalanmış (sharded) disk biçimi.
+
+JSON index yüklenince 81 ilin tüm anahtar ve çiftleri belleğe gelir; tek
+bölgeyi işleyen iş için bunun çoğu boşa. Bu biçimde her il ayrı bir parçadır
+(düz LocationResolver JSON'u) ve küçük bir genel yönlendirme tablosu hangi
+anahtarın hangi illerde geçtiğini söyler. Parçalar ilk kullanıldıklarında
+yüklenir; il ipucu verilen sorgu yalnızca o ilin parçasına bakar (kovadaki
+diğer illerin çiftleri Python'da tek tek elenmez).
+
+Dizin düzeni (<out>/):
+  meta.json            sürüm, kaynak damgası, key_mode, alanlar, iller (parça sırası)
+  route.json           {alan: {anahtar: yön}}; yön tamsayı ise toplam << 7 | parça
+                       (tüm çiftler tek ilde), liste ise [toplam, parça, parça, ...]
+                       (kovadaki çift başına, orijinal sırayla)
+  shards/<NNN>.json    parçanın LocationResolver JSON'u (yalnızca o ilin çiftleri)
+
+Kova toplamı yönlendirmede saklandığı için skorlar ve (eşitlikte ilk aday
+dahil) infer() sonuçları JSON index ile birebir aynıdır. load(ils=...) ile
+yalnızca verilen iller açılır: diğer illerin çiftleri hiç yüklenmez; toplam
+yine tüm kovanınkidir, yani il kısıtı yalnızca aday düşürür, skor değiştirmez.
+
+Kullanım:
+  python sharded_index.py export --kb cache/gazetteer_index.json --out cache/gazetteer_index.shards
+  python sharded_index.py bench  --kb cache/gazetteer_index.json --store cache/gazetteer_index.shards \\
+      --holdout data/test.csv --il Izmir
+  python parser_cli.py --kb cache/gazetteer_index.shards --kb-ils Izmir ...
+"""
+import argparse, json, os, shutil, sys, time
+from collections import Counter
+from collections.abc import Mapping
+from typing import Dict, Iterator, List, Optional, Sequence, Tuple
+
+SHARD_VERSION = 1
+_META = "meta.json"
+_ROUTE = "route.json"
+_SHARD_BITS = 7  # 81 il < 128
+
+
+def is_sharded_index(path: Optional[str]) -> bool:
+    return bool(path) and os.path.isdir(path) and os.path.exists(os.path.join(path, _META)) \
+        and os.path.exists(os.path.join(path, _ROUTE))
+
+
+def _shard_path(store_dir: str, i: int) -> str:
+    return os.path.join(store_dir, "shards", f"{i:03d}.json")
+
+
+# --------- Yazma ----------
+def export_shards(res, out_dir: str, source: str = "") -> Dict[str, int]:
+    """LocationResolver'ı il parçalarına böler; dönüş: il => parçadaki anahtar sayısı."""
+    from resolver import LocationResolver
+
+    tmp = out_dir.rstrip("/\\") + ".tmp"
+    if os.path.exists(tmp):
+        shutil.rmtree(tmp)
+    os.makedirs(os.path.join(tmp, "shards"))
+
+    shard_of: Dict[str, int] = {}   # il.lower() => parça (ilk görülme sırası)
+    ils: List[str] = []
+    shards: List[LocationResolver] = []
+    route: Dict[str, Dict[str, object]] = {}
+    for field, buckets in res.idx.items():
+        r = route[field] = {}
+        for key, counter in buckets.items():
+            seq = []
+            for pair, c in counter.items():
+                il = pair[0]
+                s = shard_of.get(il.lower())
+                if s is None:
+                    s = shard_of[il.lower()] = len(ils)
+                    ils.append(il)
+                    shards.append(LocationResolver(res.key_mode))
+                shards[s].idx[field][key][tuple(pair)] = c
+                seq.append(s)
+            total = sum(counter.values())
+            if len(set(seq)) == 1:
+                r[key] = total << _SHARD_BITS | seq[0]
+            else:
+                r[key] = [total] + seq
+    if len(ils) >= 1 << _SHARD_BITS:
+        raise ValueError(f"çok fazla il parçası: {len(ils)}")
+
+    sizes = {}
+    for i, sh in enumerate(shards):
+        sh.save(_shard_path(tmp, i))
+        sizes[ils[i]] = sum(len(v) for v in sh.idx.values())
+    with open(os.path.join(tmp, _ROUTE), "w", encoding="utf-8") as f:
+        json.dump(route, f, ensure_ascii=False)
+    with open(os.path.join(tmp, _META), "w", encoding="utf-8") as f:
+        json.dump({"version": SHARD_VERSION, "kind": "sharded", "source": source,
+                   "key_mode": res.key_mode, "fields": list(res.idx), "ils": ils},
+                  f, ensure_ascii=False)
+    if os.path.exists(out_dir):
+        shutil.rmtree(out_dir)
+    os.replace(tmp, out_dir)
+    return sizes
+
+
+# --------- Okuma ----------
+class ShardStore:
+    """Parçaları ilk erişimde yükler; allowed dışındaki parçalar hiç açılmaz."""
+
+    def __init__(self, store_dir: str, ils: List[str], allowed: Optional[Sequence[str]] = None):
+        self.dir = store_dir
+        self.ils = ils
+        self.by_il = {il.lower(): i for i, il in enumerate(ils)}
+        self.allowed = None
+        if allowed:
+            self.allowed = {self.by_il[a.lower()] for a in allowed if a.lower() in self.by_il}
+        self.loaded: Dict[int, Dict[str, Dict[str, Counter]]] = {}
+
+    def shard(self, i: int) -> Optional[Dict[str, Dict[str, Counter]]]:
+        if self.allowed is not None and i not in self.allowed:
+            return None
+        sh = self.loaded.get(i)
+        if sh is None:
+            from resolver import LocationResolver
+            sh = self.loaded[i] = LocationResolver.load(_shard_path(self.dir, i)).idx
+        return sh
+
+
+class ShardedField(Mapping):
+    """Tek alanın görünümü; get() yönlendirmeye göre parçalardan kovayı kurar."""
+
+    def __init__(self, field: str, route: Dict[str, object], store: ShardStore):
+        self.field = field
+        self.route = route
+        self.store = store
+
+    def _bucket_in(self, i: int, key: str) -> Optional[Counter]:
+        sh = self.store.shard(i)
+        return sh[self.field].get(key) if sh is not None else None
+
+    def get(self, key, default=None):
+        r = self.route.get(key)
+        if r is None:
+            return default
+        if isinstance(r, int):
+            b = self._bucket_in(r & ((1 << _SHARD_BITS) - 1), key)
+            return b if b else default
+        # çok illi kova: çiftler orijinal sırayla parçalardan alınır
+        iters = {}
+        out = Counter()
+        for s in r[1:]:
+            it = iters.get(s)
+            if it is None:
+                b = self._bucket_in(s, key)
+                it = iters[s] = iter(b.items()) if b else iter(())
+            for pair, c in it:
+                out[pair] = c
+                break
+        return out if out else default
+
+    def get_with_total(self, key: str) -> Tuple[Optional[Counter], int]:
+        """(açılabilen parçalardaki çiftler, tüm kovanın toplamı)"""
+        r = self.route.get(key)
+        if r is None:
+            return None, 0
+        return self.get(key), (r >> _SHARD_BITS if isinstance(r, int) else r[0])
+
+    def get_for_il(self, key: str, il: str) -> Tuple[Optional[Counter], int]:
+        """(yalnızca il'in çiftleri, tüm kovanın toplamı); yalnızca o ilin parçası açılır."""
+        r = self.route.get(key)
+        if r is None:
+            return None, 0
+        if isinstance(r, int):
+            total, s = r >> _SHARD_BITS, r & ((1 << _SHARD_BITS) - 1)
+            if self.store.ils[s].lower() != il.lower():
+                return None, total
+        else:
+            total = r[0]
+            s = self.store.by_il.get(il.lower())
+            if s is None or s not in r[1:]:
+                return None, total
+        return self._bucket_in(s, key), total
+
+    def __getitem__(self, key):
+        v = self.get(key)
+        if v is None:
+            raise KeyError(key)
+        return v
+
+    def __contains__(self, key) -> bool:
+        return self.get(key) is not None
+
+    def __iter__(self) -> Iterator[str]:
+        if self.store.allowed is None:
+            yield from self.route
+            return
+        for key in self.route:
+            if key in self:
+                yield key
+
+    def __len__(self) -> int:
+        if self.store.allowed is None:
+            return len(self.route)
+        return sum(1 for _ in self)
+
+
+def open_sharded(store_dir: str, ils: Optional[Sequence[str]] = None) -> Tuple[str, Dict[str, ShardedField]]:
+    """(key_mode, {alan: ShardedField})"""
+    with open(os.path.join(store_dir, _META), "r", encoding="utf-8") as f:
+        meta = json.load(f)
+    if meta.get("version") != SHARD_VERSION:
+        raise ValueError(f"desteklenmeyen index sürümü: {meta.get('version')} ({store_dir})")
+    with open(os.path.join(store_dir, _ROUTE), "r", encoding="utf-8") as f:
+        route = json.load(f)
+    store = ShardStore(store_dir, meta["ils"], ils)
+    unknown = [a for a in ils or () if a.lower() not in store.by_il]
+    if unknown:
+        print(f"[shards] WARN: index'te olmayan il(ler): {', '.join(unknown)}", file=sys.stderr)
+    return meta.get("key_mode", "text"), {f: ShardedField(f, route.get(f, {}), store) for f in meta["fields"]}
+
+
+# --------- Ölçüm ----------
+def _retained(fn):
+    import gc, tracemalloc
+    gc.collect()
+    tracemalloc.start()
+    t0 = time.perf_counter()
+    out = fn()
+    secs = time.perf_counter() - t0
+    kept, _ = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return out, kept, secs
+
+
+def bench(kb: str, store: str, holdout: str, il: str, limit: int = 0) -> None:
+    from prune_index import load_holdout
+    from resolver import LocationResolver
+
+    parsed, _ = load_holdout(holdout, limit)
+    hinted = [p for p in parsed if (p.get("il") or "").lower() == il.lower()] if il else parsed
+    print(f"[bench] {len(parsed):,} held-out satır, il ipuçlu ({il or 'hepsi'}): {len(hinted):,}")
+
+    def hints(rows):
+        return [p.get("il") or None for p in rows], [p.get("ilce") or None for p in rows]
+
+    full, full_b, full_s = _retained(lambda: LocationResolver.load(kb))
+    print(f"[bench] json   : load {full_s:.2f}s, {full_b / 1e6:.1f} MB")
+    base_all = full.infer_batch(parsed)
+    base_hint = full.infer_batch(hinted, *hints(hinted))
+
+    lazy, lazy_b, lazy_s = _retained(lambda: LocationResolver.load(store))
+    print(f"[bench] shards : load {lazy_s:.2f}s, {lazy_b / 1e6:.1f} MB (yönlendirme tablosu)")
+    ok_all = lazy.infer_batch(parsed) == base_all
+    ok_hint = lazy.infer_batch(hinted, *hints(hinted)) == base_hint
+    print(f"[bench] shards : sonuçlar aynı: ipuçsuz={ok_all} ipuçlu={ok_hint}, "
+          f"açılan parça {len(lazy.idx['mahalle'].store.loaded)}/{len(lazy.idx['mahalle'].store.ils)}")
+
+    if il:
+        def _regional():
+            r = LocationResolver.load(store, ils=[il])
+            r.infer_batch(hinted, *hints(hinted))
+            return r
+        reg, reg_b, reg_s = _retained(_regional)
+        same = reg.infer_batch(hinted, *hints(hinted)) == base_hint
+        # ipuçsuz bölgesel sorgu = tam index'te il ipucuyla sorgu (aynı adaylar, aynı toplam)
+        same_all = reg.infer_batch(parsed) == full.infer_batch(parsed, [il] * len(parsed))
+        print(f"[bench] bölge  : ils=[{il}] load+sorgu {reg_s:.2f}s, {reg_b / 1e6:.1f} MB "
+              f"({reg_b / max(full_b, 1):.1%} of json), sonuçlar aynı: ipuçlu={same} ipuçsuz={same_all}")
+
+    def _timed(res, rows, n=3):
+        il_h, ilce_h = hints(rows)
+        best = float("inf")
+        for _ in range(n):
+            t0 = time.perf_counter()
+            for p, a, b in zip(rows, il_h, ilce_h):
+                res.infer(mahalle=p.get("mahalle"), sokak=p.get("sokak"), cadde=p.get("cadde"),
+                          site=p.get("site"), apartman=p.get("apartman"), il_hint=a, ilce_hint=b)
+            best = min(best, time.perf_counter() - t0)
+        return best * 1e6 / max(1, len(rows))
+    print(f"[bench] ipuçlu infer: json {_timed(full, hinted):.1f} µs/satır, "
+          f"shards {_timed(lazy, hinted):.1f} µs/satır")
+
+
+def main():
+    ap = argparse.ArgumentParser(description="LocationResolver index'i için il bazlı parçalı depo")
+    sub = ap.add_subparsers(dest="cmd", required=True)
+    ex = sub.add_parser("export", help="JSON index => il parçaları + yönlendirme tablosu")
+    ex.add_argument("--kb", required=True)
+    ex.add_argument("--out", required=True)
+    be = sub.add_parser("bench", help="json vs parçalı: bellek, sonuç eşitliği, ipuçlu sorgu süresi")
+    be.add_argument("--kb", required=True)
+    be.add_argument("--store", required=True)
+    be.add_argument("--holdout", required=True, help="il/ilce sütunlu CSV (sorgu kümesi)")
+    be.add_argument("--holdout-limit", type=int, default=0)
+    be.add_argument("--il", default="", help="Bölgesel iş için il (ör. Izmir)")
+    args = ap.parse_args()
+
+    if args.cmd == "export":
+        from resolver import LocationResolver
+        t0 = time.perf_counter()
+        res = LocationResolver.load(args.kb)
+        st = os.stat(args.kb) if os.path.isfile(args.kb) else None
+        sizes = export_shards(res, args.out, source=f"{st.st_size}:{st.st_mtime_ns}" if st else "")
+        top = sorted(sizes.items(), key=lambda kv: -kv[1])[:5]
+        print(f"[export] {len(sizes)} il parçası -> {args.out} ({time.perf_counter()-t0:.1f}s); en büyük: "
+              + ", ".join(f"{k}={v:,}" for k, v in top), file=sys.stderr)
+    else:
+        bench(args.kb, args.store, args.holdout, args.il, args.holdout_limit)
+
+
+if __name__ == "__main__":
+    main()
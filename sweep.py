@@ -0,0 +1,291 @@
+# sweep.py
+# -*- coding: utf-8 -*-
+"""
+train_ml_resolver / train_label_classifier için paralel hiperparametre taraması.
+
+Veri bir kez ayrıştırılıp her ngram_range için bir kez öznitelikleştirilir;
+CSR matris (data/indices/indptr .npy) önbellek dizinine yazılır. İşçiler
+matrisi np.load(mmap_mode="r") ile eşler: fiziksel bellek tek kopya,
+ayrıştırma/öznitelik maliyeti yapılandırma sayısından bağımsız. Aynı girdi ve
+örnekleme ayarlarıyla tekrar çalıştırınca matrisler önbellekten gelir.
+
+Satırlar eğitim + held-out olarak sabit tohumla bölünür (eğitim satırları
+önde; işçi dilimi ucuzdur). Her yapılandırma SGDClassifier.fit ile eğitilir
+ve held-out doğruluğu, eğitim süresi, model boyutu ve çıkarım gecikmesi
+(ms/satır: öznitelik + tahmin) bir sıralama tablosuna yazılır.
+
+Not: train_label_classifier parçalı partial_fit kullanır; tarama aynı
+sınıflayıcıyı tüm eğitim matrisinde max_iter epoch ile eğitir.
+
+Örnek:
+  python sweep.py --task ml_resolver --input data/train.csv --kb cache/gazetteer_index.json \\
+      --sample 200000 --grid alpha=1e-5,1e-4 --grid loss=log_loss,hinge --grid ngram=3-5,2-4 \\
+      --workers 4 --out cache/sweep_ml.csv
+"""
+import argparse, hashlib, itertools, json, os, sys, time
+from concurrent.futures import ProcessPoolExecutor
+from typing import Dict, List, Sequence, Tuple
+
+import numpy as np
+import pandas as pd
+from scipy import sparse
+
+from sampling import StratifiedReservoir
+from table_io import write_rows
+
+TASKS = ("ml_resolver", "label")
+# Grid'de verilebilen parametreler (ngram öznitelik, diğerleri SGDClassifier)
+GRID_KEYS = ("alpha", "loss", "max_iter", "penalty", "ngram")
+LEADERBOARD_FIELDS = ["rank", "ngram", "loss", "alpha", "max_iter", "penalty",
+                      "accuracy", "train_s", "model_mb", "infer_ms", "feat_ms", "predict_ms"]
+
+
+# --------- Grid ----------
+def _ngram(v: str) -> Tuple[int, int]:
+    a, _, b = v.partition("-")
+    return int(a), int(b or a)
+
+
+def parse_grid(items: Sequence[str]) -> Dict[str, list]:
+    """['alpha=1e-5,1e-4', 'ngram=3-5,2-4'] => {'alpha': [1e-05, 0.0001], 'ngram': [(3, 5), (2, 4)]}"""
+    conv = {"alpha": float, "max_iter": int, "loss": str, "penalty": str, "ngram": _ngram}
+    grid: Dict[str, list] = {}
+    for it in items:
+        name, _, vals = it.partition("=")
+        name = name.strip()
+        if name not in conv or not vals:
+            raise ValueError(f"geçersiz grid: {it!r} (anahtarlar: {', '.join(GRID_KEYS)})")
+        grid[name] = [conv[name](v.strip()) for v in vals.split(",") if v.strip()]
+    return grid
+
+
+def _task_module(task: str):
+    if task == "ml_resolver":
+        import train_ml_resolver as m
+    else:
+        import train_label_classifier as m
+    return m
+
+
+def expand(task: str, grid: Dict[str, list]) -> List[dict]:
+    """Görevin varsayılan ayarları (make_clf / make_vec) üzerine grid'in kartezyen çarpımı."""
+    m = _task_module(task)
+    clf = m.make_clf().get_params()
+    base = {k: clf[k] for k in ("alpha", "loss", "max_iter", "penalty")}
+    base["ngram"] = tuple(m.make_vec().ngram_range)
+    keys = list(grid)
+    return [{**base, **dict(zip(keys, combo))} for combo in itertools.product(*(grid[k] for k in keys))]
+
+
+# --------- Veri ----------
+def load_examples(args) -> Tuple[List[str], List[str]]:
+    """Görevin kendi eğitim yolundaki metin + etiketleri (opsiyonel tabakalı örneklem)."""
+    sampler = None
+    if args.sample or args.per_class_cap:
+        sampler = StratifiedReservoir(args.sample, args.per_class_cap, args.seed)
+    if args.task == "ml_resolver":
+        from resolver import LocationResolver
+        from train_ml_resolver import collect_examples
+        resolver = LocationResolver.load(args.kb) if args.kb else None
+        X, y, _, _, _ = collect_examples(args.input, resolver, args.resolver_threshold, sampler)
+        return X, y
+
+    from resolver import LocationResolver
+    from train_label_classifier import enrich_frame, sample_frame, sample_into, stream_rows
+    resolver = LocationResolver.load(args.kb) if args.kb and os.path.exists(args.kb) else None
+    frames = []
+    for df in stream_rows(args.input, chunksize=args.chunksize):
+        if "label" not in df.columns:
+            continue
+        if sampler is not None:
+            sample_into(sampler, df)
+        else:
+            frames.append(df[["address", "label"]])
+    df = sample_frame(sampler) if sampler is not None else (pd.concat(frames, ignore_index=True) if frames else None)
+    if df is None:
+        return [], []
+    vc = df["label"].astype(str).value_counts()
+    df = df[df["label"].astype(str).isin(set(vc[vc >= args.min_samples].index))]
+    texts = [t for t, _ in enrich_frame(df["address"].astype(str), resolver)]
+    return texts, df["label"].astype(str).tolist()
+
+
+def _stamp(path: str) -> str:
+    if not path or not os.path.exists(path):
+        return "-"
+    st = os.stat(path)
+    return f"{os.path.abspath(path)}:{st.st_size}:{st.st_mtime_ns}"
+
+
+def data_key(args) -> str:
+    h = hashlib.sha1()
+    for x in (args.task, _stamp(args.input), _stamp(args.kb), args.sample, args.per_class_cap,
+              args.seed, args.holdout, args.resolver_threshold, args.min_samples):
+        h.update(f"{x}\0".encode("utf-8"))
+    return h.hexdigest()[:12]
+
+
+def save_csr(X: sparse.csr_matrix, out_dir: str) -> None:
+    tmp = out_dir + ".tmp"
+    os.makedirs(tmp, exist_ok=True)
+    for name in ("data", "indices", "indptr"):
+        np.save(os.path.join(tmp, f"{name}.npy"), getattr(X, name))
+    with open(os.path.join(tmp, "shape.json"), "w") as f:
+        json.dump(list(X.shape), f)
+    os.replace(tmp, out_dir)
+
+
+def open_csr(mat_dir: str) -> sparse.csr_matrix:
+    """Salt okunur eşlenmiş CSR (kopya yok)."""
+    with open(os.path.join(mat_dir, "shape.json")) as f:
+        shape = tuple(json.load(f))
+    arrs = [np.load(os.path.join(mat_dir, f"{n}.npy"), mmap_mode="r") for n in ("data", "indices", "indptr")]
+    return sparse.csr_matrix(tuple(arrs), shape=shape, copy=False)
+
+
+def csr_rows(X: sparse.csr_matrix, a: int, b: int) -> sparse.csr_matrix:
+    """X[a:b] satırları; data/indices eşlenmiş dizilerin görünümü (X[a:b] bunları kopyalar)."""
+    ip = X.indptr
+    lo, hi = int(ip[a]), int(ip[b])
+    # yalnızca (b-a+1) ofset kopyalanır; dtype korunur
+    indptr = ip[a:b + 1] if lo == 0 else (np.asarray(ip[a:b + 1]) - lo).astype(ip.dtype, copy=False)
+    # (data, indices, indptr) kurucusu tabanından çok küçük görünümleri prune() ile
+    # kopyalar; boş matrise diziler doğrudan atanır
+    out = sparse.csr_matrix((b - a, X.shape[1]), dtype=X.dtype)
+    out.data, out.indices, out.indptr = X.data[lo:hi], X.indices[lo:hi], indptr
+    return out
+
+
+def prepare(args, ngrams: Sequence[Tuple[int, int]]) -> Tuple[str, dict]:
+    """Etiketleri ve her ngram için CSR matrisi önbelleğe yazar (varsa yeniden kullanır)."""
+    root = os.path.join(args.cache_dir, f"{args.task}-{data_key(args)}")
+    meta_path = os.path.join(root, "meta.json")
+    meta = {}
+    if os.path.exists(meta_path):
+        with open(meta_path, encoding="utf-8") as f:
+            meta = json.load(f)
+    missing = [g for g in ngrams if f"{g[0]}-{g[1]}" not in meta.get("feat_ms", {})]
+    if not missing:
+        print(f"[sweep] features cached: {root}")
+        return root, meta
+
+    t0 = time.perf_counter()
+    texts, labels = load_examples(args)
+    if not texts:
+        raise SystemExit("Tarama için örnek bulunamadı (etiketli satır yok).")
+    classes, y = np.unique(np.asarray(labels), return_inverse=True)
+    # sabit tohumlu bölme; eğitim satırları önde
+    ho = np.random.RandomState(42).rand(len(texts)) < args.holdout
+    order = np.concatenate([np.flatnonzero(~ho), np.flatnonzero(ho)])
+    texts = [texts[i] for i in order]
+    os.makedirs(root, exist_ok=True)
+    np.save(os.path.join(root, "y.npy"), y[order].astype(np.int32))
+    meta = {"task": args.task, "input": args.input, "n": len(texts), "n_train": int((~ho).sum()),
+            "classes": classes.tolist(), "feat_ms": meta.get("feat_ms", {})}
+    print(f"[sweep] parsed {len(texts):,} rows, {len(classes):,} classes ({time.perf_counter()-t0:.1f}s)")
+
+    m = _task_module(args.task)
+    for g in missing:
+        vec = m.make_vec(ngram_range=g)
+        t1 = time.perf_counter()
+        X = vec.transform(texts).tocsr()
+        ms = (time.perf_counter() - t1) * 1000.0 / len(texts)
+        save_csr(X, os.path.join(root, f"X_{g[0]}-{g[1]}"))
+        meta["feat_ms"][f"{g[0]}-{g[1]}"] = ms
+        print(f"[sweep] features ngram={g}: nnz={X.nnz:,} {X.data.nbytes/2**20:,.1f} MiB ({ms:.3f} ms/row)")
+    with open(meta_path, "w", encoding="utf-8") as f:
+        json.dump(meta, f, ensure_ascii=False)
+    return root, meta
+
+
+# --------- İşçi ----------
+def run_config(job: Tuple[str, str, int, dict]) -> dict:
+    root, task, n_train, cfg = job
+    from sklearn.linear_model import SGDClassifier
+    g = cfg["ngram"]
+    X = open_csr(os.path.join(root, f"X_{g[0]}-{g[1]}"))
+    y = np.load(os.path.join(root, "y.npy"), mmap_mode="r")
+    X_tr, y_tr = csr_rows(X, 0, n_train), np.asarray(y[:n_train])
+    X_te, y_te = csr_rows(X, n_train, X.shape[0]), np.asarray(y[n_train:])
+
+    m = _task_module(task)
+    clf: SGDClassifier = m.make_clf()
+    clf.set_params(alpha=cfg["alpha"], loss=cfg["loss"], max_iter=cfg["max_iter"],
+                   penalty=cfg["penalty"], n_jobs=1)
+    t0 = time.perf_counter()
+    clf.fit(X_tr, y_tr)
+    train_s = time.perf_counter() - t0
+    if task == "ml_resolver":
+        m._to_float32(clf)  # train_ml_resolver kaydettiği gibi
+    acc, pred_ms = float("nan"), 0.0
+    if X_te.shape[0]:
+        t0 = time.perf_counter()
+        pred = clf.predict(X_te)
+        pred_ms = (time.perf_counter() - t0) * 1000.0 / X_te.shape[0]
+        acc = float(np.mean(pred == y_te))
+    size = clf.coef_.nbytes + clf.intercept_.nbytes
+    return {**cfg, "accuracy": acc, "train_s": train_s, "model_mb": size / 2**20, "predict_ms": pred_ms}
+
+
+def main():
+    ap = argparse.ArgumentParser(description="Paylaşılan öznitelik matrisi üzerinde paralel hiperparametre taraması")
+    ap.add_argument("--task", choices=TASKS, required=True)
+    ap.add_argument("--input", required=True)
+    ap.add_argument("--kb", default="", help="Resolver index (görevin eğitim betiğindeki gibi)")
+    ap.add_argument("--grid", action="append", default=[], metavar="AD=V1,V2",
+                    help="Tekrarlanabilir: alpha=1e-5,1e-4  loss=hinge,log_loss  max_iter=5,25  "
+                         "penalty=l2,elasticnet  ngram=3-5,2-4")
+    ap.add_argument("--holdout", type=float, default=0.2, help="Held-out oranı (vars: 0.2)")
+    ap.add_argument("--workers", type=int, default=max(1, (os.cpu_count() or 2) // 2))
+    ap.add_argument("--cache-dir", default="cache/sweep", help="Öznitelik matrisi önbelleği")
+    ap.add_argument("--out", default="cache/sweep_leaderboard.csv", help="Sıralama tablosu (CSV/Parquet)")
+    ap.add_argument("--sample", type=int, default=0, help="Tabakalı rezervuar örnek bütçesi (0: tümü)")
+    ap.add_argument("--per-class-cap", type=int, default=0)
+    ap.add_argument("--seed", type=int, default=0)
+    ap.add_argument("--resolver-threshold", type=float, default=1.0, help="ml_resolver: etiket için resolver eşiği")
+    ap.add_argument("--min-samples", type=int, default=10, help="label: sınıf başına en az örnek")
+    ap.add_argument("--chunksize", type=int, default=50000)
+    args = ap.parse_args()
+
+    try:
+        configs = expand(args.task, parse_grid(args.grid))
+    except ValueError as e:
+        ap.error(str(e))
+    ngrams = list(dict.fromkeys(c["ngram"] for c in configs))
+    root, meta = prepare(args, ngrams)
+    print(f"[sweep] {len(configs)} configs x {meta['n_train']:,} train / "
+          f"{meta['n'] - meta['n_train']:,} held-out rows, workers={args.workers}")
+
+    import multiprocessing as mp
+    t0 = time.perf_counter()
+    jobs = [(root, args.task, meta["n_train"], c) for c in configs]
+    with ProcessPoolExecutor(args.workers, mp_context=mp.get_context("spawn")) as pool:
+        results = []
+        for r in pool.map(run_config, jobs):
+            results.append(r)
+            print(f"[sweep] ngram={r['ngram']} loss={r['loss']} alpha={r['alpha']:g} "
+                  f"max_iter={r['max_iter']} penalty={r['penalty']} acc={r['accuracy']:.4f} "
+                  f"train={r['train_s']:.1f}s", file=sys.stderr)
+    print(f"[sweep] done in {time.perf_counter()-t0:.1f}s")
+
+    results.sort(key=lambda r: (-np.nan_to_num(r["accuracy"], nan=-1.0), r["train_s"]))
+    rows = []
+    for i, r in enumerate(results, 1):
+        feat_ms = meta["feat_ms"][f"{r['ngram'][0]}-{r['ngram'][1]}"]
+        rows.append({
+            "rank": i, "ngram": f"{r['ngram'][0]}-{r['ngram'][1]}", "loss": r["loss"],
+            "alpha": f"{r['alpha']:g}", "max_iter": r["max_iter"], "penalty": r["penalty"],
+            "accuracy": f"{r['accuracy']:.4f}", "train_s": f"{r['train_s']:.2f}",
+            "model_mb": f"{r['model_mb']:.1f}", "infer_ms": f"{feat_ms + r['predict_ms']:.3f}",
+            "feat_ms": f"{feat_ms:.3f}", "predict_ms": f"{r['predict_ms']:.3f}",
+        })
+    write_rows(args.out, rows, LEADERBOARD_FIELDS)
+    print(f"[leaderboard] -> {args.out}")
+    for r in rows[:10]:
+        print(f"  #{r['rank']:<3} acc={r['accuracy']} ngram={r['ngram']} loss={r['loss']} alpha={r['alpha']} "
+              f"max_iter={r['max_iter']} penalty={r['penalty']} train={r['train_s']}s "
+              f"size={r['model_mb']}MiB infer={r['infer_ms']}ms/row")
+
+
+if __name__ == "__main__":
+    main()
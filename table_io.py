@@ -0,0 +1,194 @@
+# table_io.py
+# -*- coding: utf-8 -*-
+"""
+CSV ve sütunlu (Parquet / Arrow IPC) girdi-çıktı.
+Biçim dosya uzantısından seçilir; CSV davranışı değişmez (csv.DictReader /
+pd.read_csv). Sütunlu dosyalarda yalnızca istenen sütunlar okunur (column
+pruning) ve veri kayıt grupları (record batch) halinde akar.
+
+pyarrow opsiyoneldir; yalnızca .parquet/.pq/.arrow/.feather yollarında gerekir.
+CSV yolları .gz/.bz2/.xz olabilir (bkz. compressed_io); sütunlu biçimler kendi
+içinde sıkıştırıldığından 'x.parquet.gz' gibi yollar ValueError ile reddedilir.
+"""
+import csv, os
+from typing import Dict, Iterable, Iterator, List, Optional, Sequence
+
+from compressed_io import codec_of, open_binary, open_text, strip_codec
+
+try:
+    import pyarrow as pa
+    import pyarrow.compute as pa_compute
+    import pyarrow.dataset as pa_ds
+    import pyarrow.parquet as pq
+except ImportError:  # pyarrow yoksa yalnızca CSV
+    pa = pa_compute = pa_ds = pq = None  # type: ignore
+
+PARQUET_EXTS = (".parquet", ".pq")
+ARROW_EXTS = (".arrow", ".feather", ".ipc")
+
+# Adres metninin aranabileceği sütunlar (pick_address_field ile aynı sıra)
+ADDRESS_COLUMNS = ("address", "Address", "adres")
+
+
+def is_columnar(path: str) -> bool:
+    """Biçim tespiti codec uzantısı atılarak yapılır; sıkıştırılmış sütunlu yol ValueError."""
+    if not strip_codec(path).lower().endswith(PARQUET_EXTS + ARROW_EXTS):
+        return False
+    if codec_of(path):
+        raise ValueError(f"{path}: sıkıştırılmış Parquet/Arrow desteklenmiyor; "
+                         f"dosyayı açıp {strip_codec(path)} olarak verin (sütunlu biçim zaten sıkıştırılır)")
+    return True
+
+
+def _require_arrow(path: str) -> None:
+    if pa is None:
+        raise RuntimeError(f"{path}: Parquet/Arrow için pyarrow gerekli (pip install pyarrow)")
+
+
+def _format(path: str) -> str:
+    return "parquet" if path.lower().endswith(PARQUET_EXTS) else "ipc"
+
+
+# --------- Okuma ----------
+def iter_batches(path: str, columns: Optional[Sequence[str]] = None,
+                 batch_size: int = 65536) -> Iterator["pa.RecordBatch"]:
+    """Sütunlu dosyayı kayıt grupları halinde okur; dosyada olmayan sütunlar atlanır."""
+    _require_arrow(path)
+    ds = pa_ds.dataset(path, format=_format(path))
+    cols = None
+    if columns is not None:
+        names = set(ds.schema.names)
+        cols = [c for c in dict.fromkeys(columns) if c in names]
+    yield from ds.to_batches(columns=cols, batch_size=batch_size)
+
+
+def iter_rows(path: str, columns: Optional[Sequence[str]] = None,
+              batch_size: int = 65536) -> Iterator[Dict[str, str]]:
+    """
+    Satır sözlükleri. CSV: csv.DictReader (columns yok sayılır).
+    Sütunlu: yalnızca `columns` okunur; değerler CSV'deki gibi str ("" = boş).
+    """
+    if not is_columnar(path):
+        with open_text(path, "r") as f:
+            yield from csv.DictReader(f)
+        return
+    for batch in iter_batches(path, columns, batch_size):
+        names = batch.schema.names
+        # string'e çevirme ve null doldurma Arrow tarafında, sütun başına bir kez
+        cols = [pa_compute.fill_null(batch.column(i).cast(pa.string()), "").to_pylist()
+                for i in range(len(names))]
+        for vals in zip(*cols):
+            yield dict(zip(names, vals))
+
+
+def iter_frames(path: str, chunksize: int = 50000,
+                columns: Optional[Sequence[str]] = None):
+    """pandas DataFrame parçaları. CSV: pd.read_csv(chunksize=...) (columns yok sayılır)."""
+    import pandas as pd
+    if not is_columnar(path):
+        if codec_of(path) is None:
+            yield from pd.read_csv(path, chunksize=chunksize)
+        else:
+            with open_text(path, "r") as f:
+                yield from pd.read_csv(f, chunksize=chunksize)
+        return
+    for batch in iter_batches(path, columns, chunksize):
+        yield batch.to_pandas()
+
+
+# --------- Yazma ----------
+def _ensure_dir(path: str) -> None:
+    if os.path.dirname(path):
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+
+
+def _write_table(path: str, table) -> None:
+    if _format(path) == "parquet":
+        pq.write_table(table, path, compression="zstd")
+    else:
+        import pyarrow.feather as feather
+        feather.write_feather(table, path, compression="zstd")
+
+
+def write_rows(path: str, rows: Iterable[Dict[str, str]], fieldnames: List[str]) -> int:
+    """Satırları yazar; eksik alanlar "" olur. Sütunlu çıktıda her alan bir string sütunudur."""
+    _ensure_dir(path)
+    n = 0
+    if not is_columnar(path):
+        with open_text(path, "w") as f:
+            w = csv.DictWriter(f, fieldnames=fieldnames)
+            w.writeheader()
+            for r in rows:
+                w.writerow({k: r.get(k, "") for k in fieldnames})
+                n += 1
+        return n
+    _require_arrow(path)
+    cols: Dict[str, List[str]] = {k: [] for k in fieldnames}
+    for r in rows:
+        for k in fieldnames:
+            v = r.get(k, "")
+            cols[k].append("" if v is None else str(v))
+        n += 1
+    _write_table(path, pa.table({k: pa.array(v, type=pa.string()) for k, v in cols.items()}))
+    return n
+
+
+def write_frame(path: str, df) -> None:
+    """DataFrame yazar (CSV: to_csv(index=False))."""
+    _ensure_dir(path)
+    if not is_columnar(path):
+        if codec_of(path) is None:
+            df.to_csv(path, index=False)
+        else:
+            with open_text(path, "w") as f:
+                df.to_csv(f, index=False)
+        return
+    _require_arrow(path)
+    _write_table(path, pa.Table.from_pandas(df, preserve_index=False))
+
+
+# --------- Dönüştürme ----------
+def convert(src: str, dst: str, block_size: int = 1 << 24) -> int:
+    """CSV => Parquet/Arrow (tüm sütunlar string, akış halinde)."""
+    is_columnar(dst)  # 'x.parquet.gz' burada reddedilir
+    _require_arrow(dst)
+    import pyarrow.csv as pa_csv
+    _ensure_dir(dst)
+    with open_text(src, "r") as f:
+        header = next(csv.reader(f), [])
+    # tür çıkarımı yok: csv.DictReader gibi her sütun string
+    src_f = open_binary(src, "rb")
+    reader = pa_csv.open_csv(
+        src_f,
+        read_options=pa_csv.ReadOptions(block_size=block_size),
+        convert_options=pa_csv.ConvertOptions(column_types={c: pa.string() for c in header},
+                                               strings_can_be_null=False),
+    )
+    schema = reader.schema
+    n = 0
+    if _format(dst) == "parquet":
+        writer = pq.ParquetWriter(dst, schema, compression="zstd")
+    else:
+        writer = pa.ipc.new_file(dst, schema, options=pa.ipc.IpcWriteOptions(compression="zstd"))
+    with writer, src_f:
+        for batch in reader:
+            writer.write_batch(batch)
+            n += batch.num_rows
+    return n
+
+
+def main():
+    import argparse, sys, time
+    ap = argparse.ArgumentParser(description="CSV => Parquet/Arrow dönüştürücü")
+    ap.add_argument("--input", required=True, help="CSV (.gz/.bz2/.xz olabilir)")
+    ap.add_argument("--output", required=True, help=".parquet / .arrow")
+    args = ap.parse_args()
+    t0 = time.perf_counter()
+    n = convert(args.input, args.output)
+    print(f"[convert] {n:,} rows -> {args.output} "
+          f"({os.path.getsize(args.input)/1e6:.1f} MB -> {os.path.getsize(args.output)/1e6:.1f} MB, "
+          f"{time.perf_counter()-t0:.1f}s)", file=sys.stderr)
+
+
+if __name__ == "__main__":
+    main()
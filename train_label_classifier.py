@@ -4,16 +4,30 @@ import numpy as np
 import argparse, joblib, os
 from sklearn.utils import shuffle
 from sklearn.preprocessing import LabelEncoder
-from sklearn.feature_extraction.text import HashingVectorizer
 from sklearn.linear_model import SGDClassifier
 
 # Bizim modüller
-from extractor import parse_address
+from extractor import parse_record
 from resolver import LocationResolver
-from normalizer import normalize_text
+from normalizer import normalize_text, normalize_series, normalize_text_series
+from utils import fold_tr
+from featurizer import MemoHashingVectorizer
+from table_io import ADDRESS_COLUMNS, iter_frames
+from sampling import StratifiedReservoir
+
+# Sütunlu girdide okunan sütunlar
+TRAIN_COLUMNS = ("label",) + ADDRESS_COLUMNS
+
+# Aday üretimi için bileşen => etiket tablosunda tutulan alanlar
+CANDIDATE_FIELDS = ("il", "ilce", "mahalle")
 
 def enrich_text(addr: str, resolver: LocationResolver=None) -> str:
-    p = parse_address(addr)
+    return enrich_parsed(addr, resolver)[0]
+
+def enrich_parsed(addr: str, resolver: LocationResolver=None,
+                  norm_text: str = None, norm: str = None):
+    """enrich_text ile aynı metni, kullanılan parse sonucuyla birlikte döndürür."""
+    p = parse_record(addr, norm)
     # resolver ile il/ilçe doldurmayı dene (opsiyonel)
     if resolver:
         need_il  = not p.get("il")
@@ -31,7 +45,7 @@ def enrich_text(addr: str, resolver: LocationResolver=None) -> str:
 
     # Alanları tek metinde birleştir (feature text)
     parts = [
-        normalize_text(addr),
+        normalize_text(addr) if norm_text is None else norm_text,
         f"__il__ {p.get('il','')}",
         f"__ilce__ {p.get('ilce','')}",
         f"__mah__ {p.get('mahalle','')}",
@@ -45,10 +59,17 @@ def enrich_text(addr: str, resolver: LocationResolver=None) -> str:
         f"__site__ {p.get('site','')}",
         f"__apt__ {p.get('apartman','')}",
     ]
-    return " ".join([x for x in parts if x and x.strip()])
+    return " ".join([x for x in parts if x and x.strip()]), p
+
+def enrich_frame(addrs, resolver: LocationResolver=None):
+    """enrich_parsed'in parça sürümü: normalizasyon sütun üzerinde bir kez yapılır."""
+    norm_text = normalize_text_series(addrs).tolist()
+    norm = normalize_series(addrs.str.strip()).tolist()
+    return [enrich_parsed(a, resolver, nt, n)
+            for a, nt, n in zip(addrs.tolist(), norm_text, norm)]
 
 def stream_rows(csv_path, chunksize=50000):
-    for chunk in pd.read_csv(csv_path, chunksize=chunksize):
+    for chunk in iter_frames(csv_path, chunksize, TRAIN_COLUMNS):
         # bazı datasetlerde address kolonu farklı adlandırılmış olabilir
         if "address" not in chunk.columns:
             if "Address" in chunk.columns: chunk["address"] = chunk["Address"]
@@ -56,6 +77,70 @@ def stream_rows(csv_path, chunksize=50000):
             else: chunk["address"] = ""
         yield chunk
 
+def make_vec(ngram_range=(3,5)) -> MemoHashingVectorizer:
+    # HashingVectorizer (stateless, RAM dostu); token önbellekli sürüm, çıktı aynı
+    return MemoHashingVectorizer(
+        n_features=2**20,
+        alternate_sign=False,
+        analyzer="char",
+        ngram_range=ngram_range,
+        norm="l2"
+    )
+
+def make_clf() -> SGDClassifier:
+    return SGDClassifier(
+        loss="hinge",      # SVM benzeri; prob gerekmiyor
+        alpha=1e-5,
+        max_iter=5,
+        tol=1e-3
+    )
+
+def grow_classes(clf: SGDClassifier, le: LabelEncoder, new_labels) -> int:
+    """
+    Eğitilmiş sınıflayıcıya yeni etiketler ekler: classes_ sona uzar, coef_/intercept_
+    sıfır satırlarla büyür. Eski etiket id'leri (ve label_components) değişmez.
+    LabelEncoder string sınıfları sözlükle eşler; sıralı olmaları gerekmez.
+    """
+    known = set(le.classes_.tolist())
+    new_labels = [x for x in new_labels if x not in known]
+    if not new_labels:
+        return 0
+    n_old = len(le.classes_)
+    le.classes_ = np.concatenate([le.classes_, np.asarray(new_labels, dtype=str)])
+    coef, intercept = np.asarray(clf.coef_), np.asarray(clf.intercept_)
+    if n_old == 2:
+        # ikili model tek ağırlık vektörü tutar (sınıf 1); OvR'ye aç
+        coef = np.vstack([-coef[0], coef[0]])
+        intercept = np.array([-intercept[0], intercept[0]])
+    n_new = len(le.classes_)
+    clf.coef_ = np.vstack([coef, np.zeros((n_new - coef.shape[0], coef.shape[1]), dtype=coef.dtype)])
+    clf.intercept_ = np.concatenate([intercept, np.zeros(n_new - intercept.shape[0], dtype=intercept.dtype)])
+    clf.classes_ = np.arange(n_new)
+    return len(new_labels)
+
+def sample_into(sampler: StratifiedReservoir, df, labels=None, frac=1.0, rng=None) -> None:
+    """Parçadaki (address, label) satırlarını rezervuara ekler; labels verilirse yalnızca onlar."""
+    labs = df["label"].astype(str)
+    mask = labs.isin(labels) if labels is not None else np.ones(len(df), dtype=bool)
+    if frac < 1.0:
+        mask &= rng.random(len(df)) < frac
+    for addr, lab in zip(df["address"][mask].tolist(), labs[mask].tolist()):
+        sampler.add(lab, (addr, lab))
+
+def sample_frame(sampler: StratifiedReservoir):
+    items = sampler.items()
+    if not items:
+        return None
+    return pd.DataFrame(items, columns=["address", "label"])
+
+def load_replay(path, known, frac, max_rows, seed, chunksize=50000):
+    """Eski veriden bilinen etiketli satırların örneği: oran = frac, en çok max_rows (tabakalı rezervuar)."""
+    rng = np.random.default_rng(seed)
+    sampler = StratifiedReservoir(max_rows, seed=seed)
+    for df in stream_rows(path, chunksize=chunksize):
+        sample_into(sampler, df, known, frac, rng)
+    return sample_frame(sampler)
+
 def main():
     ap = argparse.ArgumentParser()
     ap.add_argument("--input", required=True)
@@ -65,6 +150,21 @@ def main():
                     help="Sınıfta en az kaç örnek olsun (nadiren görülenleri filtrele)")
     ap.add_argument("--epochs", type=int, default=1)
     ap.add_argument("--chunksize", type=int, default=50000)
+    ap.add_argument("--sample", type=int, default=0,
+                    help="Hızlı deneme: tüm dosyadan etikete göre tabakalı rezervuar örneği (satır bütçesi)")
+    ap.add_argument("--per-class-cap", type=int, default=0,
+                    help="Örneklemede bir etiketten en fazla satır (0: sınırsız)")
+    # Artımlı güncelleme
+    ap.add_argument("--update", default=None,
+                    help="Mevcut artefakttan devam et: --input yalnızca yeni veri; "
+                         "yeni etiketler sınıf kümesine eklenir")
+    ap.add_argument("--replay", default=None,
+                    help="--update ile: unutmayı azaltmak için eski veriden örnek karıştır (CSV/Parquet)")
+    ap.add_argument("--replay-frac", type=float, default=0.1,
+                    help="Eski veriden örnekleme oranı (vars: 0.1)")
+    ap.add_argument("--replay-max", type=int, default=200000,
+                    help="En fazla replay satırı (vars: 200000, 0: sınırsız)")
+    ap.add_argument("--seed", type=int, default=0, help="Örnekleme tohumu")
     args = ap.parse_args()
 
     os.makedirs(os.path.dirname(args.output), exist_ok=True) if os.path.dirname(args.output) else None
@@ -75,10 +175,18 @@ def main():
         resolver = LocationResolver.load(args.kb)
 
     # LabelEncoder'ı kurmak için tüm label'ları birinci geçişte topla
+    # (--sample ile aynı geçişte örneklem de toplanır; sınıf sayımları tüm dosyadan)
     labels_all = []
+    n_chunks = 0
+    sampler = None
+    if args.sample or args.per_class_cap:
+        sampler = StratifiedReservoir(args.sample, args.per_class_cap, args.seed)
     for df in stream_rows(args.input, chunksize=args.chunksize):
+        n_chunks += 1
         if "label" in df.columns:
             labels_all.extend(df["label"].astype(str).tolist())
+            if sampler is not None:
+                sample_into(sampler, df)
 
     if not labels_all:
         print("[warn] Girdi train.csv değil gibi (label yok). Eğitim yapılamaz.")
@@ -89,39 +197,72 @@ def main():
     keep = set(vc[vc >= args.min_samples].index)
     print(f"[info] classes total: {vc.size}, kept: {len(keep)} (min_samples={args.min_samples})")
 
-    le = LabelEncoder()
-    le.fit(list(keep))
+    # bileşen değeri (aksansız) => o bileşenle görülen etiket id'leri
+    comp_labels = {f: {} for f in CANDIDATE_FIELDS}
+
+    if args.update:
+        # Sıcak başlangıç: eski sınıflar her zaman tutulur, yeni etiketler min_samples'a tabi
+        prev = joblib.load(args.update)
+        clf, le = prev["clf"], prev["label_encoder"]
+        old = set(le.classes_.tolist())
+        added = grow_classes(clf, le, sorted(keep - old))
+        keep |= old
+        clf_initialized = True
+        for f, d in (prev.get("label_components") or {}).items():
+            comp_labels.setdefault(f, {}).update({v: set(ids.tolist()) for v, ids in d.items()})
+        print(f"[update] {args.update}: {len(old)} classes + {added} new => {len(le.classes_)}")
+    else:
+        le = LabelEncoder()
+        le.fit(list(keep))
+        clf = make_clf()
+        # İlk partial_fit için sınıfları vermemiz gerekir
+        clf_initialized = False
     n_classes = len(le.classes_)
     print(f"[info] n_classes for training: {n_classes}")
 
-    # HashingVectorizer (stateless, RAM dostu)
-    vect = HashingVectorizer(
-        n_features=2**20,
-        alternate_sign=False,
-        analyzer="char",
-        ngram_range=(3,5),
-        norm="l2"
-    )
+    sample = None
+    if sampler is not None:
+        sample = sample_frame(sampler)
+        n_chunks = -(-len(sampler) // args.chunksize)
+        print(f"[sample] {sampler.summary()}")
 
-    clf = SGDClassifier(
-        loss="hinge",      # SVM benzeri; prob gerekmiyor
-        alpha=1e-5,
-        max_iter=5,
-        tol=1e-3
-    )
+    def train_chunks():
+        if sample is None:
+            yield from stream_rows(args.input, chunksize=args.chunksize)
+            return
+        for i in range(0, len(sample), args.chunksize):
+            yield sample.iloc[i:i + args.chunksize]
+
+    replay_parts = None
+    if args.update and args.replay:
+        replay = load_replay(args.replay, set(le.classes_.tolist()), args.replay_frac,
+                             args.replay_max, args.seed, args.chunksize)
+        if replay is not None:
+            # yeni veri parçalarına eşit dağıt (her parça yeni + eski karışık öğrenilir)
+            replay_parts = np.array_split(np.arange(len(replay)), max(1, n_chunks))
+            print(f"[update] replay rows: {len(replay):,} from {args.replay}")
 
-    # İlk partial_fit için sınıfları vermemiz gerekir
-    clf_initialized = False
+    vect = make_vec()
 
     for ep in range(args.epochs):
         print(f"[train] epoch {ep+1}/{args.epochs}")
-        for df in stream_rows(args.input, chunksize=args.chunksize):
+        for k, df in enumerate(train_chunks()):
             df = df[ df["label"].astype(str).isin(keep) ]
+            if replay_parts is not None and k < len(replay_parts):
+                df = shuffle(pd.concat([df[["address", "label"]], replay.iloc[replay_parts[k]]],
+                                       ignore_index=True), random_state=args.seed + ep)
             if df.empty: 
                 continue
             # zenginleştirilmiş metin
-            texts = [enrich_text(a, resolver) for a in df["address"].astype(str).tolist()]
+            enriched = enrich_frame(df["address"].astype(str), resolver)
+            texts = [t for t, _ in enriched]
             y = le.transform(df["label"].astype(str).tolist())
+            if ep == 0:
+                for (_, p), lab in zip(enriched, y):
+                    for f in CANDIDATE_FIELDS:
+                        v = fold_tr(p.get(f) or "")
+                        if v:
+                            comp_labels[f].setdefault(v, set()).add(int(lab))
 
             X = vect.transform(texts)
             if not clf_initialized:
@@ -130,7 +271,11 @@ def main():
             else:
                 clf.partial_fit(X, y)
 
-    joblib.dump({"vectorizer":"hashing", "clf":clf, "label_encoder":le}, args.output)
+    # eval_or_predict aday kümesi için: bileşen => sıralı etiket id dizisi
+    label_components = {f: {v: np.array(sorted(ids), dtype=np.int32) for v, ids in d.items()}
+                        for f, d in comp_labels.items()}
+    joblib.dump({"vectorizer":"hashing", "clf":clf, "label_encoder":le,
+                 "label_components": label_components}, args.output)
     print(f"[ok] saved -> {args.output}")
 
 if __name__ == "__main__":
@@ -1,46 +1,120 @@
 # train_ml_resolver.py  — parse tabanlı eğitim (opsiyonel resolver desteği)
-import argparse, csv, joblib, numpy as np
+import argparse, joblib, time, numpy as np
 from collections import Counter
 from sklearn.pipeline import Pipeline
-from sklearn.feature_extraction.text import HashingVectorizer
 from sklearn.linear_model import SGDClassifier
 
 from normalizer import normalize
-from extractor import parse_address
+from extractor import parse_record
 from resolver import LocationResolver
+from featurizer import MemoHashingVectorizer
+from table_io import ADDRESS_COLUMNS, iter_rows
+from ml_resolver import HIER_KIND, predict_hierarchical
+from sampling import StratifiedReservoir
 
 def rows(path):
-    with open(path, "r", encoding="utf-8", newline="") as f:
-        yield from csv.DictReader(f)
+    # etiketler resolver'dan gelir; sütunlu girdide yalnızca adres sütunu okunur
+    yield from iter_rows(path, ADDRESS_COLUMNS)
 
 def pick_addr(r):
     return r.get("address") or r.get("Address") or r.get("adres") or ""
 
-def main():
-    ap = argparse.ArgumentParser()
-    ap.add_argument("--input", required=True, help="CSV (address/adres sütunu olmalı)")
-    ap.add_argument("--output", required=True, help="Kaydedilecek model yolu (joblib)")
-    ap.add_argument("--kb", default="", help="(Opsiyonel) resolver index dosyası")
-    ap.add_argument("--resolver-threshold", type=float, default=1.0,
-                    help="Resolver skor eşiği (vars: 1.0)")
-    ap.add_argument("--sample", type=int, default=0, help="İsteğe bağlı örnek sınırı")
-    args = ap.parse_args()
-
-    # (Opsiyonel) co-occurrence resolver
-    resolver = LocationResolver.load(args.kb) if args.kb else None
-    use_resolver = resolver is not None
-
-    X, y = [], []
+def make_vec(n_features: int = 2**20, ngram_range=(3,5)) -> MemoHashingVectorizer:
+    return MemoHashingVectorizer(
+        analyzer="char_wb",
+        ngram_range=ngram_range,
+        n_features=n_features,
+        alternate_sign=False,
+        norm="l2",
+        dtype=np.float32
+    )
+
+def make_clf() -> SGDClassifier:
+    return SGDClassifier(
+        loss="log_loss",
+        penalty="l2",
+        alpha=1e-4,
+        max_iter=25,
+        n_jobs=-1,
+        random_state=42
+    )
+
+def _to_float32(clf: SGDClassifier) -> SGDClassifier:
+    # Girdi zaten float32; katsayıları da float32 tutmak bellek/bant genişliğini yarılar
+    clf.coef_ = clf.coef_.astype(np.float32)
+    clf.intercept_ = clf.intercept_.astype(np.float32)
+    return clf
+
+def train_hierarchical(X, y, ilce_features: int = 2**16) -> dict:
+    """
+    İki seviyeli model: 81 sınıflı il sınıflayıcı + her il için ilçe sınıflayıcı.
+    İlçe seviyesi yalnızca bir ilin ilçelerini ayırdığı için daha küçük hash
+    uzayı (ilce_features) yeterli; tek ilçeli iller için sadece etiket saklanır.
+    """
+    il_y = [lab.split("|", 1)[0] for lab in y]
+    il_pipe = Pipeline([("vec", make_vec()), ("clf", make_clf())])
+    il_pipe.fit(X, il_y)
+    _to_float32(il_pipe.named_steps["clf"])
+
+    ilce_vec = make_vec(ilce_features)
+    by_il = {}
+    for x, lab in zip(X, y):
+        il, ilce = lab.split("|", 1)
+        by_il.setdefault(il, ([], []))
+        by_il[il][0].append(x)
+        by_il[il][1].append(ilce)
+
+    ilce_clfs = {}
+    for il, (xs, ys) in by_il.items():
+        if len(set(ys)) == 1:
+            ilce_clfs[il] = ys[0]
+            continue
+        clf = make_clf()
+        clf.fit(ilce_vec.transform(xs), ys)
+        ilce_clfs[il] = _to_float32(clf)
+
+    return {"kind": HIER_KIND, "il_pipe": il_pipe, "ilce_vec": ilce_vec, "ilce_clfs": ilce_clfs}
+
+def model_nbytes(model) -> int:
+    if isinstance(model, dict):
+        n = model_nbytes(model["il_pipe"])
+        for clf in model["ilce_clfs"].values():
+            if not isinstance(clf, str):
+                n += clf.coef_.nbytes + clf.intercept_.nbytes
+        return n
+    clf = model.named_steps["clf"]
+    return clf.coef_.nbytes + clf.intercept_.nbytes
+
+def evaluate(model, X, y, il_hints) -> tuple:
+    """Dönüş: (accuracy, satır başı ms)"""
+    t0 = time.perf_counter()
+    if isinstance(model, dict):
+        pred, _ = predict_hierarchical(model, X, il_hints)
+    else:
+        pred = model.predict(X)
+    ms = (time.perf_counter() - t0) * 1000.0 / max(1, len(X))
+    acc = float(np.mean([a == b for a, b in zip(pred, y)])) if y else float("nan")
+    return acc, ms
+
+def collect_examples(path, resolver=None, resolver_threshold: float = 1.0,
+                     sampler: StratifiedReservoir = None):
+    """
+    Eğitim örnekleri: (normalize adres, "Il|Ilce" etiketi, parse'tan gelen il).
+    Etiket parse'tan, eksikse resolver'dan (skor >= eşik) gelir; ikisi de yoksa satır atlanır.
+    Dönüş: (X, y, il_parsed, okunan satır, kullanılabilir satır)
+    """
+    X, y, il_parsed = [], [], []
     total, used = 0, 0
+    use_resolver = resolver is not None
 
-    for r in rows(args.input):
+    for r in rows(path):
         total += 1
         addr = pick_addr(r)
         if not addr:
             continue
 
         # 1) Adresi ayrıştır
-        p = parse_address(addr)
+        p = parse_record(addr)
 
         il   = (p.get("il") or "").strip().title()
         ilce = (p.get("ilce") or "").strip().title()
@@ -56,7 +130,7 @@ def main():
                 il_hint=il or None,
                 ilce_hint=ilce or None
             )
-            if score >= args.resolver_threshold:
+            if score >= resolver_threshold:
                 il   = il   or il_res
                 ilce = ilce or ilce_res
 
@@ -64,12 +138,54 @@ def main():
         if not il or not ilce:
             continue
 
-        X.append(normalize(addr))
-        y.append(f"{il}|{ilce}")
+        label = f"{il}|{ilce}"
         used += 1
+        if sampler is not None:
+            # normalize yalnızca seçilen satırlara uygulanır
+            sampler.add(label, (addr, label, (p.get("il") or "").strip()))
+            continue
+        X.append(normalize(addr))
+        y.append(label)
+        il_parsed.append((p.get("il") or "").strip())
+
+    if sampler is not None:
+        print(f"[sample] {sampler.summary()}")
+        for addr, label, il_p in sampler.items():
+            X.append(normalize(addr))
+            y.append(label)
+            il_parsed.append(il_p)
+
+    return X, y, il_parsed, total, used
+
+def main():
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--input", required=True, help="CSV (address/adres sütunu olmalı)")
+    ap.add_argument("--output", required=True, help="Kaydedilecek model yolu (joblib)")
+    ap.add_argument("--kb", default="", help="(Opsiyonel) resolver index dosyası")
+    ap.add_argument("--resolver-threshold", type=float, default=1.0,
+                    help="Resolver skor eşiği (vars: 1.0)")
+    ap.add_argument("--sample", type=int, default=0,
+                    help="İsteğe bağlı örnek bütçesi: tüm dosyadan il|ilçe'ye göre tabakalı rezervuar örneği")
+    ap.add_argument("--per-class-cap", type=int, default=0,
+                    help="Örneklemede bir il|ilçe sınıfından en fazla satır (0: sınırsız)")
+    ap.add_argument("--seed", type=int, default=0, help="Örnekleme tohumu")
+    ap.add_argument("--hierarchical", action="store_true",
+                    help="Düz 'Il|Ilce' yerine il -> ilçe iki seviyeli model eğit")
+    ap.add_argument("--ilce-features", type=int, default=2**16,
+                    help="Hiyerarşik modelde ilçe seviyesinin hash boyutu (vars: 2**16)")
+    ap.add_argument("--holdout", type=float, default=0.0,
+                    help="Bu oranda satırı eğitimden ayırıp doğrulukla raporla (örn: 0.1)")
+    ap.add_argument("--compare-flat", action="store_true",
+                    help="--hierarchical ile birlikte: aynı bölmede düz modeli de eğitip karşılaştır")
+    args = ap.parse_args()
+
+    # (Opsiyonel) co-occurrence resolver
+    resolver = LocationResolver.load(args.kb) if args.kb else None
 
-        if args.sample and used >= args.sample:
-            break
+    sampler = None
+    if args.sample or args.per_class_cap:
+        sampler = StratifiedReservoir(args.sample, args.per_class_cap, args.seed)
+    X, y, il_parsed, total, used = collect_examples(args.input, resolver, args.resolver_threshold, sampler)
 
     if not X:
         raise SystemExit(
@@ -78,33 +194,42 @@ def main():
             "Çözüm: --kb ile resolver ver veya verisetinde il/ilçe geçen adresleri kullan."
         )
 
-    # Hafif & bellek dostu boru hattı
-    pipe = Pipeline([
-        ("vec", HashingVectorizer(
-            analyzer="char_wb",
-            ngram_range=(3,5),
-            n_features=2**20,
-            alternate_sign=False,
-            norm="l2",
-            dtype=np.float32
-        )),
-        ("clf", SGDClassifier(
-            loss="log_loss",
-            penalty="l2",
-            alpha=1e-4,
-            max_iter=25,
-            n_jobs=-1,
-            random_state=42
-        )),
-    ])
-
-    pipe.fit(X, y)
-    joblib.dump(pipe, args.output)
+    # İsteğe bağlı doğrulama bölmesi (model yalnızca eğitim kısmıyla eğitilir)
+    X_ho, y_ho, il_ho = [], [], []
+    if args.holdout > 0:
+        mask = np.random.RandomState(42).rand(len(X)) < args.holdout
+        X_ho = [x for x, m in zip(X, mask) if m]
+        y_ho = [v for v, m in zip(y, mask) if m]
+        il_ho = [v for v, m in zip(il_parsed, mask) if m]
+        X = [x for x, m in zip(X, mask) if not m]
+        y = [v for v, m in zip(y, mask) if not m]
+
+    models = {}
+    if args.hierarchical:
+        models["hierarchical"] = train_hierarchical(X, y, args.ilce_features)
+    if not args.hierarchical or args.compare_flat:
+        # Hafif & bellek dostu boru hattı
+        pipe = Pipeline([
+            ("vec", make_vec()),
+            ("clf", make_clf()),
+        ])
+        pipe.fit(X, y)
+        models["flat"] = pipe
+
+    out_model = models["hierarchical"] if args.hierarchical else models["flat"]
+    joblib.dump(out_model, args.output)
+
+    for name, m in models.items():
+        line = f"[model] {name:<12} coef_bytes={model_nbytes(m)/2**20:,.1f} MiB"
+        if X_ho:
+            acc, ms = evaluate(m, X_ho, y_ho, il_ho)
+            line += f"  holdout_acc={acc:.4f}  infer={ms:.3f} ms/row"
+        print(line)
 
     # Kısa özet
     cls = Counter(y)
     print(f"[ok] saved -> {args.output}")
-    print(f"[stats] total_rows={total}  used_for_training={used}  classes={len(cls)}")
+    print(f"[stats] total_rows={total}  usable={used}  used_for_training={len(y)}  holdout={len(y_ho)}  classes={len(cls)}")
     most = cls.most_common(10)
     if most:
         print("[top-classes]")
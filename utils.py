@@ -1,7 +1,7 @@
 # -*- coding: utf-8 -*-
-from dataclasses import dataclass
-import re
-from typing import List, Set
+import re, sys
+from collections.abc import MutableMapping
+from typing import Dict, Iterable, Iterator, List, Mapping, Sequence, Set
 
 # ---- Sabitler ----
 ILLER: Set[str] = {
@@ -36,12 +36,15 @@ STOPWORDS_BACK = {
 } | ANCHOR_TOKENS | ILLER
 
 # ---- Yardımcılar ----
+_TR_UPPER_MAP = str.maketrans("IİÇĞÖŞÜ", "ıiçğöşü")
+_NON_WORD_RE = re.compile(r"[^\wçğıöşü]+")
+
 def tr_lower(s: str) -> str:
-    return (s or "").translate(str.maketrans("IİÇĞÖŞÜ", "ıiçğöşü")).lower()
+    return (s or "").translate(_TR_UPPER_MAP).lower()
 
 def clean_token(tok: str) -> str:
     t = tr_lower(tok)
-    return re.sub(r"[^\wçğıöşü]+", "", t)
+    return _NON_WORD_RE.sub("", t)
 
 def is_stop(tok: str) -> bool:
     return clean_token(tok) in STOPWORDS_BACK
@@ -81,18 +84,145 @@ ILLER_FOLDED = { fold_tr(x) for x in ILLER }
 def is_il_token(tok: str) -> bool:
     return fold_tr(tok) in ILLER_FOLDED
 
-@dataclass
-class Parsed:
-    normalized: str
-    il: str = ""
-    ilce: str = ""
-    mahalle: str = ""
-    sokak: str = ""
-    cadde: str = ""
-    bulvar: str = ""
-    no: str = ""
-    kat: str = ""
-    daire: str = ""
-    blok: str = ""
-    site: str = ""
-    apartman: str = ""
+# parse_address çıktısının alanları (sırası dict API'siyle aynı)
+PARSED_FIELDS = (
+    "address", "normalized", "il", "ilce", "mahalle", "sokak", "cadde", "bulvar",
+    "no", "kat", "daire", "blok", "site", "apartman",
+)
+# Sonradan eklenen isteğe bağlı alanlar (parser_cli: id/label, süre bütçesi: degraded)
+PARSED_EXTRA = ("id", "label", "degraded")
+_PARSED_SLOTS = frozenset(PARSED_FIELDS + PARSED_EXTRA)
+
+class Parsed(MutableMapping):
+    """
+    Tek adresin parse sonucu: sabit __slots__ (satır başına dict yerine).
+    dict gibi de kullanılır (p["il"], p.get("il"), dict(p), p == {...});
+    None değerli yuva "yok" sayılır, tanınmayan anahtarlar ayrı küçük sözlükte.
+    """
+    __slots__ = PARSED_FIELDS + PARSED_EXTRA + ("_more",)
+
+    def __init__(self, address: str = "", normalized: str = "", il: str = "", ilce: str = "",
+                 mahalle: str = "", sokak: str = "", cadde: str = "", bulvar: str = "",
+                 no: str = "", kat: str = "", daire: str = "", blok: str = "",
+                 site: str = "", apartman: str = ""):
+        self.address = address
+        self.normalized = normalized
+        self.il = il
+        self.ilce = ilce
+        self.mahalle = mahalle
+        self.sokak = sokak
+        self.cadde = cadde
+        self.bulvar = bulvar
+        self.no = no
+        self.kat = kat
+        self.daire = daire
+        self.blok = blok
+        self.site = site
+        self.apartman = apartman
+        self.id = self.label = self.degraded = None
+        self._more = None
+
+    def get(self, key, default=None):
+        if key in _PARSED_SLOTS:
+            v = getattr(self, key)
+            return default if v is None else v
+        return self._more.get(key, default) if self._more else default
+
+    def __getitem__(self, key):
+        v = self.get(key)
+        if v is None:
+            raise KeyError(key)
+        return v
+
+    def __setitem__(self, key, value):
+        if key in _PARSED_SLOTS:
+            setattr(self, key, value)
+        else:
+            if self._more is None:
+                self._more = {}
+            self._more[key] = value
+
+    def __delitem__(self, key):
+        if key in _PARSED_SLOTS and getattr(self, key) is not None:
+            setattr(self, key, None)
+        elif self._more and key in self._more:
+            del self._more[key]
+        else:
+            raise KeyError(key)
+
+    def __iter__(self):
+        for k in self.__slots__[:-1]:
+            if getattr(self, k) is not None:
+                yield k
+        if self._more:
+            yield from self._more
+
+    def __len__(self) -> int:
+        return sum(1 for _ in self)
+
+    def __contains__(self, key) -> bool:
+        return self.get(key) is not None
+
+    def to_dict(self) -> Dict[str, str]:
+        return {k: self.get(k) for k in self}
+
+    def copy(self) -> "Parsed":
+        p = Parsed.__new__(Parsed)
+        for k in self.__slots__:
+            setattr(p, k, getattr(self, k))
+        if self._more:
+            p._more = dict(self._more)
+        return p
+
+    def __repr__(self) -> str:
+        return f"Parsed({self.to_dict()!r})"
+
+class ParsedBatch:
+    """
+    Sütun yönelimli (struct-of-arrays) parse sonuçları: alan başına bir liste.
+    Toplu yollarda satır başına nesne yerine kullanılır; düşük kardinaliteli
+    değerler (il, ilçe, mahalle ...) sys.intern ile tek kopya tutulur.
+    b[i] satırı Parsed olarak, b.column("il") sütunu liste olarak verir.
+    """
+    __slots__ = ("cols",)
+
+    def __init__(self, fields: Sequence[str] = PARSED_FIELDS):
+        self.cols: Dict[str, list] = {k: [] for k in fields}
+
+    @classmethod
+    def from_records(cls, rows: Iterable[Mapping], fields: Sequence[str] = PARSED_FIELDS) -> "ParsedBatch":
+        b = cls(fields)
+        for r in rows:
+            b.append(r)
+        return b
+
+    def append(self, r: Mapping) -> None:
+        for k, col in self.cols.items():
+            v = r.get(k) or ""
+            col.append(v if k in _NO_INTERN else sys.intern(v))
+
+    def __len__(self) -> int:
+        return len(next(iter(self.cols.values()), ()))
+
+    def column(self, name: str) -> list:
+        return self.cols[name]
+
+    def __getitem__(self, i: int) -> Parsed:
+        p = Parsed()
+        for k, col in self.cols.items():
+            p[k] = col[i]
+        return p
+
+    def __iter__(self) -> Iterator[Parsed]:
+        for i in range(len(self)):
+            yield self[i]
+
+    def set(self, i: int, name: str, value: str) -> None:
+        self.cols[name][i] = value
+
+    def to_frame(self):
+        import pandas as pd
+        return pd.DataFrame(self.cols, columns=list(self.cols))
+
+# Yüksek kardinaliteli (satıra özgü) alanlar intern edilmez
+_NO_INTERN = frozenset(("address", "normalized"))